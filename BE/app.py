@@ -1,20 +1,27 @@
 # Backend FastAPI application for real-time analytics with WebSockets
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Query
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Query, Request
+from fastapi.responses import JSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 from datetime import datetime, timedelta
 from typing import Optional
 import pandas as pd
+import numpy as np
 from pydantic import BaseModel
 import uvicorn
 import asyncio
 import json
-import base64
 import os
 import platform
 from fastapi import HTTPException
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, PlainTextResponse
 import subprocess
+import glob
+from event_table import EventTable
+from broadcast import BroadcastHub
+from rollups import EventRollup, QUARTER_NS, HOUR_NS, DAY_NS
+from metrics import render_prometheus
+from frame_store import FRAME_VARIANTS, ensure_variant
+from email.utils import formatdate, parsedate_to_datetime
 
 app = FastAPI(title="Analytics API (WebSocket)", version="2.0.0")
 
@@ -27,19 +34,332 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Load data from Excel file
+# Load data from the append-only event store (falls back to the legacy Excel file)
 DATA_FILE = r"Data\Processed_Data.xlsx"
+DATA_STORE = os.path.join("Data", "Processed_Data.csv")
+FOOD_DATA_FILE = os.path.join("Data", "Food_count.xlsx")
+FOOD_DATA_STORE = os.path.join("Data", "Food_count.csv")
+# Snapshots published by main.py (and any other video script) for /metrics
+METRICS_FILES = os.path.join("Data", "metrics_*.json")
 
-def load_data():
-    """Load and prepare data from Excel file"""
+def prepare_events(df):
+    df['DateTime'] = pd.to_datetime(df['Date'] + ' ' + df['Timestamp'], format='%Y-%m-%d %I:%M:%S %p')
+    return df
+
+
+def prepare_food_counts(df):
+    df['DateTime'] = pd.to_datetime(df['Date'] + " " + df['Time'])
+    return df
+
+
+# One parsed copy of each table for the whole process, re-read only when the file changes
+EVENTS = EventTable(DATA_STORE, DATA_FILE, prepare_events)
+FOOD_COUNTS = EventTable(FOOD_DATA_STORE, FOOD_DATA_FILE, prepare_food_counts)
+
+
+# Per-category day / hour / 15-minute sums of the event data, updated as rows are appended
+ROLLUP = EventRollup(EVENTS, ['Total Food', 'Total Drinks', 'Total Parcels'])
+
+# Websocket views are computed once per tick and sent to all of their subscribers
+hub = BroadcastHub()
+
+
+def load_data(start=None, end=None):
+    """
+    Shared event rows with start <= DateTime <= end (default: all), in time order.
+    A slice of the shared data, so do not modify it in place; parsed again only when the event store changes
+    """
+    try:
+        return EVENTS.between(start, end)
+    except Exception as e:
+        raise Exception(f"Error loading data: {str(e)}")
+
+
+def load_rollup():
+    """Shared rollups, brought up to date with the event store"""
     try:
-        df = pd.read_excel(DATA_FILE)
-        df['DateTime'] = pd.to_datetime(df['Date'] + ' ' + df['Timestamp'], format='%Y-%m-%d %I:%M:%S %p')
-        return df
+        ROLLUP.refresh()
+        return ROLLUP
     except Exception as e:
         raise Exception(f"Error loading data: {str(e)}")
 
 
+# ============ VIEWS ============
+# Each websocket view is computed once per tick by the broadcast hub and shared by
+# every connection watching it
+
+def date_range(start_date, end_date):
+    """YYYY-MM-DD start and end dates as datetimes covering both whole days"""
+    start_dt = datetime.strptime(start_date, "%Y-%m-%d")
+    end_dt = datetime.strptime(end_date, "%Y-%m-%d") + timedelta(days=1) - timedelta(seconds=1)
+    return start_dt, end_dt
+
+
+def bucket_counts(sums):
+    return {
+        "food_count": int(sums[0]),
+        "drinks_count": int(sums[1]),
+        "parcels_count": int(sums[2])
+    }
+
+
+def group_series(groups):
+    """Rollup groups as a series sorted by key, like a pandas groupby"""
+    return [{"timestamp": key, **bucket_counts(sums)} for key, sums in sorted(groups.items())]
+
+
+def group_totals(groups):
+    total = sum(groups.values(), np.zeros(4))
+    return {
+        "total_food": int(total[0]),
+        "total_drinks": int(total[1]),
+        "total_parcels": int(total[2])
+    }
+
+
+def totals_view(period, delta):
+    """Totals over the last period"""
+    rollup = load_rollup()
+    now = datetime.now()
+    start_time = now - delta
+    
+    # Sum whole buckets for the period plus the rows at its edges
+    totals = rollup.totals(start_time, now)
+    
+    response = {
+        "period": period,
+        "total_food": int(totals[0]),
+        "total_drinks": int(totals[1]),
+        "total_parcels": int(totals[2]),
+        "start_time": start_time.strftime("%Y-%m-%d %H:%M:%S"),
+        "end_time": now.strftime("%Y-%m-%d %H:%M:%S"),
+        "timestamp": now.strftime("%Y-%m-%d %H:%M:%S")
+    }
+    
+    return response
+
+
+def detailed_view(period):
+    """Time series for a period: 15-min slots (1hr), hours (24hr), days (7d) or days of the week (30d/90d)"""
+    rollup = load_rollup()
+    now = datetime.now()
+    
+    if period == "1hr":
+        # Last 1 hour - 15-minute intervals
+        start_time = now - timedelta(hours=1)
+        groups = rollup.grouped(start_time, now, lambda t: t.floor("15min").strftime("%Y-%m-%d %H:%M"), finest=QUARTER_NS)
+        data = group_series(groups)
+        summary = {"total_intervals": len(data), **group_totals(groups)}
+        
+    elif period == "24hr":
+        # Last 24 hours - hourly aggregation
+        start_time = now - timedelta(hours=24)
+        groups = rollup.grouped(start_time, now, lambda t: t.strftime("%Y-%m-%d %H:00"), finest=HOUR_NS)
+        data = group_series(groups)
+        summary = {"total_hours": len(data), **group_totals(groups)}
+        
+    elif period == "7d":
+        # Last 7 days - daily aggregation
+        start_time = now - timedelta(days=7)
+        groups = rollup.grouped(start_time, now, lambda t: t.strftime("%A (%Y-%m-%d)"), finest=DAY_NS)
+        data = group_series(groups)
+        summary = {"total_days": len(data), **group_totals(groups)}
+        
+    elif period in ["30d", "90d"]:
+        # Last 30/90 days - aggregation by day of week
+        days = 30 if period == "30d" else 90
+        start_time = now - timedelta(days=days)
+        groups = rollup.grouped(start_time, now, lambda t: t.day_name(), finest=DAY_NS)
+        
+        day_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+        
+        data = [
+            {"timestamp": f"Total {day}s", **bucket_counts(groups.get(day, np.zeros(4)))}
+            for day in day_order
+        ]
+        summary = {"period_days": days, **group_totals(groups)}
+    
+    response = {
+        "period": period,
+        "data": data,
+        "summary": summary,
+        "timestamp": now.strftime("%Y-%m-%d %H:%M:%S")
+    }
+    
+    return response
+
+
+def custom_range_view(start_date, end_date, start_dt, end_dt):
+    """Totals and daily breakdown for a fixed date range"""
+    rollup = load_rollup()
+    now = datetime.now()
+    
+    # Daily buckets for the range
+    groups = rollup.grouped(start_dt, end_dt, lambda t: t.strftime("%Y-%m-%d"), finest=DAY_NS)
+    
+    if not groups:
+        response = {
+            "start_date": start_date,
+            "end_date": end_date,
+            "total_food": 0,
+            "total_drinks": 0,
+            "total_parcels": 0,
+            "total_days": 0,
+            "daily_breakdown": [],
+            "timestamp": now.strftime("%Y-%m-%d %H:%M:%S")
+        }
+    else:
+        # Daily breakdown
+        daily_breakdown = [
+            {"date": key, **bucket_counts(sums)}
+            for key, sums in sorted(groups.items())
+        ]
+        
+        response = {
+            "start_date": start_date,
+            "end_date": end_date,
+            **group_totals(groups),
+            "total_days": len(daily_breakdown),
+            "daily_breakdown": daily_breakdown,
+            "timestamp": now.strftime("%Y-%m-%d %H:%M:%S")
+        }
+    
+    return response
+
+
+def raw_records(filtered_df):
+    """Event rows in the original format (list of records)"""
+    # Replace NaN values with None/empty strings before serialization
+    filtered_df = filtered_df.fillna('')
+    
+    records = []
+    for _, row in filtered_df.iterrows():
+        record = {
+            "Date": str(row['Date']) if row['Date'] else '',
+            "Timestamp": str(row['Timestamp']) if row['Timestamp'] else '',
+            "Total_Food": int(row['Total Food']) if row['Total Food'] else 0,
+            "Total_Drinks": int(row['Total Drinks']) if row['Total Drinks'] else 0,
+            "Total_Parcels": int(row['Total Parcels']) if row['Total Parcels'] else 0,
+            "Video_Path": str(row.get('Video_Path', '')) if row.get('Video_Path') else '',
+            "DateTime": row['DateTime'].strftime("%Y-%m-%d %H:%M:%S")
+        }
+        records.append(record)
+    return records
+
+
+def food_records(filtered_df):
+    """Food count rows as JSON records"""
+    filtered_df = filtered_df.fillna('')
+
+    records = []
+    for _, row in filtered_df.iterrows():
+        records.append({
+            "Date": row['Date'],
+            "Time": row['Time'],
+            "Food_Count": int(row['Food Count']),
+            "Frame_name": str(row['Frame_name']),
+            "DateTime": row['DateTime'].strftime("%Y-%m-%d %H:%M:%S")
+        })
+    return records
+
+
+def raw_data_view(start_date, end_date):
+    """Event rows in a date range, or the last 24 hours"""
+    now = datetime.now()
+    
+    # Set date range
+    if start_date and end_date:
+        start_dt, end_dt = date_range(start_date, end_date)
+    else:
+        # Default: Last 24 hours
+        start_dt = now - timedelta(hours=24)
+        end_dt = now
+    
+    # Binary search for the range in the time-sorted data
+    records = raw_records(load_data(start_dt, end_dt))
+    
+    return {
+        "start_date": start_dt.strftime("%Y-%m-%d"),
+        "end_date": end_dt.strftime("%Y-%m-%d"),
+        "total_records": len(records),
+        "data": records,
+        "timestamp": now.strftime("%Y-%m-%d %H:%M:%S")
+    }
+
+
+def food_data_view(start_date, end_date):
+    """Food count rows in a date range, or the last 24 hours"""
+    now = datetime.now()
+
+    # Filter by user date range or last 24 hours
+    if start_date and end_date:
+        start_dt, end_dt = date_range(start_date, end_date)
+    else:
+        start_dt = now - timedelta(hours=24)
+        end_dt = now
+
+    # Convert dataframe rows → JSON structure
+    records = food_records(FOOD_COUNTS.between(start_dt, end_dt))
+
+    return {
+        "start_date": start_dt.strftime("%Y-%m-%d"),
+        "end_date": end_dt.strftime("%Y-%m-%d"),
+        "total_records": len(records),
+        "data": records,
+        "timestamp": now.strftime("%Y-%m-%d %H:%M:%S")
+    }
+
+
+def table_changes(table, to_records, start_date, end_date, cursor):
+    """
+    Rows of an event table in a date range (or the last 24 hours) as a change feed.
+
+    cursor is "<epoch>:<row count>" from a previous message. Without a valid
+    cursor the whole window is sent as a "snapshot"; otherwise only rows
+    appended after it, as a "delta", or a "heartbeat" when there are none.
+    window_start lets a client on the rolling 24 hours drop rows that aged out.
+    """
+    now = datetime.now()
+    if start_date and end_date:
+        start_dt, end_dt = date_range(start_date, end_date)
+    else:
+        # Rolling window: appended rows are always current, so there is no upper bound
+        start_dt, end_dt = now - timedelta(hours=24), None
+
+    start_row = None
+    if cursor:
+        df, epoch = table.get_with_epoch()
+        row_count = len(df)
+        cursor_epoch, _, cursor_row = str(cursor).partition(":")
+        if cursor_epoch == str(epoch) and cursor_row.isdigit() and int(cursor_row) <= row_count:
+            start_row = int(cursor_row)
+    if start_row is None:
+        # Snapshot: binary search for the window in the time-sorted rows
+        rows, epoch, row_count = table.between_with_epoch(start_dt, end_dt)
+    else:
+        # Only the rows appended since the cursor are checked against the window
+        rows = df.iloc[start_row:]
+        in_window = rows['DateTime'] >= start_dt
+        if end_dt is not None:
+            in_window &= rows['DateTime'] <= end_dt
+        rows = rows[in_window]
+    records = to_records(rows) if len(rows) else []
+
+    response = {
+        "type": "snapshot" if start_row is None else ("delta" if records else "heartbeat"),
+        "cursor": f"{epoch}:{row_count}",
+        "start_date": start_dt.strftime("%Y-%m-%d"),
+        "end_date": (end_dt or now).strftime("%Y-%m-%d"),
+        "window_start": start_dt.strftime("%Y-%m-%d %H:%M:%S"),
+        "timestamp": now.strftime("%Y-%m-%d %H:%M:%S")
+    }
+    if response["type"] != "heartbeat":
+        response["data"] = records
+    if response["type"] == "snapshot":
+        response["total_records"] = len(records)
+    return response
+
+
 @app.get("/", tags=["Root"])
 async def root():
     """Root endpoint"""
@@ -81,28 +401,8 @@ async def websocket_totals(websocket: WebSocket, period: str):
         return
     
     try:
-        while True:
-            df = load_data()
-            now = datetime.now()
-            delta = period_map[period]
-            start_time = now - delta
-            
-            # Filter data for the period
-            filtered_df = df[(df['DateTime'] >= start_time) & (df['DateTime'] <= now)]
-            
-            response = {
-                "period": period,
-                "total_food": int(filtered_df['Total Food'].sum()) if not filtered_df.empty else 0,
-                "total_drinks": int(filtered_df['Total Drinks'].sum()) if not filtered_df.empty else 0,
-                "total_parcels": int(filtered_df['Total Parcels'].sum()) if not filtered_df.empty else 0,
-                "start_time": start_time.strftime("%Y-%m-%d %H:%M:%S"),
-                "end_time": now.strftime("%Y-%m-%d %H:%M:%S"),
-                "timestamp": now.strftime("%Y-%m-%d %H:%M:%S")
-            }
-            
-            await websocket.send_json(response)
-            await asyncio.sleep(5)  # Send updates every 5 seconds
-            
+        await hub.serve(websocket, ("totals", period), lambda: totals_view(period, period_map[period]))
+
     except WebSocketDisconnect:
         print(f"Client disconnected from /ws/totals/{period}")
     except Exception as e:
@@ -131,140 +431,8 @@ async def websocket_detailed(websocket: WebSocket, period: str):
         return
     
     try:
-        while True:
-            df = load_data()
-            now = datetime.now()
-            
-            if period == "1hr":
-                # Last 1 hour - 15-minute intervals
-                start_time = now - timedelta(hours=1)
-                filtered_df = df[(df['DateTime'] >= start_time) & (df['DateTime'] <= now)].copy()
-                
-                filtered_df['TimeSlot'] = filtered_df['DateTime'].dt.floor('15min').dt.strftime("%Y-%m-%d %H:%M")
-                
-                intervals = filtered_df.groupby('TimeSlot').agg({
-                    'Total Food': 'sum',
-                    'Total Drinks': 'sum',
-                    'Total Parcels': 'sum'
-                }).reset_index()
-                
-                data = [
-                    {
-                        "timestamp": row['TimeSlot'],
-                        "food_count": int(row['Total Food']),
-                        "drinks_count": int(row['Total Drinks']),
-                        "parcels_count": int(row['Total Parcels'])
-                    }
-                    for _, row in intervals.iterrows()
-                ]
-                
-                summary = {
-                    "total_intervals": len(data),
-                    "total_food": int(filtered_df['Total Food'].sum()),
-                    "total_drinks": int(filtered_df['Total Drinks'].sum()),
-                    "total_parcels": int(filtered_df['Total Parcels'].sum())
-                }
-                
-            elif period == "24hr":
-                # Last 24 hours - hourly aggregation
-                start_time = now - timedelta(hours=24)
-                filtered_df = df[(df['DateTime'] >= start_time) & (df['DateTime'] <= now)].copy()
-                filtered_df['Hour'] = filtered_df['DateTime'].dt.strftime("%Y-%m-%d %H:00")
-                
-                hourly = filtered_df.groupby('Hour').agg({
-                    'Total Food': 'sum',
-                    'Total Drinks': 'sum',
-                    'Total Parcels': 'sum'
-                }).reset_index()
-                
-                data = [
-                    {
-                        "timestamp": row['Hour'],
-                        "food_count": int(row['Total Food']),
-                        "drinks_count": int(row['Total Drinks']),
-                        "parcels_count": int(row['Total Parcels'])
-                    }
-                    for _, row in hourly.iterrows()
-                ]
-                
-                summary = {
-                    "total_hours": len(data),
-                    "total_food": int(filtered_df['Total Food'].sum()),
-                    "total_drinks": int(filtered_df['Total Drinks'].sum()),
-                    "total_parcels": int(filtered_df['Total Parcels'].sum())
-                }
-                
-            elif period == "7d":
-                # Last 7 days - daily aggregation
-                start_time = now - timedelta(days=7)
-                filtered_df = df[(df['DateTime'] >= start_time) & (df['DateTime'] <= now)].copy()
-                filtered_df['DayName'] = filtered_df['DateTime'].dt.strftime("%A (%Y-%m-%d)")
-                
-                daily = filtered_df.groupby('DayName').agg({
-                    'Total Food': 'sum',
-                    'Total Drinks': 'sum',
-                    'Total Parcels': 'sum'
-                }).reset_index()
-                
-                data = [
-                    {
-                        "timestamp": row['DayName'],
-                        "food_count": int(row['Total Food']),
-                        "drinks_count": int(row['Total Drinks']),
-                        "parcels_count": int(row['Total Parcels'])
-                    }
-                    for _, row in daily.iterrows()
-                ]
-                
-                summary = {
-                    "total_days": len(data),
-                    "total_food": int(filtered_df['Total Food'].sum()),
-                    "total_drinks": int(filtered_df['Total Drinks'].sum()),
-                    "total_parcels": int(filtered_df['Total Parcels'].sum())
-                }
-                
-            elif period in ["30d", "90d"]:
-                # Last 30/90 days - aggregation by day of week
-                days = 30 if period == "30d" else 90
-                start_time = now - timedelta(days=days)
-                filtered_df = df[(df['DateTime'] >= start_time) & (df['DateTime'] <= now)].copy()
-                filtered_df['DayOfWeek'] = filtered_df['DateTime'].dt.day_name()
-                
-                day_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-                
-                weekly = filtered_df.groupby('DayOfWeek').agg({
-                    'Total Food': 'sum',
-                    'Total Drinks': 'sum',
-                    'Total Parcels': 'sum'
-                }).reindex(day_order).fillna(0).reset_index()
-                
-                data = [
-                    {
-                        "timestamp": f"Total {row['DayOfWeek']}s",
-                        "food_count": int(row['Total Food']),
-                        "drinks_count": int(row['Total Drinks']),
-                        "parcels_count": int(row['Total Parcels'])
-                    }
-                    for _, row in weekly.iterrows()
-                ]
-                
-                summary = {
-                    "period_days": days,
-                    "total_food": int(filtered_df['Total Food'].sum()),
-                    "total_drinks": int(filtered_df['Total Drinks'].sum()),
-                    "total_parcels": int(filtered_df['Total Parcels'].sum())
-                }
-            
-            response = {
-                "period": period,
-                "data": data,
-                "summary": summary,
-                "timestamp": now.strftime("%Y-%m-%d %H:%M:%S")
-            }
-            
-            await websocket.send_json(response)
-            await asyncio.sleep(5)  # Send updates every 5 seconds
-            
+        await hub.serve(websocket, ("detailed", period), lambda: detailed_view(period))
+
     except WebSocketDisconnect:
         print(f"Client disconnected from /ws/detailed/{period}")
     except Exception as e:
@@ -298,8 +466,7 @@ async def websocket_custom_range(websocket: WebSocket):
             return
         
         try:
-            start_dt = datetime.strptime(start_date, "%Y-%m-%d")
-            end_dt = datetime.strptime(end_date, "%Y-%m-%d") + timedelta(days=1) - timedelta(seconds=1)
+            start_dt, end_dt = date_range(start_date, end_date)
         except ValueError:
             await websocket.send_json({
                 "error": "Invalid date format. Use YYYY-MM-DD"
@@ -314,57 +481,9 @@ async def websocket_custom_range(websocket: WebSocket):
             await websocket.close()
             return
         
-        while True:
-            df = load_data()
-            now = datetime.now()
-            
-            # Filter data
-            filtered_df = df[(df['DateTime'] >= start_dt) & (df['DateTime'] <= end_dt)].copy()
-            
-            if filtered_df.empty:
-                response = {
-                    "start_date": start_date,
-                    "end_date": end_date,
-                    "total_food": 0,
-                    "total_drinks": 0,
-                    "total_parcels": 0,
-                    "total_days": 0,
-                    "daily_breakdown": [],
-                    "timestamp": now.strftime("%Y-%m-%d %H:%M:%S")
-                }
-            else:
-                # Daily breakdown
-                filtered_df['DateOnly'] = filtered_df['DateTime'].dt.date
-                daily = filtered_df.groupby('DateOnly').agg({
-                    'Total Food': 'sum',
-                    'Total Drinks': 'sum',
-                    'Total Parcels': 'sum'
-                }).reset_index()
-                
-                daily_breakdown = [
-                    {
-                        "date": str(row['DateOnly']),
-                        "food_count": int(row['Total Food']),
-                        "drinks_count": int(row['Total Drinks']),
-                        "parcels_count": int(row['Total Parcels'])
-                    }
-                    for _, row in daily.iterrows()
-                ]
-                
-                response = {
-                    "start_date": start_date,
-                    "end_date": end_date,
-                    "total_food": int(filtered_df['Total Food'].sum()),
-                    "total_drinks": int(filtered_df['Total Drinks'].sum()),
-                    "total_parcels": int(filtered_df['Total Parcels'].sum()),
-                    "total_days": len(daily_breakdown),
-                    "daily_breakdown": daily_breakdown,
-                    "timestamp": now.strftime("%Y-%m-%d %H:%M:%S")
-                }
-            
-            await websocket.send_json(response)
-            await asyncio.sleep(5)  # Send updates every 5 seconds
-            
+        await hub.serve(websocket, ("custom-range", start_date, end_date),
+                        lambda: custom_range_view(start_date, end_date, start_dt, end_dt))
+
     except WebSocketDisconnect:
         print("Client disconnected from /ws/custom-range")
     except Exception as e:
@@ -380,6 +499,10 @@ async def websocket_raw_data(websocket: WebSocket):
     Client can send: {"start_date": "YYYY-MM-DD", "end_date": "YYYY-MM-DD"}
     If not provided, defaults to last 24 hours
     Sends updates every 5 seconds
+
+    Adding "cursor" (null, or the last cursor received to resume) switches to
+    the change feed: a snapshot with a cursor, then only new rows ("delta")
+    or a "heartbeat" when nothing changed (see table_changes)
     """
     await websocket.accept()
     
@@ -391,61 +514,28 @@ async def websocket_raw_data(websocket: WebSocket):
             end_date = params.get("end_date")
         except asyncio.TimeoutError:
             # Use default 24hr if no params received
+            params = {}
             start_date = None
             end_date = None
         
-        while True:
-            df = load_data()
-            now = datetime.now()
-            
-            # Set date range
-            if start_date and end_date:
-                try:
-                    start_dt = datetime.strptime(start_date, "%Y-%m-%d")
-                    end_dt = datetime.strptime(end_date, "%Y-%m-%d") + timedelta(days=1) - timedelta(seconds=1)
-                except ValueError:
-                    await websocket.send_json({
-                        "error": "Invalid date format. Use YYYY-MM-DD"
-                    })
-                    await websocket.close()
-                    return
-            else:
-                # Default: Last 24 hours
-                start_dt = now - timedelta(hours=24)
-                end_dt = now
-            
-            # Filter data
-            filtered_df = df[(df['DateTime'] >= start_dt) & (df['DateTime'] <= end_dt)].copy()
-            
-            # Convert to original format (list of records)
-            # Replace NaN values with None/empty strings before serialization
-            filtered_df = filtered_df.fillna('')
-            
-            records = []
-            for _, row in filtered_df.iterrows():
-                record = {
-                    "Date": str(row['Date']) if row['Date'] else '',
-                    "Timestamp": str(row['Timestamp']) if row['Timestamp'] else '',
-                    "Total_Food": int(row['Total Food']) if row['Total Food'] else 0,
-                    "Total_Drinks": int(row['Total Drinks']) if row['Total Drinks'] else 0,
-                    "Total_Parcels": int(row['Total Parcels']) if row['Total Parcels'] else 0,
-                    "Video_Path": str(row.get('Video_Path', '')) if row.get('Video_Path') else '',
-                    "DateTime": row['DateTime'].strftime("%Y-%m-%d %H:%M:%S")
-                }
-                records.append(record)
-            
-            response = {
-                "start_date": start_dt.strftime("%Y-%m-%d"),
-                "end_date": end_dt.strftime("%Y-%m-%d"),
-                "total_records": len(records),
-                "data": records,
-                "timestamp": now.strftime("%Y-%m-%d %H:%M:%S")
-            }
-            
-            # Ensure proper JSON serialization (no NaN values)
-            await websocket.send_text(json.dumps(response, default=str))
-            await asyncio.sleep(5)  # Send updates every 5 seconds
-            
+        if start_date and end_date:
+            try:
+                date_range(start_date, end_date)
+            except ValueError:
+                await websocket.send_json({
+                    "error": "Invalid date format. Use YYYY-MM-DD"
+                })
+                await websocket.close()
+                return
+
+        if "cursor" in params:
+            # Change feed: snapshot + cursor first, then only new rows (or a heartbeat)
+            await hub.serve_changes(websocket, ("raw-data-changes", start_date, end_date),
+                                    lambda cursor: table_changes(EVENTS, raw_records, start_date, end_date, cursor),
+                                    params["cursor"])
+        else:
+            await hub.serve(websocket, ("raw-data", start_date, end_date), lambda: raw_data_view(start_date, end_date))
+
     except WebSocketDisconnect:
         print("Client disconnected from /ws/raw-data")
     except Exception as e:
@@ -555,6 +645,7 @@ async def websocket_food_data(websocket: WebSocket):
     
     Default → Last 24 hours
     Updates every 5 seconds
+    Add "cursor" for the change feed, as in /ws/raw-data
     """
     await websocket.accept()
 
@@ -564,96 +655,84 @@ async def websocket_food_data(websocket: WebSocket):
             params = await asyncio.wait_for(websocket.receive_json(), timeout=2.0)
             start_date = params.get("start_date")
             end_date = params.get("end_date")
-        except:
+        except Exception:
+            # No (valid) params in time: default 24hr; cancellation still propagates
+            params = {}
             start_date = end_date = None
 
-        while True:
+        if start_date and end_date:
             try:
-                excel_path = os.path.join("Data", "Food_count.xlsx")
-                df = pd.read_excel(excel_path)
-
-                # Create DateTime field
-                df['DateTime'] = pd.to_datetime(df['Date'] + " " + df['Time'])
-
-                now = datetime.now()
-
-                # Filter by user date range or last 24 hours
-                if start_date and end_date:
-                    start_dt = datetime.strptime(start_date, "%Y-%m-%d")
-                    end_dt = datetime.strptime(end_date, "%Y-%m-%d") + timedelta(days=1) - timedelta(seconds=1)
-                else:
-                    start_dt = now - timedelta(hours=24)
-                    end_dt = now
-
-                filtered_df = df[(df['DateTime'] >= start_dt) & (df['DateTime'] <= end_dt)].copy()
-                filtered_df = filtered_df.fillna('')
-
-                # Convert dataframe rows → JSON structure
-                records = []
-                for _, row in filtered_df.iterrows():
-                    records.append({
-                        "Date": row['Date'],
-                        "Time": row['Time'],
-                        "Food_Count": int(row['Food Count']),
-                        "Frame_name": str(row['Frame_name']),
-                        "DateTime": row['DateTime'].strftime("%Y-%m-%d %H:%M:%S")
-                    })
-
-                response = {
-                    "start_date": start_dt.strftime("%Y-%m-%d"),
-                    "end_date": end_dt.strftime("%Y-%m-%d"),
-                    "total_records": len(records),
-                    "data": records,
-                    "timestamp": now.strftime("%Y-%m-%d %H:%M:%S")
-                }
-
-                await websocket.send_json(response)
-                await asyncio.sleep(5)
-
-            except Exception as e:
+                date_range(start_date, end_date)
+            except ValueError as e:
                 await websocket.send_json({"error": str(e)})
-                break
+                await websocket.close()
+                return
+
+        if "cursor" in params:
+            await hub.serve_changes(websocket, ("food-data-changes", start_date, end_date),
+                                    lambda cursor: table_changes(FOOD_COUNTS, food_records, start_date, end_date, cursor),
+                                    params["cursor"])
+        else:
+            await hub.serve(websocket, ("food-data", start_date, end_date), lambda: food_data_view(start_date, end_date))
 
     except WebSocketDisconnect:
         print("Client disconnected from /ws/food-data")
+    except Exception as e:
+        await websocket.send_json({"error": str(e)})
+        await websocket.close()
 
-# ============ REST ENDPOINT: Get Food Frame Base64 ============
+# ============ REST ENDPOINT: Get Food Frame ============
 
-@app.get("/food-frame/{frame_name}", tags=["Food Frames"])
-async def get_food_frame(frame_name: str):
-    import base64
-    frame_folder = "fwc_frames"
+FRAME_FOLDER = "fwc_frames"
+# Frame names carry their capture time and are never rewritten, so browsers may keep them for a year
+FRAME_CACHE_CONTROL = "public, max-age=31536000, immutable"
 
-    try:
-        frame_path = os.path.join(frame_folder, frame_name)
 
-        if not os.path.exists(frame_path):
-            return JSONResponse(
-                status_code=404,
-                content={"error": f"Frame not found: {frame_name}"}
-            )
+def frame_etag(stat):
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
 
-        # Read file and convert to Base64
-        with open(frame_path, "rb") as f:
-            img_data = f.read()
-            b64 = base64.b64encode(img_data).decode("utf-8")
 
-        ext = frame_name.lower().split('.')[-1]
-        mime = {"jpg": "image/jpeg", "jpeg": "image/jpeg",
-                "png": "image/png"}.get(ext, "image/jpeg")
+def frame_not_modified(request: Request, etag: str, stat) -> bool:
+    """Conditional GET: If-None-Match wins over If-Modified-Since, as in RFC 9110"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(stat.st_mtime) <= int(parsedate_to_datetime(if_modified_since).timestamp())
+        except (TypeError, ValueError):
+            return False
+    return False
 
-        return {
-            "frame_name": frame_name,
-            "image_base64": b64,
-            "content_type": mime,
-            "size_bytes": len(img_data)
-        }
 
+@app.get("/food-frame/{frame_name}", tags=["Food Frames"])
+async def get_food_frame(frame_name: str, request: Request,
+                         size: str = Query("full", description="full, medium or thumb")):
+    if frame_name != os.path.basename(frame_name) or size not in ("full", *FRAME_VARIANTS):
+        return JSONResponse(status_code=404, content={"error": f"Frame not found: {frame_name}"})
+
+    try:
+        # Variant generation and stat() touch the disk, so they run on a worker thread
+        frame_path = await asyncio.to_thread(ensure_variant, FRAME_FOLDER, frame_name, size)
+        stat = await asyncio.to_thread(os.stat, frame_path)
+    except FileNotFoundError:
+        return JSONResponse(status_code=404, content={"error": f"Frame not found: {frame_name}"})
     except Exception as e:
-        return JSONResponse(
-            status_code=500,
-            content={"error": str(e)}
-        )
+        return JSONResponse(status_code=500, content={"error": str(e)})
+
+    etag = frame_etag(stat)
+    headers = {"Cache-Control": FRAME_CACHE_CONTROL, "ETag": etag,
+               "Last-Modified": formatdate(stat.st_mtime, usegmt=True)}
+    if frame_not_modified(request, etag, stat):
+        return Response(status_code=304, headers=headers)
+
+    ext = frame_name.lower().split('.')[-1]
+    mime = {"jpg": "image/jpeg", "jpeg": "image/jpeg",
+            "png": "image/png"}.get(ext, "image/jpeg")
+    # FileResponse streams the file from a thread pool, never blocking the event loop
+    return FileResponse(frame_path, media_type=mime, headers=headers, stat_result=stat)
 
 
 
@@ -663,16 +742,17 @@ async def health_check():
     """Health check endpoint"""
     try:
         df = load_data()
-        latest_time = df['DateTime'].max()
-        earliest_time = df['DateTime'].min()
+        earliest_time = df['DateTime'].iloc[0]
+        latest_time = df['DateTime'].iloc[-1]
         return {
             "status": "healthy",
             "total_records": len(df),
-            "data_file": DATA_FILE,
+            "data_file": DATA_STORE if os.path.isfile(DATA_STORE) else DATA_FILE,
             "data_range": {
                 "earliest": earliest_time.strftime("%Y-%m-%d %H:%M:%S"),
                 "latest": latest_time.strftime("%Y-%m-%d %H:%M:%S")
-            }
+            },
+            "broadcast": hub.stats()
         }
     except Exception as e:
         return {
@@ -680,5 +760,26 @@ async def health_check():
             "error": str(e)
         }
 
+def read_metrics_snapshots():
+    """Every metrics_*.json snapshot that can be read right now"""
+    snapshots = []
+    for path in sorted(glob.glob(METRICS_FILES)):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                snapshots.append(json.load(f))
+        except (OSError, ValueError):
+            # Skip a file that is missing or being replaced
+            continue
+    return snapshots
+
+
+# Prometheus metrics published by the video scripts
+@app.get("/metrics", tags=["Health"])
+async def metrics():
+    """Stage timers and counters of the video pipeline in Prometheus text format"""
+    # File reads run on a worker thread so the event loop keeps serving websockets
+    snapshots = await asyncio.to_thread(read_metrics_snapshots)
+    return PlainTextResponse(render_prometheus(snapshots), media_type="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
     uvicorn.run("app:app", host="127.0.0.1", port=8000, reload=True)
\ No newline at end of file
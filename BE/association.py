@@ -0,0 +1,111 @@
+# Track-to-detection association for CentroidTracker
+import numpy as np
+from scipy.spatial import cKDTree #type: ignore
+from scipy.sparse import coo_matrix #type: ignore
+from scipy.sparse.csgraph import connected_components #type: ignore
+from scipy.optimize import linear_sum_assignment #type: ignore
+
+
+def gated_candidates(track_points, track_codes, det_points, det_codes, max_distance):
+    """
+    Candidate (track, detection) pairs within max_distance of each other and of the same category.
+
+    Uses KD-trees so only nearby pairs are ever scored instead of a dense
+    tracks x detections distance matrix. Returns (rows, cols, dists) arrays.
+    """
+    empty = (np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp), np.empty(0))
+    if len(track_points) == 0 or len(det_points) == 0:
+        return empty
+    track_tree = cKDTree(np.asarray(track_points, dtype=np.float64))
+    det_tree = cKDTree(np.asarray(det_points, dtype=np.float64))
+    pairs = track_tree.sparse_distance_matrix(det_tree, max_distance, output_type='ndarray')
+    if len(pairs) == 0:
+        return empty
+    rows = pairs['i'].astype(np.intp)
+    cols = pairs['j'].astype(np.intp)
+    dists = pairs['v']
+    same = np.asarray(track_codes)[rows] == np.asarray(det_codes)[cols]
+    return rows[same], cols[same], dists[same]
+
+
+def greedy_assign(rows, cols, dists, n_tracks, n_dets):
+    """
+    Closest pair first; each track and detection is used at most once.
+
+    Solvers take the gated candidate pairs and return the matched subset as
+    (rows, cols, dists).
+    """
+    order = np.lexsort((cols, rows, dists))
+    used_rows = np.zeros(n_tracks, dtype=bool)
+    used_cols = np.zeros(n_dets, dtype=bool)
+    matched = []
+    for k in order:
+        row, col = rows[k], cols[k]
+        if used_rows[row] or used_cols[col]:
+            continue
+        used_rows[row] = True
+        used_cols[col] = True
+        matched.append(k)
+    matched = np.array(matched, dtype=np.intp)
+    return rows[matched], cols[matched], dists[matched]
+
+
+def optimal_assign(rows, cols, dists, n_tracks, n_dets):
+    """
+    Minimum total distance assignment (Hungarian) on the sparse candidate set.
+
+    The candidate graph is split into connected components and
+    linear_sum_assignment runs on each small component separately, so the cost
+    stays proportional to the crowded areas rather than tracks x detections.
+    """
+    if len(rows) == 0:
+        return rows, cols, dists
+    graph = coo_matrix((np.ones(len(rows)), (rows, cols + n_tracks)), shape=(n_tracks + n_dets,) * 2)
+    _, labels = connected_components(graph, directed=False)
+    edge_labels = labels[rows]
+
+    matched_rows = []
+    matched_cols = []
+    matched_dists = []
+    order = np.argsort(edge_labels, kind='stable')
+    bounds = np.flatnonzero(np.diff(edge_labels[order])) + 1
+    for group in np.split(order, bounds):
+        if len(group) == 1:
+            matched_rows.append(rows[group[0]])
+            matched_cols.append(cols[group[0]])
+            matched_dists.append(dists[group[0]])
+            continue
+        r_ids, r_idx = np.unique(rows[group], return_inverse=True)
+        c_ids, c_idx = np.unique(cols[group], return_inverse=True)
+        # Pairs outside the gate get a cost no real pair can reach and are discarded after solving
+        blocked = dists[group].max() * (len(group) + 1) + 1.0
+        cost = np.full((len(r_ids), len(c_ids)), blocked)
+        cost[r_idx, c_idx] = dists[group]
+        sol_r, sol_c = linear_sum_assignment(cost)
+        keep = cost[sol_r, sol_c] < blocked
+        matched_rows.extend(r_ids[sol_r[keep]])
+        matched_cols.extend(c_ids[sol_c[keep]])
+        matched_dists.extend(cost[sol_r[keep], sol_c[keep]])
+
+    return (np.array(matched_rows, dtype=np.intp), np.array(matched_cols, dtype=np.intp),
+            np.array(matched_dists, dtype=np.float64))
+
+
+ASSOCIATION_METHODS = {
+    'greedy': greedy_assign,
+    'optimal': optimal_assign,
+}
+
+
+def associate(track_points, track_codes, det_points, det_codes, max_distance, method='greedy'):
+    """
+    Match tracks to detections.
+
+    method is 'greedy', 'optimal' or a callable with the same signature as
+    greedy_assign. Returns (rows, cols) ordered by match distance.
+    """
+    solver = ASSOCIATION_METHODS[method] if isinstance(method, str) else method
+    rows, cols, dists = gated_candidates(track_points, track_codes, det_points, det_codes, max_distance)
+    matched_rows, matched_cols, matched_dists = solver(rows, cols, dists, len(track_points), len(det_points))
+    order = np.lexsort((matched_rows, matched_dists))
+    return matched_rows[order], matched_cols[order]
@@ -0,0 +1,271 @@
+# Detection-replay benchmark and synthetic load generator for the tracking path (no model or video needed)
+import argparse
+import contextlib
+import json
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+from tracker import CentroidTracker, get_counts_by_roi, draw_trails
+from zones import ZoneMap
+from event_log import EventWriter, DELIVERY_COLUMNS, delivery_row
+
+# Same kitchen ROI as main.py, used for synthetic streams
+DEFAULT_FRAME_SIZE = (1920, 1080)
+DEFAULT_ROI = [[368, 518], [709, 245], [865, 317], [1222, 30], [1502, 114],
+               [1345, 726], [1558, 822], [1471, 1074], [811, 1070],
+               [372, 1068], [324, 1036], [602, 668]]
+STAGES = ('update', 'counts', 'trails', 'callback')
+
+
+class DetectionLog:
+    """
+    Per-frame tracker detections in a compact .npz file.
+
+    All centroids are stored in one int32 array with per-frame counts and
+    small category codes, so a full day of detections stays a few MB.
+    """
+    def __init__(self, frame_size=DEFAULT_FRAME_SIZE, kitchen_roi=DEFAULT_ROI):
+        self.frame_size = tuple(frame_size)
+        self.kitchen_roi = np.asarray(kitchen_roi, dtype=np.int32)
+        self.frame_indices = []
+        self.counts = []
+        self.centroids = []
+        self.codes = []
+        self.category_names = []
+        self._category_codes = {}
+
+    def add(self, frame_index, detections):
+        self.frame_indices.append(frame_index)
+        self.counts.append(len(detections))
+        for centroid, category in detections:
+            code = self._category_codes.get(category)
+            if code is None:
+                code = self._category_codes[category] = len(self.category_names)
+                self.category_names.append(category)
+            self.centroids.append(centroid)
+            self.codes.append(code)
+
+    def __len__(self):
+        return len(self.frame_indices)
+
+    def save(self, path):
+        np.savez_compressed(path,
+                            frame_indices=np.array(self.frame_indices, dtype=np.int64),
+                            counts=np.array(self.counts, dtype=np.int32),
+                            centroids=np.array(self.centroids, dtype=np.int32).reshape(-1, 2),
+                            codes=np.array(self.codes, dtype=np.int8),
+                            category_names=np.array(self.category_names, dtype=str),
+                            frame_size=np.array(self.frame_size, dtype=np.int32),
+                            kitchen_roi=self.kitchen_roi)
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        log = cls(tuple(int(v) for v in data['frame_size']), data['kitchen_roi'])
+        log.category_names = [str(n) for n in data['category_names']]
+        log._category_codes = {n: i for i, n in enumerate(log.category_names)}
+        log.frame_indices = data['frame_indices'].tolist()
+        log.counts = data['counts'].tolist()
+        log.centroids = [tuple(p) for p in data['centroids'].tolist()]
+        log.codes = data['codes'].tolist()
+        return log
+
+    def frames(self):
+        """Yield (frame_index, detections) in the shape CentroidTracker.update expects"""
+        start = 0
+        for frame_index, count in zip(self.frame_indices, self.counts):
+            yield frame_index, [(self.centroids[i], self.category_names[self.codes[i]])
+                                for i in range(start, start + count)]
+            start += count
+
+
+def synthetic_log(frames=2000, objects=20, speed=6.0, categories=("Food", "Drink", "Parcel"),
+                  crossing_rate=0.5, miss_rate=0.05, lifetime=(100, 400), frame_size=DEFAULT_FRAME_SIZE,
+                  kitchen_roi=DEFAULT_ROI, seed=0):
+    """
+    Synthetic detection stream with about `objects` objects in view at a time.
+
+    Objects appear inside the kitchen ROI; a crossing_rate share of them walk
+    out of it in a straight line at `speed` px per frame (deliveries, with
+    some coming back), the rest wander inside. Each detection is missed with
+    probability miss_rate so tracks also age and expire.
+    """
+    rng = np.random.default_rng(seed)
+    width, height = frame_size
+    zone_map = ZoneMap({"kitchen": kitchen_roi}, frame_size)
+    inside = np.argwhere(zone_map.labels > 0)[:, ::-1]
+    log = DetectionLog(frame_size, kitchen_roi)
+
+    positions = np.zeros((0, 2))
+    velocities = np.zeros((0, 2))
+    remaining = np.zeros(0, dtype=np.int64)
+    crossing = np.zeros(0, dtype=bool)
+    labels = np.zeros(0, dtype=np.int64)
+    for frame_index in range(frames):
+        spawn = max(0, objects - len(positions))
+        if spawn:
+            angles = rng.uniform(0, 2 * np.pi, spawn)
+            positions = np.vstack([positions, inside[rng.integers(0, len(inside), spawn)].astype(float)])
+            velocities = np.vstack([velocities, np.column_stack([np.cos(angles), np.sin(angles)]) * speed])
+            remaining = np.concatenate([remaining, rng.integers(lifetime[0], lifetime[1] + 1, spawn)])
+            crossing = np.concatenate([crossing, rng.random(spawn) < crossing_rate])
+            labels = np.concatenate([labels, rng.integers(0, len(categories), spawn)])
+
+        # Wanderers turn randomly, crossers keep heading out and sometimes turn back
+        turn = ~crossing | (rng.random(len(positions)) < 0.01)
+        jitter = rng.normal(0, 0.3, len(positions))
+        cos, sin = np.cos(jitter), np.sin(jitter)
+        turned = np.column_stack([velocities[:, 0] * cos - velocities[:, 1] * sin,
+                                  velocities[:, 0] * sin + velocities[:, 1] * cos])
+        velocities = np.where(turn[:, None], turned, velocities)
+        velocities[crossing & (rng.random(len(positions)) < 0.005)] *= -1
+        positions += velocities
+        remaining -= 1
+
+        alive = (remaining > 0) & (positions[:, 0] >= 0) & (positions[:, 0] < width) \
+            & (positions[:, 1] >= 0) & (positions[:, 1] < height)
+        positions, velocities, remaining = positions[alive], velocities[alive], remaining[alive]
+        crossing, labels = crossing[alive], labels[alive]
+
+        seen = rng.random(len(positions)) >= miss_rate
+        log.add(frame_index, [((int(x), int(y)), categories[c])
+                              for (x, y), c in zip(positions[seen], labels[seen])])
+    return log
+
+
+def _percentiles(samples):
+    samples = np.asarray(samples) * 1000.0
+    if len(samples) == 0:
+        return {'p50_ms': 0.0, 'p99_ms': 0.0, 'mean_ms': 0.0}
+    return {'p50_ms': float(np.percentile(samples, 50)), 'p99_ms': float(np.percentile(samples, 99)),
+            'mean_ms': float(samples.mean())}
+
+
+def replay(log, association='optimal', use_zone_map=True, max_disappeared=10, max_distance=100,
+           trail_length=30, measure_allocations=True):
+    """
+    Replay a detection log through the tracker, counts, trails and logging callback.
+
+    Returns per-stage latency percentiles, overall frames/sec, event count and,
+    with measure_allocations, the per-frame peak of traced Python allocations
+    from a second pass under tracemalloc.
+    """
+    kitchen_roi = log.kitchen_roi
+    roi = ZoneMap({"kitchen": kitchen_roi}, log.frame_size) if use_zone_map else kitchen_roi
+    width, height = log.frame_size
+    canvas = np.zeros((height, width, 3), dtype=np.uint8)
+    store_dir = tempfile.mkdtemp(prefix="tracker_bench_")
+
+    def run(timed):
+        writer = EventWriter(os.path.join(store_dir, f"events_{timed}.csv"), DELIVERY_COLUMNS,
+                             flush_interval=3600, max_batch=10 ** 9).start()
+        callback_time = [0.0]
+
+        def logging_callback(category, change):
+            t0 = time.perf_counter()
+            writer.log(delivery_row("2025-01-01", "12:00:00 PM", category, change, "N/A"))
+            callback_time[0] += time.perf_counter() - t0
+
+        tracker = CentroidTracker(max_disappeared=max_disappeared, max_distance=max_distance,
+                                  trail_length=trail_length, csv_callback=logging_callback,
+                                  association=association)
+        timings = {stage: [] for stage in STAGES}
+        allocations = []
+        for _, detections in log.frames():
+            if not timed:
+                tracemalloc.reset_peak()
+                base = tracemalloc.get_traced_memory()[0]
+            callback_time[0] = 0.0
+            t0 = time.perf_counter()
+            tracker.update(detections, roi)
+            t1 = time.perf_counter()
+            get_counts_by_roi(tracker, kitchen_roi)
+            t2 = time.perf_counter()
+            draw_trails(canvas, tracker)
+            t3 = time.perf_counter()
+            if timed:
+                timings['update'].append(t1 - t0 - callback_time[0])
+                timings['counts'].append(t2 - t1)
+                timings['trails'].append(t3 - t2)
+                timings['callback'].append(callback_time[0])
+            else:
+                allocations.append(tracemalloc.get_traced_memory()[1] - base)
+        events = writer.events_logged
+        writer.close()
+        return timings, allocations, events
+
+    # Tracker status prints go to devnull so they cost what they cost without flooding the report
+    devnull = open(os.devnull, "w")
+    try:
+        with contextlib.redirect_stdout(devnull):
+            timings, _, events = run(True)
+        report = {stage: _percentiles(timings[stage]) for stage in STAGES}
+        per_frame = np.sum([timings[stage] for stage in STAGES], axis=0) if len(log) else np.zeros(0)
+        report['frame'] = _percentiles(per_frame)
+        report['frames'] = len(log)
+        report['fps'] = float(len(per_frame) / per_frame.sum()) if per_frame.sum() > 0 else 0.0
+        report['events'] = events
+        if measure_allocations:
+            tracemalloc.start()
+            try:
+                with contextlib.redirect_stdout(devnull):
+                    _, allocations, _ = run(False)
+            finally:
+                tracemalloc.stop()
+            allocations = np.asarray(allocations, dtype=np.float64)
+            report['alloc_peak_kb'] = {'mean': float(allocations.mean() / 1024) if len(allocations) else 0.0,
+                                       'max': float(allocations.max() / 1024) if len(allocations) else 0.0}
+    finally:
+        devnull.close()
+        shutil.rmtree(store_dir, ignore_errors=True)
+    return report
+
+
+def print_report(report, title):
+    print(f"\n{title}: {report['frames']} frames, {report['events']} events, {report['fps']:.0f} frames/sec")
+    print(f"{'stage':<10}{'p50 ms':>10}{'p99 ms':>10}{'mean ms':>10}")
+    for stage in STAGES + ('frame',):
+        s = report[stage]
+        print(f"{stage:<10}{s['p50_ms']:>10.3f}{s['p99_ms']:>10.3f}{s['mean_ms']:>10.3f}")
+    if 'alloc_peak_kb' in report:
+        a = report['alloc_peak_kb']
+        print(f"Allocations: per-frame peak {a['mean']:.1f} KB mean, {a['max']:.1f} KB max")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the tracking path on recorded or synthetic detections")
+    parser.add_argument("detections", nargs="?", help=".npz written by main.py (detection_log_path); synthetic if omitted")
+    parser.add_argument("--frames", type=int, default=2000)
+    parser.add_argument("--objects", type=int, default=20)
+    parser.add_argument("--speed", type=float, default=6.0)
+    parser.add_argument("--categories", default="Food,Drink,Parcel")
+    parser.add_argument("--crossing-rate", type=float, default=0.5)
+    parser.add_argument("--miss-rate", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--association", default="optimal", choices=["greedy", "optimal"])
+    parser.add_argument("--polygon", action="store_true", help="Pass the raw ROI polygon instead of a ZoneMap")
+    parser.add_argument("--no-alloc", action="store_true", help="Skip the tracemalloc pass")
+    parser.add_argument("--save", help="Also save the (synthetic) detections to this .npz")
+    parser.add_argument("--json", help="Write the report to this file")
+    args = parser.parse_args()
+
+    if args.detections:
+        log = DetectionLog.load(args.detections)
+        title = os.path.basename(args.detections)
+    else:
+        log = synthetic_log(frames=args.frames, objects=args.objects, speed=args.speed,
+                            categories=tuple(args.categories.split(",")), crossing_rate=args.crossing_rate,
+                            miss_rate=args.miss_rate, seed=args.seed)
+        title = f"synthetic ({args.objects} objects, speed {args.speed})"
+    if args.save:
+        log.save(args.save)
+
+    report = replay(log, association=args.association, use_zone_map=not args.polygon,
+                    measure_allocations=not args.no_alloc)
+    print_report(report, title)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
@@ -0,0 +1,193 @@
+# Websocket broadcast hub: one computation per distinct view, fanned out to every subscriber
+import asyncio
+import json
+
+BROADCAST_INTERVAL = 5  # seconds between view updates
+SEND_TIMEOUT = 10  # a client that takes longer than this to accept one update is disconnected
+
+
+def serialize(payload):
+    return json.dumps(payload, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+class Update:
+    """A serialized view update; change feeds also record the cursor range it covers"""
+    def __init__(self, text, from_cursor=None, to_cursor=None):
+        self.text = text
+        self.from_cursor = from_cursor
+        self.to_cursor = to_cursor
+
+
+class Subscriber:
+    """One websocket's latest-only mailbox; an unsent update is replaced by the next one"""
+    def __init__(self, websocket, cursor=None):
+        self.websocket = websocket
+        # Change feeds: position of the last update this client received
+        self.cursor = cursor
+        self._message = None
+        self._final = False
+        self._ready = asyncio.Event()
+        self.skipped = 0
+
+    def offer(self, message, final=False):
+        if self._message is not None:
+            self.skipped += 1
+        self._message = message
+        self._final = self._final or final
+        self._ready.set()
+
+    async def next(self):
+        await self._ready.wait()
+        self._ready.clear()
+        message, self._message = self._message, None
+        return message, self._final
+
+
+class View:
+    """Background task recomputing one view every interval and offering the serialized payload to its subscribers"""
+    def __init__(self, key, compute_fn, interval):
+        self.key = key
+        self.compute_fn = compute_fn
+        self.interval = interval
+        self.subscribers = set()
+        self.last_message = None
+        self.last_final = False
+        self.computes = 0
+        self.task = None
+
+    async def run(self):
+        """Offer an update every interval; returns after offering a final (error) update"""
+        while True:
+            final = False
+            try:
+                # pandas work runs on a worker thread so the event loop keeps serving sockets
+                payload = await asyncio.to_thread(self.compute_fn)
+            except Exception as e:
+                payload, final = {"error": str(e)}, True
+            self.computes += 1
+            self.last_message = Update(serialize(payload))
+            self.last_final = final
+            for subscriber in list(self.subscribers):
+                subscriber.offer(self.last_message, final)
+            if final:
+                return
+            await asyncio.sleep(self.interval)
+
+
+class ChangeView(View):
+    """
+    View sent as changes: compute_fn(cursor) returns a payload with a new
+    "cursor" holding what changed since cursor (a snapshot for None).
+
+    Each tick computes the changes since the previous tick once. Clients at
+    that cursor get the shared text; a client elsewhere (new, resuming or
+    having skipped an update) gets its own catch-up computed from its cursor.
+    """
+    def __init__(self, key, compute_fn, interval):
+        super().__init__(key, compute_fn, interval)
+        self.cursor = None
+
+    async def run(self):
+        while True:
+            final = False
+            try:
+                payload = await asyncio.to_thread(self.compute_fn, self.cursor)
+            except Exception as e:
+                payload, final = {"error": str(e)}, True
+            self.computes += 1
+            to_cursor = payload.get("cursor", self.cursor)
+            self.last_message = Update(serialize(payload), self.cursor, to_cursor)
+            self.last_final = final
+            self.cursor = to_cursor
+            for subscriber in list(self.subscribers):
+                subscriber.offer(self.last_message, final)
+            if final:
+                return
+            await asyncio.sleep(self.interval)
+
+
+class BroadcastHub:
+    """
+    Websocket fan-out keyed by view.
+
+    serve() subscribes a connection to the view for its key (e.g. endpoint
+    and period). The first subscriber starts a task that computes the payload
+    every interval and serializes it once; the last one to leave stops it, so
+    server work follows the number of distinct views, not connections. Each
+    connection sends from its own latest-only mailbox, so a slow browser
+    skips stale updates instead of delaying the others, and is disconnected
+    if a single send stalls for send_timeout seconds. A view whose compute
+    failed is dropped as soon as it has offered the error, so the next
+    connection for its key starts a new one and computes again.
+    """
+    def __init__(self, interval=BROADCAST_INTERVAL, send_timeout=SEND_TIMEOUT):
+        self.interval = interval
+        self.send_timeout = send_timeout
+        self.views = {}
+        self.slow_disconnects = 0
+
+    async def serve(self, websocket, key, compute_fn):
+        """Send the view's updates to websocket until it disconnects or the view fails"""
+        await self._serve(websocket, key, compute_fn, View)
+
+    async def serve_changes(self, websocket, key, compute_fn, cursor=None):
+        """Like serve() for a ChangeView; cursor resumes a client that was already up to date there"""
+        await self._serve(websocket, key, compute_fn, ChangeView, cursor)
+
+    async def _serve(self, websocket, key, compute_fn, view_class, cursor=None):
+        view = self.views.get(key)
+        if view is None:
+            view = self.views[key] = view_class(key, compute_fn, self.interval)
+            view.task = asyncio.create_task(self._run(view))
+        subscriber = Subscriber(websocket, cursor)
+        view.subscribers.add(subscriber)
+        if view.last_message is not None:
+            subscriber.offer(view.last_message, view.last_final)
+        try:
+            while True:
+                message, final = await subscriber.next()
+                if message is not None:
+                    text = message.text
+                    if message.from_cursor != subscriber.cursor and not final:
+                        # Not at the position this update starts from: send this client its own catch-up
+                        payload = await asyncio.to_thread(view.compute_fn, subscriber.cursor)
+                        text = serialize(payload)
+                        subscriber.cursor = payload.get("cursor", subscriber.cursor)
+                    else:
+                        subscriber.cursor = message.to_cursor
+                    try:
+                        await asyncio.wait_for(websocket.send_text(text), self.send_timeout)
+                    except asyncio.TimeoutError:
+                        self.slow_disconnects += 1
+                        print(f"Disconnecting slow client from {key} (send stalled > {self.send_timeout}s)")
+                        await self._close(websocket)
+                        return
+                if final:
+                    await self._close(websocket)
+                    return
+        finally:
+            view.subscribers.discard(subscriber)
+            if not view.subscribers and self.views.get(key) is view:
+                view.task.cancel()
+                del self.views[key]
+
+    async def _run(self, view):
+        await view.run()
+        # Failed: its subscribers still get the error and are closed, new connections start over
+        if self.views.get(view.key) is view:
+            del self.views[view.key]
+
+    async def _close(self, websocket):
+        try:
+            await websocket.close()
+        except Exception:
+            pass
+
+    def stats(self):
+        return {
+            "views": len(self.views),
+            "subscribers": sum(len(v.subscribers) for v in self.views.values()),
+            "computes": sum(v.computes for v in self.views.values()),
+            "skipped_updates": sum(s.skipped for v in self.views.values() for s in v.subscribers),
+            "slow_disconnects": self.slow_disconnects,
+        }
@@ -0,0 +1,185 @@
+# Out-of-process clip encoder fed through a shared-memory frame ring
+import cv2 #type: ignore
+import numpy as np
+import os
+import queue
+import multiprocessing as mp
+from multiprocessing import shared_memory, resource_tracker
+from datetime import datetime
+
+
+class SharedFrameRing:
+    """Fixed number of frame-sized slots in one shared memory block"""
+    def __init__(self, slots, frame_shape, name=None):
+        self.slots = slots
+        self.frame_shape = tuple(frame_shape)
+        nbytes = int(np.prod(self.frame_shape)) * slots
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=nbytes)
+            self.owner = True
+        else:
+            self.shm = _attach_shared_memory(name)
+            self.owner = False
+        self.frames = np.ndarray((slots,) + self.frame_shape, dtype=np.uint8, buffer=self.shm.buf)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def close(self):
+        self.frames = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def _attach_shared_memory(name):
+    """Attach to an existing block without registering it, so only the creating process unlinks it"""
+    try:
+        # Python 3.13+
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        pass
+    # Older versions register every attach with the resource tracker, which then warns about a
+    # leak or unlinks the block when this process exits. Unregistering afterwards is no better
+    # when the tracker is shared with the parent (spawn), as it drops the parent's entry too.
+    register = resource_tracker.register
+    resource_tracker.register = lambda name, rtype: None if rtype == "shared_memory" else register(name, rtype)
+    try:
+        return shared_memory.SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
+
+
+def _encoder_main(ring_name, slots, frame_shape, frame_queue, free_queue, status, settings):
+    """Encoder process: owns the VideoWriter, clip rollover and naming"""
+    ring = SharedFrameRing(slots, frame_shape, name=ring_name)
+    height, width = frame_shape[:2]
+    fourcc = cv2.VideoWriter_fourcc(*settings["fourcc"])
+    out = None
+    clip_start_index = 0
+
+    def open_clip(frame_index):
+        nonlocal out, clip_start_index
+        start_time = datetime.now()
+        date_str = start_time.strftime("%Y-%m-%d")
+        output_filename = f"clip_{start_time.strftime('%Y%m%d_%H%M%S')}.mp4"
+        date_folder = os.path.join(settings["output_folder"], date_str)
+        os.makedirs(date_folder, exist_ok=True)
+        out = cv2.VideoWriter(os.path.join(date_folder, output_filename), fourcc, settings["fps"], (width, height))
+        clip_start_index = frame_index
+        with status["lock"]:
+            status["clip_number"].value += 1
+            status["clip_start_index"].value = frame_index
+            status["video_path"].value = os.path.join(date_str, output_filename).encode()[:1023]
+        print(f"\nRecording clip {status['clip_number'].value}: {output_filename}")
+
+    open_clip(0)
+    try:
+        while True:
+            message = frame_queue.get()
+            if message is None:
+                break
+            slot, frame_index = message
+            if frame_index - clip_start_index >= settings["frames_per_clip"]:
+                out.release()
+                print(f"Clip {status['clip_number'].value} saved: {status['video_path'].value.decode()}")
+                open_clip(frame_index)
+            out.write(ring.frames[slot])
+            free_queue.put(slot)
+            with status["lock"]:
+                status["frames_written"].value += 1
+    finally:
+        if out is not None:
+            out.release()
+        ring.close()
+
+
+class ClipEncoder:
+    """
+    Clip writer running in its own process.
+
+    Annotated frames are copied into a preallocated shared-memory ring slot and
+    only the slot number travels over the queue, so frames are never pickled.
+    The encoder process owns the VideoWriter, clip rollover every
+    frames_per_clip stream frames and naming under <output_folder>/<date>/,
+    and publishes the current clip path back through shared memory.
+
+    When every slot is still waiting to be encoded, policy decides what happens
+    to a new frame: "drop" drops it immediately, "block" waits up to
+    block_timeout seconds for a free slot before dropping it.
+    """
+    def __init__(self, output_folder, fps, frame_size, frames_per_clip, fourcc="mp4v",
+                 slots=8, policy="drop", block_timeout=1.0):
+        if policy not in ("drop", "block"):
+            raise ValueError(f"Unknown drop policy: {policy}")
+        width, height = frame_size
+        self.frames_per_clip = frames_per_clip
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.ring = SharedFrameRing(slots, (height, width, 3))
+        ctx = mp.get_context("spawn")
+        self.frame_queue = ctx.Queue()
+        self.free_queue = ctx.Queue()
+        for slot in range(slots):
+            self.free_queue.put(slot)
+        lock = ctx.Lock()
+        self.status = {
+            "lock": lock,
+            "clip_number": ctx.Value("i", 0, lock=False),
+            "clip_start_index": ctx.Value("q", 0, lock=False),
+            "frames_written": ctx.Value("q", 0, lock=False),
+            "video_path": ctx.Array("c", 1024, lock=False),
+        }
+        settings = {"output_folder": output_folder, "fps": fps, "fourcc": fourcc,
+                    "frames_per_clip": frames_per_clip}
+        self.process = ctx.Process(target=_encoder_main, name="clip-encoder", daemon=True,
+                                   args=(self.ring.name, slots, self.ring.frame_shape, self.frame_queue,
+                                         self.free_queue, self.status, settings))
+        self.frames_submitted = 0
+        self.frames_dropped = 0
+
+    def start(self):
+        self.process.start()
+        return self
+
+    @property
+    def clip_number(self):
+        return self.status["clip_number"].value
+
+    @property
+    def current_video_path(self):
+        with self.status["lock"]:
+            path = self.status["video_path"].value.decode()
+        return path or None
+
+    def frame_counter(self, frame_index):
+        """Number of stream frames since the encoder's current clip started"""
+        return frame_index - self.status["clip_start_index"].value
+
+    def roll_if_due(self, frame_index):
+        # Rollover is decided by the encoder process from the frame indices it receives
+        pass
+
+    def write(self, frame, frame_index):
+        """Hand a frame to the encoder, returns False if it was dropped"""
+        try:
+            if self.policy == "block":
+                slot = self.free_queue.get(timeout=self.block_timeout)
+            else:
+                slot = self.free_queue.get_nowait()
+        except queue.Empty:
+            self.frames_dropped += 1
+            return False
+        np.copyto(self.ring.frames[slot], frame)
+        self.frame_queue.put((slot, frame_index))
+        self.frames_submitted += 1
+        return True
+
+    def release(self):
+        if self.process.is_alive():
+            self.frame_queue.put(None)
+            self.process.join(timeout=30)
+        print(f"Encoder process: {self.frames_submitted} frames submitted, "
+              f"{self.status['frames_written'].value} written, {self.frames_dropped} dropped")
+        self.ring.close()
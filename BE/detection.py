@@ -0,0 +1,53 @@
+# Conversion of YOLO results into tracker detections
+import numpy as np
+
+CATEGORY_COLORS = {
+    "Drink": (255, 0, 0),
+    "Food": (0, 255, 0),
+    "Parcel": (0, 165, 255)
+}
+
+
+def crop_rect(roi, frame_size, margin):
+    """Bounding rectangle (x1, y1, x2, y2) of the ROI grown by margin px, clipped to the frame"""
+    width, height = frame_size
+    points = np.asarray(roi).reshape(-1, 2)
+    x1 = max(0, int(points[:, 0].min()) - margin)
+    y1 = max(0, int(points[:, 1].min()) - margin)
+    x2 = min(width, int(points[:, 0].max()) + margin + 1)
+    y2 = min(height, int(points[:, 1].max()) + margin + 1)
+    return x1, y1, x2, y2
+
+
+def result_arrays(result):
+    """Raw (xyxy, class ids, confidences) arrays of one YOLO result"""
+    boxes = result.boxes
+    xyxy = boxes.xyxy.cpu().numpy().astype(np.float32).reshape(-1, 4)
+    classes = boxes.cls.cpu().numpy().astype(np.int16).reshape(-1)
+    confs = boxes.conf.cpu().numpy().astype(np.float32).reshape(-1)
+    return xyxy, classes, confs
+
+
+def parse_detection_arrays(xyxy, classes, confs, class_names, target_classes, conf_threshold=0.0):
+    """
+    Turn raw (xyxy, class ids, confidences) arrays from a detector or the
+    detection cache into tracker detections plus the boxes to draw, dropping
+    boxes below conf_threshold and outside target_classes.
+
+    detections: [(centroid, category), ...] as expected by CentroidTracker.update
+    boxes:      [((x1, y1, x2, y2), centroid, category, conf), ...]
+    """
+    detections = []
+    boxes = []
+    for (x1, y1, x2, y2), cls_id, conf in zip(xyxy.tolist(), classes.tolist(), confs.tolist()):
+        if conf < conf_threshold:
+            continue
+        cls_name = class_names.get(cls_id, "unknown")
+        if cls_name not in target_classes:
+            continue
+        x1, y1, x2, y2 = int(x1), int(y1), int(x2), int(y2)
+        centroid = (int((x1 + x2) / 2), int((y1 + y2) / 2))
+        category = cls_name.capitalize()
+        detections.append((centroid, category))
+        boxes.append(((x1, y1, x2, y2), centroid, category, conf))
+    return detections, boxes
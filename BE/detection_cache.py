@@ -0,0 +1,132 @@
+# Persistent per-frame detection cache for re-runs on recorded videos
+import os
+import json
+import hashlib
+import numpy as np
+
+
+def file_fingerprint(path, sample_bytes=1 << 20):
+    """Fast content hash: file size plus the first, middle and last sample_bytes"""
+    size = os.path.getsize(path)
+    digest = hashlib.sha1(str(size).encode())
+    with open(path, "rb") as f:
+        for offset in sorted({0, max(0, size // 2 - sample_bytes // 2), max(0, size - sample_bytes)}):
+            f.seek(offset)
+            digest.update(f.read(sample_bytes))
+    return digest.hexdigest()
+
+
+def cache_key(video_path, model_paths, settings):
+    """Key of a cache entry: video content, model files (e.g. the weights and the ONNX file that runs) and every setting that changes raw detections"""
+    digest = hashlib.sha1()
+    digest.update(file_fingerprint(video_path).encode())
+    for model_path in model_paths:
+        digest.update(file_fingerprint(model_path).encode())
+    digest.update(json.dumps(settings, sort_keys=True, default=str).encode())
+    return digest.hexdigest()[:20]
+
+
+class DetectionCache:
+    """
+    Raw detections (boxes, class ids, confidences) per inferred frame, on disk.
+
+    Each entry is a folder of .npy columns: frames (frame index, start, count)
+    sorted by frame index, plus boxes / classes / confs for all frames
+    concatenated. Columns are opened memory-mapped, so a cached run reads only
+    the frames it asks for. New frames are kept in memory and merged in by
+    save(). Detections are stored down to the conf floor in settings so the
+    confidence threshold can still be tuned on cached runs.
+    """
+    COLUMNS = ('frames', 'boxes', 'classes', 'confs')
+
+    def __init__(self, folder, video_path, model_paths, settings):
+        self.key = cache_key(video_path, model_paths, settings)
+        self.path = os.path.join(folder, self.key)
+        self.meta = {'video': os.path.abspath(video_path), 'model': [os.path.abspath(p) for p in model_paths],
+                     'settings': settings, 'class_names': None}
+        self.columns = None
+        self.new = {}
+        self.hits = 0
+        self.misses = 0
+        meta_path = os.path.join(self.path, "meta.json")
+        if os.path.isfile(meta_path):
+            with open(meta_path, "r", encoding="utf-8") as f:
+                self.meta = json.load(f)
+            self.columns = {name: np.load(os.path.join(self.path, f"{name}.npy"), mmap_mode="r")
+                            for name in self.COLUMNS}
+
+    @property
+    def class_names(self):
+        """Model class names saved with the cache, or None before the model has run once"""
+        names = self.meta.get('class_names')
+        return {int(i): n for i, n in names.items()} if names else None
+
+    def set_class_names(self, class_names):
+        self.meta['class_names'] = {str(i): n for i, n in class_names.items()}
+
+    def __len__(self):
+        return (len(self.columns['frames']) if self.columns else 0) + len(self.new)
+
+    def _find(self, frame_index):
+        if self.columns is None:
+            return None
+        frames = self.columns['frames']
+        i = np.searchsorted(frames[:, 0], frame_index)
+        if i < len(frames) and frames[i, 0] == frame_index:
+            return int(frames[i, 1]), int(frames[i, 2])
+        return None
+
+    def has(self, frame_index):
+        return frame_index in self.new or self._find(frame_index) is not None
+
+    def get(self, frame_index):
+        """(xyxy, classes, confs) for a cached frame, or None"""
+        if frame_index in self.new:
+            self.hits += 1
+            return self.new[frame_index]
+        found = self._find(frame_index)
+        if found is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        start, count = found
+        return (self.columns['boxes'][start:start + count], self.columns['classes'][start:start + count],
+                self.columns['confs'][start:start + count])
+
+    def put(self, frame_index, xyxy, classes, confs):
+        self.new[frame_index] = (np.asarray(xyxy, dtype=np.float32).reshape(-1, 4),
+                                 np.asarray(classes, dtype=np.int16), np.asarray(confs, dtype=np.float32))
+
+    def save(self):
+        """Merge newly inferred frames into the on-disk entry"""
+        if not self.new:
+            return
+        entries = []
+        if self.columns is not None:
+            for frame_index, start, count in np.asarray(self.columns['frames']).tolist():
+                if frame_index not in self.new:
+                    entries.append((frame_index, np.asarray(self.columns['boxes'][start:start + count]),
+                                    np.asarray(self.columns['classes'][start:start + count]),
+                                    np.asarray(self.columns['confs'][start:start + count])))
+        entries.extend((frame_index,) + arrays for frame_index, arrays in self.new.items())
+        entries.sort(key=lambda e: e[0])
+        counts = np.array([len(e[2]) for e in entries], dtype=np.int64)
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]]).astype(np.int64)
+        data = {
+            'frames': np.column_stack([np.array([e[0] for e in entries], dtype=np.int64), starts, counts]),
+            'boxes': np.concatenate([e[1] for e in entries]).reshape(-1, 4).astype(np.float32),
+            'classes': np.concatenate([e[2] for e in entries]).astype(np.int16),
+            'confs': np.concatenate([e[3] for e in entries]).astype(np.float32),
+        }
+        # Release the memory maps before replacing the files they point at
+        self.columns = None
+        os.makedirs(self.path, exist_ok=True)
+        for name, array in data.items():
+            tmp_path = os.path.join(self.path, f"{name}.tmp.npy")
+            np.save(tmp_path, array)
+            os.replace(tmp_path, os.path.join(self.path, f"{name}.npy"))
+        with open(os.path.join(self.path, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(self.meta, f, indent=2)
+        self.new = {}
+        self.columns = {name: np.load(os.path.join(self.path, f"{name}.npy"), mmap_mode="r")
+                        for name in self.COLUMNS}
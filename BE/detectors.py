@@ -0,0 +1,418 @@
+# Pluggable detector backends (PyTorch, ONNX Runtime, int8 ONNX) with one output contract
+import argparse
+import ast
+import os
+import re
+import threading
+import time
+import cv2 #type: ignore
+import numpy as np
+from detection import result_arrays
+
+BACKENDS = ('pytorch', 'onnx', 'onnx-int8')
+
+
+class TorchDetector:
+    """
+    Ultralytics YOLO with PyTorch weights, as before.
+
+    Every backend has the same contract: predict(frame, conf) returns
+    (xyxy float32 Nx4, class ids int16, confidences float32) in frame
+    coordinates, predict_batch(frames, conf) returns one such tuple per
+    frame, and names maps class ids to the model's class names.
+    """
+    backend = 'pytorch'
+
+    def __init__(self, model_path, imgsz=None):
+        from ultralytics import YOLO #type: ignore
+        self.model = YOLO(model_path)
+        self.names = dict(self.model.names)
+        self.imgsz = imgsz
+
+    def predict(self, frame, conf=0.25):
+        predict_args = {"conf": conf, "verbose": False}
+        if self.imgsz:
+            predict_args["imgsz"] = self.imgsz
+        return result_arrays(self.model.predict(frame, **predict_args)[0])
+
+    def predict_batch(self, frames, conf=0.25):
+        """One batched model.predict over all frames (which may differ in size)"""
+        predict_args = {"conf": conf, "verbose": False}
+        if self.imgsz:
+            predict_args["imgsz"] = self.imgsz
+        return [result_arrays(result) for result in self.model.predict(list(frames), **predict_args)]
+
+
+def letterbox(frame, size):
+    """Resize keeping the aspect ratio and pad to size x size (gray 114, centred) like Ultralytics"""
+    height, width = frame.shape[:2]
+    gain = min(size / height, size / width)
+    new_w, new_h = int(round(width * gain)), int(round(height * gain))
+    pad_x, pad_y = (size - new_w) / 2, (size - new_h) / 2
+    resized = cv2.resize(frame, (new_w, new_h), interpolation=cv2.INTER_LINEAR) if (new_w, new_h) != (width, height) else frame
+    top, left = int(round(pad_y - 0.1)), int(round(pad_x - 0.1))
+    bottom, right = size - new_h - top, size - new_w - left
+    padded = cv2.copyMakeBorder(resized, top, bottom, left, right, cv2.BORDER_CONSTANT, value=(114, 114, 114))
+    return padded, gain, (left, top)
+
+
+def preprocess(frame, size):
+    """BGR frame -> 1x3xHxW float32 RGB tensor in [0, 1] plus the letterbox transform"""
+    padded, gain, pad = letterbox(frame, size)
+    blob = cv2.dnn.blobFromImage(padded, 1 / 255.0, swapRB=True)
+    return blob, gain, pad
+
+
+class OnnxDetector:
+    """
+    YOLO exported to ONNX, run with ONNX Runtime on the CPU.
+
+    Decodes the raw (1, 4 + classes, anchors) output and applies per-class
+    NMS the way Ultralytics does, so boxes match the PyTorch backend up to
+    numeric differences. Class names and input size come from the metadata
+    Ultralytics writes into the exported file. Also runs int8-quantized exports.
+    """
+    backend = 'onnx'
+
+    def __init__(self, onnx_path, iou=0.7, max_det=300, threads=None):
+        try:
+            import onnxruntime as ort #type: ignore
+        except ImportError as e:
+            raise ImportError("The onnx backends need onnxruntime and onnx: pip install -r requirements-onnx.txt") from e
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(onnx_path, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+        meta = self.session.get_modelmeta().custom_metadata_map
+        self.names = ast.literal_eval(meta["names"]) if "names" in meta else {}
+        shape = self.session.get_inputs()[0].shape
+        self.imgsz = int(ast.literal_eval(meta["imgsz"])[0]) if "imgsz" in meta else int(shape[2])
+        # Static exports take one image per run; a dynamic batch axis takes a whole batch at once
+        self.dynamic_batch = not isinstance(shape[0], int)
+        self.iou = iou
+        self.max_det = max_det
+
+    def predict(self, frame, conf=0.25):
+        return self.predict_batch([frame], conf)[0]
+
+    def predict_batch(self, frames, conf=0.25):
+        """Letterboxes every frame; one session run for the batch if the export allows it, else one per frame"""
+        inputs = [preprocess(frame, self.imgsz) for frame in frames]
+        if not inputs:
+            return []
+        if self.dynamic_batch:
+            outputs = self.session.run(None, {self.input_name: np.concatenate([blob for blob, _, _ in inputs])})[0]
+        else:
+            outputs = [self.session.run(None, {self.input_name: blob})[0][0] for blob, _, _ in inputs]
+        return [self._decode(output, conf, gain, pad, frame.shape)
+                for output, (_, gain, pad), frame in zip(outputs, inputs, frames)]
+
+    def _decode(self, output, conf, gain, pad, frame_shape):
+        """Raw (4 + classes, anchors) output of one image -> boxes in frame coordinates after NMS"""
+        pad_x, pad_y = pad
+        output = output.T  # anchors x (4 + classes)
+        scores = output[:, 4:]
+        classes = scores.argmax(axis=1)
+        confs = scores[np.arange(len(scores)), classes]
+        keep = confs >= conf
+        boxes, classes, confs = output[keep, :4], classes[keep], confs[keep]
+        if len(boxes) == 0:
+            return np.zeros((0, 4), np.float32), np.zeros(0, np.int16), np.zeros(0, np.float32)
+
+        # Per-class NMS by shifting each class into its own coordinate range
+        xywh = np.column_stack([boxes[:, 0] - boxes[:, 2] / 2, boxes[:, 1] - boxes[:, 3] / 2, boxes[:, 2], boxes[:, 3]])
+        shifted = xywh.copy()
+        shifted[:, :2] += classes[:, None] * 7680.0
+        order = cv2.dnn.NMSBoxes(shifted.tolist(), confs.tolist(), conf, self.iou, top_k=self.max_det)
+        order = np.asarray(order, dtype=np.intp).reshape(-1)
+        order = order[np.argsort(-confs[order], kind='stable')][:self.max_det]
+
+        height, width = frame_shape[:2]
+        xyxy = np.column_stack([xywh[order, 0], xywh[order, 1],
+                                xywh[order, 0] + xywh[order, 2], xywh[order, 1] + xywh[order, 3]])
+        xyxy -= np.array([pad_x, pad_y, pad_x, pad_y])
+        xyxy /= gain
+        xyxy[:, [0, 2]] = xyxy[:, [0, 2]].clip(0, width)
+        xyxy[:, [1, 3]] = xyxy[:, [1, 3]].clip(0, height)
+        return xyxy.astype(np.float32), classes[order].astype(np.int16), confs[order].astype(np.float32)
+
+
+class Int8OnnxDetector(OnnxDetector):
+    """int8-quantized ONNX export (see quantize_int8), same decoding as OnnxDetector"""
+    backend = 'onnx-int8'
+
+
+def onnx_paths(model_path):
+    """Default locations of the fp32 and int8 ONNX exports next to the .pt weights"""
+    stem = os.path.splitext(model_path)[0]
+    return stem + ".onnx", stem + ".int8.onnx"
+
+
+def export_onnx(model_path, imgsz=640):
+    """Export PyTorch weights to ONNX with Ultralytics (static input size, names kept in metadata)"""
+    from ultralytics import YOLO #type: ignore
+    print(f"Exporting {model_path} to ONNX (imgsz {imgsz})...")
+    return YOLO(model_path).export(format="onnx", imgsz=imgsz, dynamic=False, simplify=True)
+
+
+def onnx_input_size(onnx_path):
+    """Square input size an ONNX export was built with (from the Ultralytics metadata, else the input shape)"""
+    import onnxruntime as ort #type: ignore
+    session = ort.InferenceSession(onnx_path, providers=["CPUExecutionProvider"])
+    meta = session.get_modelmeta().custom_metadata_map
+    if "imgsz" in meta:
+        return int(ast.literal_eval(meta["imgsz"])[0])
+    return int(session.get_inputs()[0].shape[2])
+
+
+def fp32_export(model_path, imgsz=None):
+    """The fp32 ONNX export next to model_path, (re-)exported when missing or built for another imgsz"""
+    path = onnx_paths(model_path)[0]
+    if not os.path.isfile(path):
+        return export_onnx(model_path, imgsz or 640)
+    built = onnx_input_size(path)
+    if imgsz and built != imgsz:
+        print(f"{path} was exported for imgsz {built}, not {imgsz}; exporting again")
+        return export_onnx(model_path, imgsz)
+    return path
+
+
+def check_input_size(detector, imgsz, path):
+    """An ONNX model has a fixed input size: refuse one built for another imgsz than requested"""
+    if imgsz and detector.imgsz != imgsz:
+        raise ValueError(f"{path} takes {detector.imgsz}px input but imgsz is {imgsz}; "
+                         f"rebuild it for imgsz {imgsz} or set imgsz to None")
+    return detector
+
+
+def sample_frames(videos, count):
+    """Up to count frames spread evenly over the given videos"""
+    frames = []
+    per_video = max(1, count // max(1, len(videos)))
+    for video in videos:
+        cap = cv2.VideoCapture(video)
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) or per_video
+        for index in np.linspace(0, max(0, total - 1), per_video).astype(int):
+            cap.set(cv2.CAP_PROP_POS_FRAMES, int(index))
+            ret, frame = cap.read()
+            if ret:
+                frames.append(frame)
+        cap.release()
+    return frames[:count]
+
+
+class FootageCalibrationReader:
+    """ONNX Runtime calibration data: our own footage, preprocessed exactly like inference"""
+    def __init__(self, frames, input_name, imgsz):
+        self._blobs = iter([{input_name: preprocess(frame, imgsz)[0]} for frame in frames])
+
+    def get_next(self):
+        return next(self._blobs, None)
+
+
+def quantize_int8(onnx_path, videos, output_path=None, frames=200, exclude_head=True):
+    """
+    Static int8 quantization of an ONNX export, calibrated on frames from our videos.
+
+    Weights are quantized per channel (QDQ format). With exclude_head the
+    nodes of the last model block (the detect head, whose box regression is
+    the most sensitive to int8) stay in float.
+    """
+    import onnx #type: ignore
+    from onnxruntime.quantization import quantize_static, QuantFormat, QuantType #type: ignore
+    output_path = output_path or os.path.splitext(onnx_path)[0] + ".int8.onnx"
+    fp32 = OnnxDetector(onnx_path)
+    calibration = sample_frames(videos, frames)
+    if not calibration:
+        raise ValueError("No calibration frames could be read from the given videos")
+    print(f"Calibrating int8 quantization on {len(calibration)} frames...")
+
+    graph = onnx.load(onnx_path).graph
+    nodes_to_exclude = []
+    if exclude_head:
+        blocks = [int(m.group(1)) for m in (re.match(r"^/model\.(\d+)/", n.name) for n in graph.node) if m]
+        if blocks:
+            head = f"/model.{max(blocks)}/"
+            nodes_to_exclude = [n.name for n in graph.node if n.name.startswith(head)]
+
+    quantize_static(onnx_path, output_path, FootageCalibrationReader(calibration, fp32.input_name, fp32.imgsz),
+                    quant_format=QuantFormat.QDQ, per_channel=True, activation_type=QuantType.QUInt8,
+                    weight_type=QuantType.QInt8, nodes_to_exclude=nodes_to_exclude)
+    # Keep the Ultralytics metadata (class names, input size) on the quantized model
+    model = onnx.load(output_path)
+    source = onnx.load(onnx_path)
+    del model.metadata_props[:]
+    model.metadata_props.extend(source.metadata_props)
+    onnx.save(model, output_path)
+    print(f"int8 model saved to {output_path}")
+    return output_path
+
+
+def model_file(backend, model_path, onnx_path=None):
+    """The file load_detector runs for a backend (it may not exist yet for the fp32 export)"""
+    if backend == 'pytorch':
+        return model_path
+    if onnx_path:
+        return onnx_path
+    return onnx_paths(model_path)[0 if backend == 'onnx' else 1]
+
+
+def load_detector(backend, model_path, imgsz=None, onnx_path=None):
+    """
+    Detector for a backend name: 'pytorch', 'onnx' or 'onnx-int8'.
+
+    onnx_path defaults to the export next to model_path; a missing fp32 export
+    (or one built for another imgsz) is created on the fly, the int8 model has
+    to be built with `python detectors.py quantize` first because it needs
+    calibration footage. ONNX models have a fixed input size, so a given
+    onnx_path or int8 model built for another imgsz raises ValueError.
+    """
+    if backend == 'pytorch':
+        return TorchDetector(model_path, imgsz)
+    if backend == 'onnx':
+        if onnx_path:
+            return check_input_size(OnnxDetector(onnx_path), imgsz, onnx_path)
+        return OnnxDetector(fp32_export(model_path, imgsz))
+    if backend == 'onnx-int8':
+        path = onnx_path or onnx_paths(model_path)[1]
+        if not os.path.isfile(path):
+            raise FileNotFoundError(f"No int8 model at {path}; run: python detectors.py quantize {model_path} --videos <footage>")
+        return check_input_size(Int8OnnxDetector(path), imgsz, path)
+    raise ValueError(f"Unknown detector backend: {backend} (expected one of {', '.join(BACKENDS)})")
+
+
+class SharedDetector:
+    """Detector used from several threads; predict calls are serialised because the backends are not thread-safe"""
+    def __init__(self, detector):
+        self.detector = detector
+        self.backend = detector.backend
+        self.names = detector.names
+        self._lock = threading.Lock()
+
+    def predict(self, frame, conf=0.25):
+        with self._lock:
+            return self.detector.predict(frame, conf)
+
+    def predict_batch(self, frames, conf=0.25):
+        with self._lock:
+            return self.detector.predict_batch(frames, conf)
+
+
+_shared_detectors = {}
+_shared_lock = threading.Lock()
+
+
+def load_shared_detector(backend, model_path, imgsz=None, onnx_path=None):
+    """load_detector, but every caller in the process asking for the same model gets the same instance"""
+    key = (backend, os.path.abspath(model_path), imgsz, onnx_path and os.path.abspath(onnx_path))
+    with _shared_lock:
+        if key not in _shared_detectors:
+            _shared_detectors[key] = SharedDetector(load_detector(backend, model_path, imgsz, onnx_path))
+        return _shared_detectors[key]
+
+
+def _box_agreement(base, other, iou_threshold=0.5):
+    """Greedy same-class IoU matching; returns the number of matched boxes"""
+    base_xyxy, base_cls, _ = base
+    xyxy, cls, _ = other
+    if len(base_xyxy) == 0 or len(xyxy) == 0:
+        return 0
+    x1 = np.maximum(base_xyxy[:, None, 0], xyxy[None, :, 0])
+    y1 = np.maximum(base_xyxy[:, None, 1], xyxy[None, :, 1])
+    x2 = np.minimum(base_xyxy[:, None, 2], xyxy[None, :, 2])
+    y2 = np.minimum(base_xyxy[:, None, 3], xyxy[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area = lambda b: (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    iou = inter / (area(base_xyxy)[:, None] + area(xyxy)[None, :] - inter + 1e-9)
+    iou[base_cls[:, None] != cls[None, :]] = 0
+    matched = 0
+    while iou.size and iou.max() >= iou_threshold:
+        i, j = np.unravel_index(iou.argmax(), iou.shape)
+        iou[i, :] = 0
+        iou[:, j] = 0
+        matched += 1
+    return matched
+
+
+def compare_backends(model_path, videos, backends=BACKENDS, frames=100, conf=0.25, imgsz=None, warmup=3):
+    """
+    Run every backend on the same frames and compare against PyTorch.
+
+    Reports mean / p50 / p99 latency, speedup, the share of frames whose
+    per-class counts equal the baseline's, and box recall / precision
+    (same class, IoU >= 0.5) against the baseline boxes.
+    """
+    samples = sample_frames(videos, frames)
+    if not samples:
+        raise ValueError("No frames could be read from the given videos")
+    results = {}
+    for backend in ('pytorch',) + tuple(b for b in backends if b != 'pytorch'):
+        detector = load_detector(backend, model_path, imgsz)
+        for frame in samples[:warmup]:
+            detector.predict(frame, conf)
+        outputs, latencies = [], []
+        for frame in samples:
+            t0 = time.perf_counter()
+            outputs.append(detector.predict(frame, conf))
+            latencies.append(time.perf_counter() - t0)
+        results[backend] = (outputs, np.array(latencies) * 1000.0)
+
+    base_outputs, base_latency = results['pytorch']
+    report = {}
+    for backend, (outputs, latency) in results.items():
+        same_counts = sum(np.array_equal(np.bincount(o[1], minlength=256), np.bincount(b[1], minlength=256))
+                          for o, b in zip(outputs, base_outputs))
+        matched = sum(_box_agreement(b, o) for o, b in zip(outputs, base_outputs))
+        base_boxes = sum(len(b[0]) for b in base_outputs)
+        boxes = sum(len(o[0]) for o in outputs)
+        report[backend] = {
+            'mean_ms': float(latency.mean()), 'p50_ms': float(np.percentile(latency, 50)),
+            'p99_ms': float(np.percentile(latency, 99)), 'speedup': float(base_latency.mean() / latency.mean()),
+            'count_agreement': same_counts / len(samples),
+            'box_recall': matched / base_boxes if base_boxes else 1.0,
+            'box_precision': matched / boxes if boxes else 1.0,
+        }
+    return report
+
+
+def print_comparison(report, frames):
+    print(f"\nDetector comparison on {frames} frames (baseline: pytorch)")
+    print(f"{'backend':<11}{'mean ms':>9}{'p50 ms':>9}{'p99 ms':>9}{'speedup':>9}{'counts':>9}{'recall':>9}{'precision':>11}")
+    for backend, r in report.items():
+        print(f"{backend:<11}{r['mean_ms']:>9.1f}{r['p50_ms']:>9.1f}{r['p99_ms']:>9.1f}{r['speedup']:>8.2f}x"
+              f"{r['count_agreement']:>9.1%}{r['box_recall']:>9.1%}{r['box_precision']:>11.1%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export, quantize and compare detector backends")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export = sub.add_parser("export", help="Export .pt weights to ONNX")
+    export.add_argument("model")
+    export.add_argument("--imgsz", type=int, default=640)
+    quantize = sub.add_parser("quantize", help="Build the int8 ONNX model, calibrated on our footage")
+    quantize.add_argument("model")
+    quantize.add_argument("--videos", nargs="+", required=True)
+    quantize.add_argument("--frames", type=int, default=200)
+    quantize.add_argument("--imgsz", type=int, default=640)
+    quantize.add_argument("--quantize-head", action="store_true", help="Also quantize the detect head")
+    compare = sub.add_parser("compare", help="Speed and count agreement against the PyTorch baseline")
+    compare.add_argument("model")
+    compare.add_argument("--videos", nargs="+", required=True)
+    compare.add_argument("--frames", type=int, default=100)
+    compare.add_argument("--conf", type=float, default=0.25)
+    compare.add_argument("--imgsz", type=int, default=None)
+    compare.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    args = parser.parse_args()
+
+    if args.command == "export":
+        export_onnx(args.model, args.imgsz)
+    elif args.command == "quantize":
+        fp32_path = fp32_export(args.model, args.imgsz)
+        quantize_int8(fp32_path, args.videos, onnx_paths(args.model)[1], frames=args.frames,
+                      exclude_head=not args.quantize_head)
+    else:
+        report = compare_backends(args.model, args.videos, args.backends, frames=args.frames,
+                                  conf=args.conf, imgsz=args.imgsz)
+        print_comparison(report, args.frames)
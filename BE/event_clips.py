@@ -0,0 +1,141 @@
+# Event-triggered clip recording with a pre-roll ring buffer
+import cv2 #type: ignore
+import numpy as np
+import os
+import threading
+from collections import deque
+from datetime import datetime
+
+
+class EventClipRecorder:
+    """
+    Records short clips around delivery events instead of continuous clips.
+
+    Frames passed to write() are kept JPEG-compressed in a ring covering the
+    last pre_roll seconds (and at most max_buffer_mb). trigger() names a clip
+    right away so the event row can link to it; the clip gets the buffered
+    pre-roll plus every frame up to post_roll seconds after the event. An
+    event arriving while a clip is still open extends that clip instead of
+    starting a new one.
+
+    trigger() may be called from the inference thread while write() and
+    release() run on the encode thread. The lock only guards the clip state;
+    JPEG encoding, writing the pre-roll and every other file I/O happen in
+    write() after it is released, so an event never waits on the disk. The
+    ring and the open VideoWriter are only used by the encode thread.
+    """
+    def __init__(self, output_folder, fps, frame_size, pre_roll=5.0, post_roll=5.0, fourcc="mp4v",
+                 max_buffer_mb=64, jpeg_quality=90):
+        self.output_folder = output_folder
+        self.fps = fps
+        self.frame_size = frame_size
+        self.fourcc = cv2.VideoWriter_fourcc(*fourcc)
+        self.pre_roll_frames = int(pre_roll * fps)
+        self.post_roll_frames = int(post_roll * fps)
+        self.max_buffer_bytes = int(max_buffer_mb * 1024 * 1024)
+        self.jpeg_params = [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality]
+        self.ring = deque()
+        self.ring_bytes = 0
+        self.lock = threading.Lock()
+        self.out = None
+        self.out_path = None
+        self.out_number = 0
+        self.clip_number = 0
+        self.clip_start_index = 0
+        self.stop_index = None
+        self.pending_path = None
+        self.current_video_path = None
+        self.last_index = 0
+        self.events_merged = 0
+
+    def frame_counter(self, frame_index):
+        """Number of stream frames since the current (or last) event clip started"""
+        return frame_index - self.clip_start_index
+
+    def roll_if_due(self, frame_index):
+        # Clips end post_roll after their last event, see write()
+        pass
+
+    def trigger(self, frame_index=None):
+        """Start or extend a clip for an event at frame_index; returns the clip path to log"""
+        with self.lock:
+            if frame_index is None:
+                frame_index = self.last_index + 1
+            if self.stop_index is not None:
+                self.stop_index = max(self.stop_index, frame_index + self.post_roll_frames)
+                self.events_merged += 1
+                return self.current_video_path
+            start_time = datetime.now()
+            date_str = start_time.strftime("%Y-%m-%d")
+            output_filename = f"event_{start_time.strftime('%Y%m%d_%H%M%S_%f')[:-3]}.mp4"
+            self.pending_path = os.path.join(date_str, output_filename)
+            self.current_video_path = self.pending_path
+            self.clip_number += 1
+            self.stop_index = frame_index + self.post_roll_frames
+            return self.current_video_path
+
+    def _open(self, path, clip_number, pre_roll):
+        date_folder = os.path.join(self.output_folder, os.path.dirname(path))
+        os.makedirs(date_folder, exist_ok=True)
+        self.out = cv2.VideoWriter(os.path.join(self.output_folder, path), self.fourcc,
+                                   self.fps, self.frame_size)
+        self.out_path = path
+        self.out_number = clip_number
+        self.clip_start_index = pre_roll[0][0] if pre_roll else self.last_index
+        print(f"\nRecording event clip {clip_number}: {path}")
+        # Pre-roll first
+        for _, data in pre_roll:
+            self.out.write(cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR))
+
+    def _take_pending(self):
+        """Under the lock: the clip trigger() named since the last call (or None) and the pre-roll ring for it"""
+        path, self.pending_path = self.pending_path, None
+        if path is None:
+            return None
+        pre_roll, self.ring = self.ring, deque()
+        self.ring_bytes = 0
+        return path, self.clip_number, pre_roll
+
+    def _buffer(self, frame, frame_index):
+        ok, data = cv2.imencode(".jpg", frame, self.jpeg_params)
+        if not ok:
+            return
+        self.ring.append((frame_index, data.tobytes()))
+        self.ring_bytes += len(self.ring[-1][1])
+        while self.ring and (self.ring[0][0] <= frame_index - self.pre_roll_frames
+                             or self.ring_bytes > self.max_buffer_bytes):
+            self.ring_bytes -= len(self.ring.popleft()[1])
+
+    def write(self, frame, frame_index):
+        with self.lock:
+            self.last_index = frame_index
+            pending = self._take_pending()
+        if pending is not None:
+            self._open(*pending)
+        if self.out is None:
+            self._buffer(frame, frame_index)
+            return
+        self.out.write(frame)
+        with self.lock:
+            done = frame_index >= self.stop_index
+            if done:
+                # A trigger() from now on starts a new clip
+                self.stop_index = None
+        if done:
+            self._close()
+
+    def _close(self):
+        self.out.release()
+        self.out = None
+        print(f"Event clip {self.out_number} saved: {self.out_path}")
+
+    def release(self):
+        with self.lock:
+            pending = self._take_pending()
+            self.stop_index = None
+        if pending is not None:
+            self._open(*pending)
+        if self.out is not None:
+            self._close()
+        self.ring.clear()
+        self.ring_bytes = 0
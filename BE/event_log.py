@@ -0,0 +1,172 @@
+# Delivery / food-count event logging with a non-blocking background writer
+import os
+import csv
+import json
+import queue
+import threading
+import time
+import pandas as pd
+
+DELIVERY_COLUMNS = ['Date', 'Timestamp', 'Total Food', 'Total Drinks', 'Total Parcels', 'Video_Path']
+
+
+def delivery_row(date, timestamp, category, change, video_path):
+    """Build the Processed_Data row for one increment/decrement event"""
+    return {
+        'Date': date,
+        'Timestamp': timestamp,
+        'Total Food': change if category == "Food" else 0,
+        'Total Drinks': change if category == "Drink" else 0,
+        'Total Parcels': change if category == "Parcel" else 0,
+        'Video_Path': video_path if video_path else "N/A"
+    }
+
+
+class EventWriter:
+    """
+    Background writer for event rows.
+
+    log() only puts the row on an in-memory queue, so it never blocks the
+    video thread. The writer thread appends every row to a journal file as
+    soon as it arrives (fsync'd, one JSON object per line) and flushes rows
+    to the append-only CSV store in batches, whenever max_batch rows are
+    pending or flush_interval seconds have passed. The journal is truncated
+    after each flush and replayed into the store on the next start, so rows
+    are not lost if the process dies between flushes (at-least-once).
+
+    If the CSV store does not exist yet but the legacy Excel file does, the
+    Excel rows are copied over once so history is kept. With export_excel
+    the Excel file is rewritten from the store on close for manual use.
+    """
+    def __init__(self, store_path, columns, excel_path=None, journal_path=None,
+                 flush_interval=5.0, max_batch=50, export_excel=False):
+        self.store_path = store_path
+        self.columns = list(columns)
+        self.excel_path = excel_path
+        self.journal_path = journal_path or store_path + ".journal"
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.export_excel = export_excel
+        self._queue = queue.SimpleQueue()
+        self._pending = []
+        self._journal = None
+        self._thread = None
+        self._stop = object()
+        # Stats
+        self.events_logged = 0
+        self.events_written = 0
+        self.flushes = 0
+        self.last_flush_seconds = 0.0
+        self.flush_seconds_total = 0.0
+
+    def start(self):
+        self._migrate_excel()
+        self._recover_journal()
+        self._journal = open(self.journal_path, "a", encoding="utf-8")
+        self._thread = threading.Thread(target=self._run, name="event-writer", daemon=True)
+        self._thread.start()
+        return self
+
+    def log(self, row):
+        """Queue one row for writing; never blocks"""
+        self.events_logged += 1
+        self._queue.put(row)
+
+    def close(self, timeout=10):
+        """Flush everything still queued and stop the writer thread"""
+        if self._thread is None:
+            return
+        self._queue.put(self._stop)
+        self._thread.join(timeout)
+        self._thread = None
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+        if self.export_excel and self.excel_path and os.path.isfile(self.store_path):
+            pd.read_csv(self.store_path).to_excel(self.excel_path, index=False)
+            print(f"Excel exported: {self.excel_path}")
+
+    def pending(self):
+        return len(self._pending) + self._queue.qsize()
+
+    def _migrate_excel(self):
+        if os.path.isfile(self.store_path) or not self.excel_path or not os.path.isfile(self.excel_path):
+            return
+        df = pd.read_excel(self.excel_path)
+        df.to_csv(self.store_path, index=False)
+        print(f"Migrated {len(df)} rows from {self.excel_path} to {self.store_path}")
+
+    def _recover_journal(self):
+        if not os.path.isfile(self.journal_path):
+            return
+        rows = []
+        with open(self.journal_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    rows.append(json.loads(line))
+                except ValueError:
+                    # Partially written last line from a crash
+                    continue
+        if rows:
+            self._append_to_store(rows)
+            print(f"Recovered {len(rows)} journaled event(s) into {self.store_path}")
+        open(self.journal_path, "w").close()
+
+    def _append_to_store(self, rows):
+        new_file = not os.path.isfile(self.store_path) or os.path.getsize(self.store_path) == 0
+        with open(self.store_path, "a", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=self.columns, extrasaction="ignore")
+            if new_file:
+                writer.writeheader()
+            writer.writerows(rows)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _journal_row(self, row):
+        self._journal.write(json.dumps(row, default=str) + "\n")
+        self._journal.flush()
+        os.fsync(self._journal.fileno())
+
+    def _flush(self):
+        if not self._pending:
+            return
+        start = time.perf_counter()
+        try:
+            self._append_to_store(self._pending)
+        except OSError as e:
+            # Store locked or unavailable; rows stay pending and journaled
+            print(f"Event store write failed, will retry: {e}")
+            return
+        self._journal.truncate(0)
+        self._journal.seek(0)
+        self.events_written += len(self._pending)
+        self.flushes += 1
+        self.last_flush_seconds = time.perf_counter() - start
+        self.flush_seconds_total += self.last_flush_seconds
+        print(f"Event store updated: {self.store_path} (+{len(self._pending)} rows)")
+        self._pending = []
+
+    def _run(self):
+        first_pending_at = None
+        while True:
+            timeout = self.flush_interval
+            if first_pending_at is not None:
+                timeout = max(0.0, first_pending_at + self.flush_interval - time.time())
+            try:
+                row = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                row = None
+
+            if row is self._stop:
+                self._flush()
+                return
+            if row is not None:
+                self._journal_row(row)
+                self._pending.append(row)
+                if first_pending_at is None:
+                    first_pending_at = time.time()
+
+            due = first_pending_at is not None and time.time() - first_pending_at >= self.flush_interval
+            if len(self._pending) >= self.max_batch or due:
+                self._flush()
+                first_pending_at = time.time() if self._pending else None
@@ -0,0 +1,154 @@
+# Process-wide, change-invalidated copy of an event table for app.py
+import io
+import os
+import threading
+import pandas as pd
+
+# Bytes before the read offset remembered to detect a store that was rewritten rather than appended to
+TAIL_CHECK_BYTES = 64
+
+
+class EventTable:
+    """
+    Parsed, typed event table shared by every API handler.
+
+    get() stats the source and returns the cached DataFrame while its size
+    and mtime are unchanged. When EventWriter has appended to the CSV store
+    only the new complete lines are parsed, run through prepare_fn and
+    concatenated; a rewritten or truncated store, or the legacy Excel file,
+    is reloaded in full. The returned frame is shared, so callers must not
+    modify it in place (filtering and .copy() are fine).
+
+    Rows stay in the order they were written, which change-feed cursors rely
+    on. between() looks up a DateTime range by binary search in the rows
+    sorted by time, which is the frame itself as long as rows were appended
+    in time order, and returns a slice of it instead of a filtered copy.
+    """
+    def __init__(self, store_path, excel_path=None, prepare_fn=None):
+        self.store_path = store_path
+        self.excel_path = excel_path
+        self.prepare_fn = prepare_fn
+        self._lock = threading.Lock()
+        self._df = None
+        self._source = None
+        self._signature = None
+        self._offset = 0
+        self._tail = b""
+        self._columns = None
+        # The frame in DateTime order (the frame itself when rows arrived in order); None until needed
+        self._by_time = None
+        # Bumped whenever the data changes, so consumers can skip unchanged work
+        self.version = 0
+        # Bumped on every full reload: row positions are only stable within one epoch
+        self.epoch = 0
+        # Stats
+        self.full_loads = 0
+        self.incremental_loads = 0
+
+    def get(self):
+        return self.get_with_epoch()[0]
+
+    def get_with_epoch(self):
+        """(DataFrame, epoch); rows keep their position while the epoch is unchanged"""
+        with self._lock:
+            self._refresh()
+            return self._df, self.epoch
+
+    def between(self, start=None, end=None):
+        """Rows with start <= DateTime <= end (None: unbounded) in time order; a slice of the shared frame"""
+        return self.between_with_epoch(start, end)[0]
+
+    def between_with_epoch(self, start=None, end=None):
+        """(rows as between(), epoch, row count of the frame they were sliced from)"""
+        with self._lock:
+            self._refresh()
+            by_time = self._time_ordered()
+            times = by_time['DateTime']
+            first = times.searchsorted(pd.Timestamp(start), side="left") if start is not None else 0
+            last = times.searchsorted(pd.Timestamp(end), side="right") if end is not None else len(by_time)
+            return by_time.iloc[first:max(first, last)], self.epoch, len(self._df)
+
+    def _time_ordered(self):
+        if self._by_time is None:
+            if self._df['DateTime'].is_monotonic_increasing:
+                self._by_time = self._df
+            else:
+                # Rows logged out of time order (e.g. offline processing of an old recording)
+                self._by_time = self._df.sort_values('DateTime', kind="stable")
+        return self._by_time
+
+    def _refresh(self):
+        """Bring the frame up to date with the source; the lock must be held"""
+        if os.path.isfile(self.store_path):
+            source = self.store_path
+        elif self.excel_path and os.path.isfile(self.excel_path):
+            source = self.excel_path
+        else:
+            raise FileNotFoundError(f"No event data at {self.store_path}")
+        stat = os.stat(source)
+        signature = (source, stat.st_size, stat.st_mtime_ns)
+        if signature == self._signature and self._df is not None:
+            return
+
+        if source != self.store_path:
+            self._load_excel(source)
+        elif not (source == self._source and self._append_from_store(stat.st_size)):
+            self._load_store()
+        self._source = source
+        self._signature = signature
+        self.version += 1
+
+    def _prepare(self, df):
+        return self.prepare_fn(df) if self.prepare_fn is not None else df
+
+    def _load_excel(self, path):
+        self._df = self._prepare(pd.read_excel(path))
+        self._by_time = None
+        self.epoch += 1
+        self._offset = 0
+        self._tail = b""
+        self.full_loads += 1
+
+    def _load_store(self):
+        with open(self.store_path, "rb") as f:
+            data = f.read()
+        # A row still being written has no newline yet; leave it for the next read
+        end = data.rfind(b"\n") + 1
+        raw = pd.read_csv(io.BytesIO(data[:end]))
+        self._columns = list(raw.columns)
+        self._df = self._prepare(raw)
+        self._by_time = None
+        self.epoch += 1
+        self._offset = end
+        self._tail = data[max(0, end - TAIL_CHECK_BYTES):end]
+        self.full_loads += 1
+
+    def _append_from_store(self, size):
+        """Parse only the rows appended since the last read; False if the store has to be reloaded"""
+        if self._df is None or not self._columns or size < self._offset:
+            return False
+        with open(self.store_path, "rb") as f:
+            f.seek(max(0, self._offset - len(self._tail)))
+            if f.read(len(self._tail)) != self._tail:
+                return False
+            chunk = f.read(size - self._offset)
+        end = chunk.rfind(b"\n") + 1
+        if end:
+            new_rows = self._prepare(pd.read_csv(io.BytesIO(chunk[:end]), header=None, names=self._columns))
+            # Keep the loaded column types; a column whose type really changed (e.g. it was
+            # empty so far) is only typed right by a full reload
+            for column in new_rows.columns.intersection(self._df.columns):
+                if new_rows[column].dtype != self._df[column].dtype:
+                    try:
+                        new_rows[column] = new_rows[column].astype(self._df[column].dtype)
+                    except (TypeError, ValueError):
+                        return False
+            # Appended in time order: the frame stays sorted and needs no re-sort
+            in_order = (self._by_time is self._df and new_rows['DateTime'].is_monotonic_increasing
+                        and (self._df.empty or new_rows['DateTime'].iloc[0] >= self._df['DateTime'].iloc[-1]))
+            self._df = pd.concat([self._df, new_rows], ignore_index=True)
+            self._by_time = self._df if in_order else None
+            self._offset += end
+            self._tail = (self._tail + chunk[:end])[-TAIL_CHECK_BYTES:]
+        self.incremental_loads += 1
+        return True
@@ -0,0 +1,164 @@
+# One capture/decode thread per camera fanning frames out to several consumers
+import queue
+import threading
+import time
+import cv2 #type: ignore
+from pipeline import LatestFrameSlot
+
+
+class Subscription:
+    """
+    One consumer's feed from a FrameHub.
+
+    A frame is due every every_n stream frames and/or every every_seconds of
+    stream time. With blocking=True the hub waits for this consumer (use for
+    recorded files so no frame is lost); otherwise only the newest unread
+    frame is kept and older ones are counted as dropped.
+    """
+    def __init__(self, name, every_n=None, every_seconds=None, blocking=False, queue_size=4):
+        self.name = name
+        self.every_n = every_n
+        self.every_seconds = every_seconds
+        self.blocking = blocking
+        self._queue = queue.Queue(maxsize=queue_size) if blocking else None
+        self._slot = None if blocking else LatestFrameSlot()
+        self._last_time = None
+        self._closed = False
+        self.frames_delivered = 0
+        self.frames_dropped = 0
+
+    def due(self, index, stream_time):
+        if self.every_n and index % self.every_n != 0:
+            return False
+        if self.every_seconds:
+            if self._last_time is not None and stream_time - self._last_time < self.every_seconds:
+                return False
+            self._last_time = stream_time
+        return True
+
+    def _put(self, item, stop_event):
+        self.frames_delivered += 1
+        if not self.blocking:
+            if self._slot.put(item):
+                self.frames_dropped += 1
+            return
+        while not stop_event.is_set():
+            try:
+                self._queue.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def _close(self):
+        self._closed = True
+        if self.blocking:
+            try:
+                self._queue.put_nowait(None)
+            except queue.Full:
+                pass
+        else:
+            self._slot.close()
+
+    def get(self, timeout=None):
+        """(index, stream_time, frame), or None once the hub has stopped and the feed is drained"""
+        if not self.blocking:
+            while True:
+                item = self._slot.get(timeout)
+                if item is not None or self._slot.closed or timeout is not None:
+                    return item
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            if self._closed:
+                # The end marker is lost when the queue was full at close: drain, then stop
+                try:
+                    return self._queue.get_nowait()
+                except queue.Empty:
+                    return None
+            wait = 0.5 if deadline is None else min(0.5, deadline - time.time())
+            try:
+                return self._queue.get(timeout=max(wait, 0))
+            except queue.Empty:
+                if deadline is not None and time.time() >= deadline:
+                    return None
+
+    def depth(self):
+        return self._queue.qsize() if self.blocking else self._slot.qsize()
+
+
+class FrameHub:
+    """
+    Reads one camera once and hands decoded frames to every subscribed consumer.
+
+    Each stream frame is only decoded when at least one subscription is due,
+    otherwise it is just grabbed. When several consumers want the same frame
+    the first gets the decoded buffer and the others a copy, so consumers may
+    draw on what they receive. Stream time is frame index / fps for recorded
+    files and wall-clock time for live streams. Decode and grab times go
+    into metrics (a metrics.Metrics) when given.
+    """
+    def __init__(self, cap, fps=30.0, live=True, frame_size=None, start_index=0, metrics=None):
+        self.cap = cap
+        self.metrics = metrics
+        self.fps = fps
+        self.live = live
+        self.frame_size = frame_size
+        self.index = start_index
+        self.subscriptions = []
+        self.stop_event = threading.Event()
+        self._thread = None
+        self.frames_read = 0
+        self.frames_decoded = 0
+        self.error = None
+
+    def subscribe(self, name, every_n=None, every_seconds=None, blocking=None, queue_size=4):
+        sub = Subscription(name, every_n, every_seconds, not self.live if blocking is None else blocking, queue_size)
+        self.subscriptions.append(sub)
+        return sub
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="frame-hub", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+
+    def join(self, timeout=None):
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _count(self, stage, started):
+        self.frames_read += 1
+        if self.metrics is not None:
+            self.metrics.observe(stage, time.perf_counter() - started)
+            self.metrics.inc("frames_read")
+
+    def _run(self):
+        try:
+            while not self.stop_event.is_set():
+                self.index += 1
+                stream_time = time.time() if self.live else self.index / self.fps
+                due = [sub for sub in self.subscriptions if not sub._closed and sub.due(self.index, stream_time)]
+                started = time.perf_counter()
+                if not due:
+                    # Nobody looks at this frame: advance the stream without decoding it
+                    if not self.cap.grab():
+                        break
+                    self._count("grab", started)
+                    continue
+                ret, frame = self.cap.read()
+                if not ret:
+                    break
+                if self.frame_size and (frame.shape[1], frame.shape[0]) != tuple(self.frame_size):
+                    frame = cv2.resize(frame, tuple(self.frame_size))
+                self.frames_decoded += 1
+                self._count("decode", started)
+                for i, sub in enumerate(due):
+                    sub._put((self.index, stream_time, frame if i == 0 else frame.copy()), self.stop_event)
+        except Exception as e:
+            self.error = e
+            print(f"Frame hub failed: {e}")
+        finally:
+            print("Stream interrupted. Stopping frame hub...")
+            for sub in self.subscriptions:
+                sub._close()
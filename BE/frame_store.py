@@ -0,0 +1,44 @@
+# Saved food-count frames and their downscaled variants (written by fwc_main.py, served by app.py)
+import os
+import cv2 #type: ignore
+
+# Size variant -> max width in px; "full" is the frame as saved
+FRAME_VARIANTS = {"thumb": 160, "medium": 640}
+VARIANT_JPEG_QUALITY = 80
+
+
+def variant_path(frame_dir, frame_name, size="full"):
+    """fwc_frames/<name> for the full frame, fwc_frames/<size>/<name> for a variant"""
+    if size == "full":
+        return os.path.join(frame_dir, frame_name)
+    return os.path.join(frame_dir, size, frame_name)
+
+
+def save_frame_variants(frame, frame_dir, frame_name, sizes=None):
+    """Write the downscaled variants of a frame next to it; returns the paths written"""
+    paths = []
+    height, width = frame.shape[:2]
+    for size in sizes or FRAME_VARIANTS:
+        max_width = FRAME_VARIANTS[size]
+        path = variant_path(frame_dir, frame_name, size)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if width > max_width:
+            scaled = cv2.resize(frame, (max_width, max(1, round(height * max_width / width))),
+                                interpolation=cv2.INTER_AREA)
+        else:
+            scaled = frame
+        cv2.imwrite(path, scaled, [cv2.IMWRITE_JPEG_QUALITY, VARIANT_JPEG_QUALITY])
+        paths.append(path)
+    return paths
+
+
+def ensure_variant(frame_dir, frame_name, size):
+    """Path of a variant, creating it from the full frame if it is missing (frames saved before variants existed)"""
+    path = variant_path(frame_dir, frame_name, size)
+    if size == "full" or os.path.isfile(path):
+        return path
+    frame = cv2.imread(variant_path(frame_dir, frame_name))
+    if frame is None:
+        raise FileNotFoundError(f"Frame not found: {frame_name}")
+    save_frame_variants(frame, frame_dir, frame_name, [size])
+    return path
@@ -1,71 +1,67 @@
 import cv2
-from ultralytics import YOLO
-from datetime import datetime
+from datetime import datetime, timedelta
 import os
-import pandas as pd
+import re
+import time
+from event_log import EventWriter
+from detectors import load_detector
+from frame_store import save_frame_variants
 
 # ------------------- CONFIG -------------------
 MODEL_PATH = r"Models\V8_fwc_94_3_12.pt"  # your model path
+DETECTOR_BACKEND = "pytorch"  # "pytorch", "onnx" or "onnx-int8" (build and compare them with detectors.py)
 STREAM_URL = r"D:\company videos\Ekkagra\2025-11-28\record_17-11-36.mp4"  # replace with your stream URL or video path
 FOOD_CLASS_ID = 1  # change based on your model
 TIME_THRESHOLD_MINUTES = 5  # sample frame every 5 minutes
+SAMPLING_MODE = "auto"  # "auto": seek files by timestamp, open live streams only around each sample; "grab": keep the stream open and grab without decoding between samples
+LIVE_OPEN_LEAD_SECONDS = 10  # open a live stream this long before each sample so it is past a keyframe
+LIVE_RETRY_SECONDS = 15  # wait before retrying a live stream that failed to open
+SHOW_WINDOW = False  # show each sampled frame (needs a display)
 
 BASE_DIR = "Data"
 FRAME_DIR = "fwc_frames"
 EXCEL_PATH = os.path.join(BASE_DIR, "Food_count.xlsx")
+STORE_PATH = os.path.join(BASE_DIR, "Food_count.csv")  # append-only store read by the API
+FOOD_COLUMNS = ["Date", "Time", "Food Count", "Frame_name"]
 
 # Create required folders
 os.makedirs(BASE_DIR, exist_ok=True)
 os.makedirs(FRAME_DIR, exist_ok=True)
 
-# ------------------- LOAD MODEL -------------------
-model = YOLO(MODEL_PATH)
 
-# ------------------- VIDEO CAPTURE -------------------
-cap = cv2.VideoCapture(STREAM_URL)
+# ------------------- SAMPLING -------------------
+class FoodSampler:
+    """
+    Counts food on sampled frames, saves the annotated frame and queues its row.
 
-if not cap.isOpened():
-    print("Error: Cannot open video")
-    exit()
-
-last_capture_time = None
-last_food_count = 0
-last_capture_label = "N/A"
-
-while True:
-    ret, frame = cap.read()
-    if not ret:
-        break
-
-    now = datetime.now()
-
-    # Check if it's time to sample a frame
-    if (last_capture_time is None or
-        (now - last_capture_time).total_seconds() >= TIME_THRESHOLD_MINUTES * 60):
+    The detector is passed in so the sampler can also run inside main.py on
+    frames from its shared decoder, with the model main.py already loaded.
+    """
+    def __init__(self, detector, event_writer, show_window=SHOW_WINDOW):
+        self.detector = detector
+        self.event_writer = event_writer
+        self.show_window = show_window
 
+    def process(self, frame, now):
         # Make a copy to draw on and save
         processed_frame = frame.copy()
 
-        # Run YOLO on this frame
-        results = model(processed_frame, conf=0.45)
+        # Run the detector on this frame
+        xyxy, classes, confs = self.detector.predict(processed_frame, conf=0.45)
 
         food_count = 0
 
-        for r in results:
-            boxes = r.boxes
-            for box in boxes:
-                cls = int(box.cls[0])
-                if cls == FOOD_CLASS_ID:
-                    food_count += 1
-                    x1, y1, x2, y2 = box.xyxy[0]
-                    cv2.rectangle(processed_frame,
-                                  (int(x1), int(y1)),
-                                  (int(x2), int(y2)),
-                                  (0, 255, 0), 2)
-                    cv2.putText(processed_frame, "Food",
-                                (int(x1), int(y1) - 5),
-                                cv2.FONT_HERSHEY_SIMPLEX, 0.7,
-                                (0, 255, 0), 2)
+        for (x1, y1, x2, y2), cls in zip(xyxy, classes):
+            if int(cls) == FOOD_CLASS_ID:
+                food_count += 1
+                cv2.rectangle(processed_frame,
+                              (int(x1), int(y1)),
+                              (int(x2), int(y2)),
+                              (0, 255, 0), 2)
+                cv2.putText(processed_frame, "Food",
+                            (int(x1), int(y1) - 5),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.7,
+                            (0, 255, 0), 2)
 
         # Prepare timestamp strings
         date_str = now.strftime("%Y-%m-%d")
@@ -76,47 +72,132 @@ while True:
         frame_name = f"frame_{timestamp_str}.jpg"
         frame_path = os.path.join(FRAME_DIR, frame_name)
 
-        # Save processed frame
+        # Save processed frame, plus the thumbnail / medium variants the dashboard lists
         cv2.imwrite(frame_path, processed_frame)
+        save_frame_variants(processed_frame, FRAME_DIR, frame_name)
 
-        # Update "last" values for display
-        last_food_count = food_count
-        last_capture_label = time_str
-        last_capture_time = now
-
-        # Save to Excel
+        # Queue the row for the event store
         new_row = {
             "Date": date_str,
             "Time": time_str,
             "Food Count": food_count,
             "Frame_name": frame_name
         }
-
-        if os.path.exists(EXCEL_PATH):
-            df = pd.read_excel(EXCEL_PATH)
-            df = pd.concat([df, pd.DataFrame([new_row])], ignore_index=True)
+        self.event_writer.log(new_row)
+        print(f"Food count {food_count} at {date_str} {time_str} ({frame_name})")
+
+        if self.show_window:
+            # Overlay the count on the frame being shown
+            cv2.putText(processed_frame,
+                        f"Last Food Count ({time_str}): {food_count}",
+                        (20, 40),
+                        cv2.FONT_HERSHEY_SIMPLEX, 1,
+                        (0, 0, 255), 3)
+            cv2.imshow("Food Detection", processed_frame)
+            cv2.waitKey(1)
+
+
+def start_event_writer():
+    """Rows are written in the background so the video loop never waits on disk"""
+    return EventWriter(STORE_PATH, FOOD_COLUMNS, excel_path=EXCEL_PATH,
+                       flush_interval=5, max_batch=20, export_excel=True).start()
+
+
+def recording_start(path, duration_seconds):
+    """Wall-clock start of a recording: <YYYY-MM-DD>\\record_HH-MM-SS.mp4, else file mtime minus duration"""
+    date_match = re.search(r"(\d{4}-\d{2}-\d{2})", os.path.dirname(os.path.abspath(path)))
+    time_match = re.search(r"(\d{2})-(\d{2})-(\d{2})", os.path.basename(path))
+    if date_match and time_match:
+        return datetime.strptime(f"{date_match.group(1)} {':'.join(time_match.groups())}", "%Y-%m-%d %H:%M:%S")
+    return datetime.fromtimestamp(os.path.getmtime(path)) - timedelta(seconds=duration_seconds)
+
+
+def sample_file_by_seeking(path, interval_seconds, sampler):
+    """Seek straight to each sample time; only the sampled frames are ever decoded"""
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        print("Error: Cannot open video")
+        return
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    duration = cap.get(cv2.CAP_PROP_FRAME_COUNT) / fps
+    started_at = recording_start(path, duration)
+    position = 0.0
+    while position <= duration:
+        cap.set(cv2.CAP_PROP_POS_MSEC, position * 1000.0)
+        ret, frame = cap.read()
+        if not ret:
+            break
+        sampler.process(frame, started_at + timedelta(seconds=position))
+        position += interval_seconds
+    cap.release()
+
+
+def sample_live_by_reopening(url, interval_seconds, sampler):
+    """Keep the stream closed between samples and open it LIVE_OPEN_LEAD_SECONDS before each one"""
+    next_sample = time.time()
+    while True:
+        wait = next_sample - LIVE_OPEN_LEAD_SECONDS - time.time()
+        if wait > 0:
+            time.sleep(wait)
+        cap = cv2.VideoCapture(url)
+        if not cap.isOpened():
+            print(f"Error: Cannot open stream, retrying in {LIVE_RETRY_SECONDS}s")
+            cap.release()
+            time.sleep(LIVE_RETRY_SECONDS)
+            continue
+        # Advance through the lead-in without converting frames, then decode the sample
+        ret = True
+        while ret and time.time() < next_sample:
+            ret = cap.grab()
+        if ret:
+            ret, frame = cap.retrieve()
+        if not ret:
+            ret, frame = cap.read()
+        cap.release()
+        if not ret:
+            print(f"Error: Cannot read from stream, retrying in {LIVE_RETRY_SECONDS}s")
+            time.sleep(LIVE_RETRY_SECONDS)
+            continue
+        sampler.process(frame, datetime.now())
+        next_sample = max(next_sample + interval_seconds, time.time())
+
+
+def sample_by_grabbing(url, interval_seconds, sampler):
+    """Keep the stream open, grab() between samples and only retrieve the sampled frames"""
+    cap = cv2.VideoCapture(url)
+    if not cap.isOpened():
+        print("Error: Cannot open video")
+        return
+    last_capture_time = None
+    while cap.grab():
+        now = datetime.now()
+        if last_capture_time is None or (now - last_capture_time).total_seconds() >= interval_seconds:
+            ret, frame = cap.retrieve()
+            if not ret:
+                break
+            sampler.process(frame, now)
+            last_capture_time = now
+    cap.release()
+
+
+if __name__ == "__main__":
+    event_writer = start_event_writer()
+
+    # ------------------- LOAD MODEL -------------------
+    sampler = FoodSampler(load_detector(DETECTOR_BACKEND, MODEL_PATH), event_writer)
+
+    # ------------------- VIDEO CAPTURE -------------------
+    interval_seconds = TIME_THRESHOLD_MINUTES * 60
+    try:
+        if SAMPLING_MODE == "grab":
+            sample_by_grabbing(STREAM_URL, interval_seconds, sampler)
+        elif os.path.isfile(STREAM_URL):
+            sample_file_by_seeking(STREAM_URL, interval_seconds, sampler)
         else:
-            df = pd.DataFrame([new_row])
-
-        df.to_excel(EXCEL_PATH, index=False)
-
-        # Show the processed frame for this capture
-        frame_to_show = processed_frame
-    else:
-        # For non-sampled frames, just show the raw frame
-        frame_to_show = frame
-
-    # Overlay last count info on the frame being shown
-    cv2.putText(frame_to_show,
-                f"Last Food Count ({last_capture_label}): {last_food_count}",
-                (20, 40),
-                cv2.FONT_HERSHEY_SIMPLEX, 1,
-                (0, 0, 255), 3)
-
-    # cv2.imshow("Food Detection", frame_to_show)
-
-    # if cv2.waitKey(1) & 0xFF == ord('q'):
-    #     break
-
-cap.release()
-cv2.destroyAllWindows()
+            sample_live_by_reopening(STREAM_URL, interval_seconds, sampler)
+    except KeyboardInterrupt:
+        print("Stopping sampler...")
+    finally:
+        if SHOW_WINDOW:
+            cv2.destroyAllWindows()
+        event_writer.close()
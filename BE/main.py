@@ -1,14 +1,25 @@
 # Logic and processing for kitchen object tracking and logging
 import cv2 #type: ignore
 import numpy as np
-from ultralytics import YOLO #type: ignore
 import os
 import json
-import pandas as pd
-from scipy.spatial import distance #type: ignore
-from collections import deque
+import threading
 from datetime import datetime, timedelta
 import time
+from pipeline import FramePipeline
+from tracker import CentroidTracker, draw_polygon, draw_trails
+from detection import CATEGORY_COLORS, crop_rect, parse_detection_arrays
+from detectors import load_shared_detector, model_file
+from detection_cache import DetectionCache
+from zones import ZoneMap
+from overlay import StaticOverlay
+from scheduler import MotionGate
+from event_log import EventWriter, DELIVERY_COLUMNS, delivery_row
+from clip_encoder import ClipEncoder
+from event_clips import EventClipRecorder
+from benchmark import DetectionLog
+from metrics import Metrics, MetricsPublisher
+from frame_hub import FrameHub
 
 # --- CONFIG ---
 # model_path = r"Models\small_best_76_13_11.pt"
@@ -22,257 +33,56 @@ conf_threshold = 0.25
 trail_length = 30
 time_threshold = 1  # minutes per clip
 save_video = True  # Set to False to disable video saving
+show_window = False  # Show the annotated stream in a window (needs a display)
 skip_frame = 2  # Process every nth frame
+association_method = "optimal"  # Tracker matching: "greedy" or "optimal" (Hungarian)
+adaptive_inference = False  # Let a motion score decide when to run the detector instead of skip_frame
+motion_threshold = 0.01  # Fraction of changed kitchen-ROI pixels that triggers inference
+motion_pixel_delta = 25  # Grayscale change for a pixel to count as motion
+min_infer_interval = 1  # Never infer more often than every n frames
+max_infer_interval = 25  # Always infer at least every n frames
+roi_crop_inference = False  # Run the detector only on the kitchen ROI's bounding box plus crop_margin
+crop_margin = 150  # px kept around the kitchen ROI so objects leaving it are still tracked
+inference_imgsz = None  # Detector input size (e.g. 640); None uses the model default
+pipeline_mode = False  # Run capture / inference / render / encode on separate threads
+pipeline_queue_size = 4  # Max frames buffered between pipeline stages
+encoder_process = False  # Encode clips in a separate process fed through a shared-memory frame ring
+encoder_ring_slots = 8  # Frames buffered in shared memory for the encoder process
+encoder_drop_policy = "drop"  # When the ring is full: "drop" the new frame or "block" briefly for a free slot
+recording_mode = "continuous"  # "continuous" rolling clips, or "events": short clips around each delivery/return
+pre_roll_seconds = 5  # Event clips start this long before the event
+post_roll_seconds = 5  # ... and end this long after the last merged event
+event_buffer_mb = 64  # Memory cap for the JPEG-compressed pre-roll buffer
+detection_log_path = None  # Save every inference's detections to this .npz for benchmark.py replay
+detection_cache = False  # Cache raw detections per frame of a recorded video; re-runs with the same model and inference settings skip YOLO
+cache_conf_floor = 0.05  # Detections are cached down to this confidence so conf_threshold can still be tuned
+detector_backend = "pytorch"  # "pytorch", "onnx" or "onnx-int8" (build and compare them with detectors.py)
+onnx_model_path = None  # ONNX file for the onnx backends; None uses the export next to model_path
+food_sampling = False  # Also run the fwc_main.py food-count sampler on this camera, fed by the same decoder
+food_model_path = model_path  # Food counting reuses the tracker's loaded model (fwc_main.FOOD_CLASS_ID must be its food class); point at fwc_main.MODEL_PATH to load the dedicated model instead
 
 # Create output folders if they don't exist
 os.makedirs(output_folder, exist_ok=True)
 os.makedirs(csv_folder, exist_ok=True)
 
-# Excel file path
+# Excel file path (legacy) and append-only event store written in the background
 excel_file_path = os.path.join(csv_folder, "Processed_Data.xlsx")
+event_store_path = os.path.join(csv_folder, "Processed_Data.csv")
+event_flush_interval = 5  # seconds between batched writes to the event store
+event_flush_batch = 50  # flush early once this many events are pending
+metrics_path = os.path.join(csv_folder, "metrics_main.json")  # stage timers / counters served by app.py at /metrics
+metrics_interval = 5  # seconds between metrics snapshots
 
-# Global variable to track current video path
-current_video_path = None
-
-# --- CENTROID TRACKER ---
-class CentroidTracker:
-    def __init__(self, max_disappeared=30, max_distance=50, trail_length=30, csv_callback=None):
-        self.next_object_id = 0
-        self.objects = {}
-        self.disappeared = {}
-        self.max_disappeared = max_disappeared
-        self.max_distance = max_distance
-        self.object_categories = {}
-        self.object_roi_history = {}
-        # Persistent delivery counters
-        self.total_delivered_drinks = 0
-        self.total_delivered_food = 0
-        self.total_delivered_parcels = 0
-        # Trail tracking
-        self.trails = {}
-        self.trail_length = trail_length
-        # CSV callback function
-        self.csv_callback = csv_callback
-        
-    def register(self, centroid, category):
-        self.objects[self.next_object_id] = centroid
-        self.disappeared[self.next_object_id] = 0
-        self.object_categories[self.next_object_id] = category
-        self.object_roi_history[self.next_object_id] = {'kitchen': False, 'delivered': False}
-        self.trails[self.next_object_id] = deque(maxlen=self.trail_length)
-        self.trails[self.next_object_id].append(centroid)
-        self.next_object_id += 1
-        return self.next_object_id - 1
-    
-    def deregister(self, object_id):
-        if object_id in self.object_roi_history and self.object_roi_history[object_id]['delivered']:
-            if object_id in self.object_categories:
-                category = self.object_categories[object_id]
-                if category == "Drink":
-                    self.total_delivered_drinks += 1
-                elif category == "Food":
-                    self.total_delivered_food += 1
-                elif category == "Parcel":
-                    self.total_delivered_parcels += 1
-                print(f"Object {object_id} ({category}) marked as delivered!")
-        
-        del self.objects[object_id]
-        del self.disappeared[object_id]
-        if object_id in self.object_categories:
-            del self.object_categories[object_id]
-        if object_id in self.object_roi_history:
-            del self.object_roi_history[object_id]
-        if object_id in self.trails:
-            del self.trails[object_id]
-    
-    def update(self, detections, kitchen_roi):
-        centroids = [det[0] for det in detections]
-        categories = [det[1] for det in detections]
-        
-        if len(centroids) == 0:
-            for object_id in list(self.disappeared.keys()):
-                self.disappeared[object_id] += 1
-                if self.disappeared[object_id] > self.max_disappeared:
-                    self.deregister(object_id)
-            return self.objects
-        
-        if len(self.objects) == 0:
-            for i, centroid in enumerate(centroids):
-                self.register(centroid, categories[i])
-        else:
-            object_ids = list(self.objects.keys())
-            object_centroids = list(self.objects.values())
-            
-            if len(object_centroids) > 0:
-                D = distance.cdist(np.array(object_centroids), np.array(centroids))
-                rows = D.min(axis=1).argsort()
-                cols = D.argmin(axis=1)[rows]
-                
-                used_rows = set()
-                used_cols = set()
-                
-                for row, col in zip(rows, cols):
-                    if row in used_rows or col in used_cols:
-                        continue
-                    
-                    object_id = object_ids[row]
-                    dist = D[row, col]
-                    
-                    if dist > self.max_distance:
-                        continue
-                    
-                    existing_category = self.object_categories.get(object_id)
-                    new_category = categories[col]
-                    
-                    if existing_category != new_category:
-                        continue
-                    
-                    self.objects[object_id] = centroids[col]
-                    self.disappeared[object_id] = 0
-                    self.trails[object_id].append(centroids[col])
-                    
-                    in_kitchen = point_in_polygon(centroids[col], kitchen_roi)
-                    history = self.object_roi_history[object_id]
-                    
-                    if in_kitchen:
-                        if history['delivered']:
-                            # Object re-entered kitchen - log decrement
-                            if self.csv_callback:
-                                self.csv_callback(existing_category, -1)
-                            
-                            if existing_category == "Drink":
-                                self.total_delivered_drinks = max(0, self.total_delivered_drinks - 1)
-                            elif existing_category == "Food":
-                                self.total_delivered_food = max(0, self.total_delivered_food - 1)
-                            elif existing_category == "Parcel":
-                                self.total_delivered_parcels = max(0, self.total_delivered_parcels - 1)
-                            print(f"Object {object_id} ({existing_category}) re-entered kitchen → subtracting from delivered total.")
-                            history['delivered'] = False
-                        history['kitchen'] = True
-                    else:
-                        dist_from_roi = cv2.pointPolygonTest(kitchen_roi, centroids[col], True)
-                        if history['kitchen'] and not history['delivered'] and dist_from_roi < -5:
-                            history['delivered'] = True
-                            # Object left kitchen - log increment
-                            if self.csv_callback:
-                                self.csv_callback(existing_category, 1)
-                    
-                    used_rows.add(row)
-                    used_cols.add(col)
-                
-                unused_rows = set(range(0, D.shape[0])).difference(used_rows)
-                unused_cols = set(range(0, D.shape[1])).difference(used_cols)
-                
-                if D.shape[0] >= D.shape[1]:
-                    for row in unused_rows:
-                        object_id = object_ids[row]
-                        self.disappeared[object_id] += 1
-                        if self.disappeared[object_id] > self.max_disappeared:
-                            self.deregister(object_id)
-                else:
-                    for col in unused_cols:
-                        self.register(centroids[col], categories[col])
-        
-        return self.objects
-
+# Stream frame index of the inference currently updating the tracker (event clips start from it)
+event_frame_index = None
+last_inferred_index = 0
 
-# --- UTILITY FUNCTIONS ---
-def point_in_polygon(point, polygon):
-    point_float = (float(point[0]), float(point[1]))
-    return cv2.pointPolygonTest(polygon, point_float, False) >= 0
-
-def draw_polygon(img, points, color, thickness=2):
-    if len(points) > 1:
-        pts = np.array(points, np.int32)
-        pts = pts.reshape((-1, 1, 2))
-        cv2.polylines(img, [pts], True, color, thickness)
-    for point in points:
-        cv2.circle(img, point, 5, color, -1)
-
-def get_counts_by_roi(tracker, kitchen_roi):
-    kitchen_drinks = kitchen_food = kitchen_parcels = 0
-    
-    for obj_id, centroid in tracker.objects.items():
-        if obj_id in tracker.object_categories:
-            category = tracker.object_categories[obj_id]
-            if point_in_polygon(centroid, kitchen_roi):
-                if category == "Drink":
-                    kitchen_drinks += 1
-                elif category == "Food":
-                    kitchen_food += 1
-                elif category == "Parcel":
-                    kitchen_parcels += 1
-    
-    delivered_drinks = tracker.total_delivered_drinks
-    delivered_food = tracker.total_delivered_food
-    delivered_parcels = tracker.total_delivered_parcels
-    
-    for obj_id, history in tracker.object_roi_history.items():
-        if history['delivered'] and obj_id in tracker.object_categories:
-            category = tracker.object_categories[obj_id]
-            if category == "Drink":
-                delivered_drinks += 1
-            elif category == "Food":
-                delivered_food += 1
-            elif category == "Parcel":
-                delivered_parcels += 1
-    
-    return {
-        'kitchen': {'drinks': kitchen_drinks, 'food': kitchen_food, 'parcels': kitchen_parcels},
-        'delivered': {'drinks': delivered_drinks, 'food': delivered_food, 'parcels': delivered_parcels}
-    }
-
-def draw_trails(frame, tracker):
-    color_map = {
-        "Drink": (255, 0, 0),
-        "Food": (0, 255, 0),
-        "Parcel": (0, 165, 255)
-    }
-    for obj_id, trail in tracker.trails.items():
-        if len(trail) < 2 or obj_id not in tracker.object_categories:
-            continue
-        category = tracker.object_categories[obj_id]
-        color = color_map.get(category, (255, 255, 255))
-        points = list(trail)
-        for i in range(1, len(points)):
-            alpha = i / len(points)
-            thickness = max(1, int(3 * alpha))
-            cv2.line(frame, points[i-1], points[i], color, thickness, cv2.LINE_AA)
-        if len(points) >= 2:
-            cv2.arrowedLine(frame, points[-2], points[-1], color, 3, cv2.LINE_AA, tipLength=0.3)
-
-def save_to_excel(date, timestamp, category, change, video_path):
-    """Save increment/decrement event to Excel file immediately with video path"""
-    
-    # Create row data with video_path column
-    row_data = {
-        'Date': date,
-        'Timestamp': timestamp,
-        'Total Food': change if category == "Food" else 0,
-        'Total Drinks': change if category == "Drink" else 0,
-        'Total Parcels': change if category == "Parcel" else 0,
-        'Video_Path': video_path if video_path else "N/A"
-    }
-    
-    # Check if file exists
-    if os.path.isfile(excel_file_path):
-        # Read existing data
-        df_existing = pd.read_excel(excel_file_path)
-        # Append new row
-        df_new = pd.DataFrame([row_data])
-        df_combined = pd.concat([df_existing, df_new], ignore_index=True)
-    else:
-        # Create new DataFrame
-        df_combined = pd.DataFrame([row_data])
-    
-    # Save to Excel
-    df_combined.to_excel(excel_file_path, index=False)
-    print(f"Excel updated: {excel_file_path}")
+# Stage timers and counters (decode, inference, tracker, draw, encode), published for app.py's /metrics
+metrics = Metrics("main")
 
-# --- MAIN PROCESSING ---
-print("Loading YOLO model...")
-model = YOLO(model_path)
-class_names = {i: n.lower() for i, n in model.names.items()}
+# Loaded on first use, so runs served from the detection cache never load the model
+detector = None
+class_names = None
 
 # Kitchen ROI
 kitchen_roi = np.array([[368,518],
@@ -281,147 +91,101 @@ kitchen_roi = np.array([[368,518],
     [372, 1068], [324, 1036], [602, 668]
 ], dtype=np.int32)
 
+# Extra named zones (e.g. "pass", "pickup_shelf"); rasterized with the kitchen at startup
+extra_zones = {}
+
 # Excel callback function
 def excel_logging_callback(category, change):
     """Callback function to log Excel entries immediately when delivery events occur"""
-    global current_video_path
     now = datetime.now()
     date_str = now.strftime("%Y-%m-%d")
     timestamp_str = now.strftime("%I:%M:%S %p")
     
-    # Use current video path or "N/A" if video saving is disabled
+    # Use the event's own clip, the clip being recorded (reported back by the encoder process when enabled) or "N/A"
+    if isinstance(clip_writer, EventClipRecorder):
+        current_video_path = clip_writer.trigger(event_frame_index)
+    else:
+        current_video_path = clip_writer.current_video_path
     video_path_to_log = current_video_path if current_video_path else "N/A"
     
-    save_to_excel(date_str, timestamp_str, category, change, video_path_to_log)
+    event_writer.log(delivery_row(date_str, timestamp_str, category, change, video_path_to_log))
     action = "delivered" if change > 0 else "returned"
     print(f"Excel logged: {category} {action} at {timestamp_str} (Video: {video_path_to_log})")
 
-# Initialize tracker with Excel callback
-tracker = CentroidTracker(max_disappeared=10, max_distance=100, trail_length=trail_length, csv_callback=excel_logging_callback)
+def load_model():
+    global detector, class_names
+    if detector is None:
+        print(f"Loading detector ({detector_backend})...")
+        # Shared so the food sampler asking for the same model gets this instance
+        detector = load_shared_detector(detector_backend, model_path, inference_imgsz, onnx_model_path)
+        class_names = {i: n.lower() for i, n in detector.names.items()}
+        if frame_cache is not None:
+            frame_cache.set_class_names(class_names)
+    return detector
 
-# Connect to CCTV stream
-print(f"Connecting to CCTV stream: {stream_url}")
-cap = cv2.VideoCapture(stream_url)
+def infer_arrays(frame, conf):
+    """Raw (xyxy, classes, confs) arrays for a frame, in full-frame coordinates"""
+    offset = (0, 0)
+    if inference_rect is not None:
+        x1, y1, x2, y2 = inference_rect
+        frame = frame[y1:y2, x1:x2]
+        offset = (x1, y1)
+    model = load_model()
+    with metrics.time("inference"):
+        xyxy, classes, confs = model.predict(frame, conf)
+    metrics.inc("frames_inferred")
+    if offset != (0, 0):
+        xyxy = xyxy + np.array([offset[0], offset[1], offset[0], offset[1]], dtype=np.float32)
+    return xyxy, classes, confs
 
-if not cap.isOpened():
-    print("Error: Cannot connect to CCTV stream!")
-    exit()
+def detect_objects(frame, frame_index=None):
+    """Run the detector on a frame (or read it from the detection cache) and return tracker detections plus the boxes to draw"""
+    if frame_cache is not None:
+        cached = frame_cache.get(frame_index)
+        if cached is not None:
+            metrics.inc("detection_cache_hits")
+        else:
+            cached = infer_arrays(frame, cache_conf_floor)
+            frame_cache.put(frame_index, *cached)
+        return parse_detection_arrays(*cached, class_names, target_classes, conf_threshold)
+    return parse_detection_arrays(*infer_arrays(frame, conf_threshold), class_names, target_classes)
 
-# Get stream properties
-ret, first_frame = cap.read()
-if not ret:
-    print("Error: Cannot read from stream!")
-    cap.release()
-    exit()
-
-frame_width = first_frame.shape[1]
-frame_height = first_frame.shape[0]
-fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
-fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-
-print(f"Connected to stream - Resolution: {frame_width}x{frame_height}, FPS: {fps}")
-
-clip_number = 1
-total_frame_count = 0
-frame_counter = 0
-skip_frame_counter = 0
-frames_per_clip = int(fps * 60 * time_threshold)
-
-# Initialize first clip
-start_time = datetime.now()
-timestamp_str = start_time.strftime("%Y%m%d_%H%M%S")
-date_str = start_time.strftime("%Y-%m-%d")
-
-# Create date folder inside Processed_Data and initialize video writer
-output_filename = None
-if save_video:
-    date_folder = os.path.join(output_folder, date_str)
-    os.makedirs(date_folder, exist_ok=True)
-    
-    output_filename = f"clip_{timestamp_str}.mp4"
-    output_path = os.path.join(date_folder, output_filename)
-    
-    # Set current video path (relative path for better portability)
-    current_video_path = os.path.join(date_str, output_filename)
-    
-    out = cv2.VideoWriter(output_path, fourcc, fps, (frame_width, frame_height))
-    print(f"\nRecording clip {clip_number}: {output_filename}")
-    print(f"Video path: {current_video_path}")
-    print(f"Recording for {time_threshold} minute(s) ({frames_per_clip} frames)")
-else:
-    out = None
-    current_video_path = None
-    print(f"\nVideo saving disabled. Running in display-only mode.")
-
-while True:
-    ret, frame = cap.read()
-    if not ret:
-        print("Stream interrupted. Saving current clip and exiting...")
-        break
-    
-    total_frame_count += 1
-    frame_counter += 1
-    skip_frame_counter += 1
-    
-    if frame.shape[1] != frame_width or frame.shape[0] != frame_height:
-        frame = cv2.resize(frame, (frame_width, frame_height))
-    
-    if skip_frame < 1:
-        skip_frame = 1
+def draw_detections(frame, boxes):
+    for (x1, y1, x2, y2), centroid, category, conf in boxes:
+        color = CATEGORY_COLORS.get(category, (0, 165, 255))
+        cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
+        cv2.putText(frame, f"{category} {conf:.2f}", (x1, y1 - 10),
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1)
+        cv2.circle(frame, centroid, 4, color, -1)
 
-    detections = []
-    tracked_objects = tracker.objects
-    processed_this_frame = False
-    
-    # Process detections only for every skip_frame-th frame
-    if skip_frame_counter % skip_frame == 0:
-        processed_this_frame = True
-        results = model.predict(frame, conf=conf_threshold, verbose=False)
-        detections = []
-        for r in results:
-            for box in r.boxes:
-                x1, y1, x2, y2 = map(int, box.xyxy[0])
-                cls_id = int(box.cls[0])
-                conf = float(box.conf[0])
-                cls_name = class_names.get(cls_id, "unknown")
-                if cls_name not in target_classes:
-                    continue
-                centroid = (int((x1 + x2) / 2), int((y1 + y2) / 2))
-                category = cls_name.capitalize()
-                detections.append((centroid, category))
-                color = (255, 0, 0) if category == "Drink" else (0, 255, 0) if category == "Food" else (0, 165, 255)
-                cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
-                cv2.putText(frame, f"{category} {conf:.2f}", (x1, y1 - 10),
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1)
-                cv2.circle(frame, centroid, 4, color, -1)
-        
-        tracked_objects = tracker.update(detections, kitchen_roi)
-    
-    draw_trails(frame, tracker)
+def draw_static_overlay(img):
+    """Parts of the overlay that never change: kitchen ROI, its label and the banner titles"""
+    draw_polygon(img, kitchen_roi, (0, 255, 255), 2)
+    cv2.putText(img, "KITCHEN", (kitchen_roi[0][0], kitchen_roi[0][1] - 10),
+               cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 255), 2)
+    cv2.putText(img, "=== LIVE IN KITCHEN ===", (20, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+    cv2.putText(img, "=== TOTAL DELIVERED ===", (20, 30 + 35 + 50), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+
+def draw_overlay(frame, tracker_view, counts, clip_number, frame_counter):
+    """Draw trails, IDs, the kitchen ROI, live counts and the clip footer"""
+    draw_trails(frame, tracker_view)
     
-    for obj_id, centroid in tracked_objects.items():
-        if obj_id in tracker.object_categories:
-            category = tracker.object_categories[obj_id]
-            color = (255, 0, 0) if category == "Drink" else (0, 255, 0) if category == "Food" else (0, 165, 255)
-            cv2.circle(frame, centroid, 6, color, 2)
-            cv2.putText(frame, f"ID:{obj_id}", (centroid[0] + 10, centroid[1]),
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.4, color, 1)
+    for slot in tracker_view.active_slots():
+        category = tracker_view.category_names[tracker_view.categories[slot]]
+        centroid = (int(tracker_view.centroids[slot, 0]), int(tracker_view.centroids[slot, 1]))
+        color = CATEGORY_COLORS.get(category, (0, 165, 255))
+        cv2.circle(frame, centroid, 6, color, 2)
+        cv2.putText(frame, f"ID:{tracker_view.ids[slot]}", (centroid[0] + 10, centroid[1]),
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.4, color, 1)
     
-    # Draw ROI
-    draw_polygon(frame, kitchen_roi, (0, 255, 255), 2)
-    cv2.putText(frame, "KITCHEN", (kitchen_roi[0][0], kitchen_roi[0][1] - 10),
-               cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 255), 2)
+    # ROI and banner titles come from the pre-rendered static layer
+    static_overlay.apply(frame)
     
     # Display counts
-    counts = get_counts_by_roi(tracker, kitchen_roi)
-    y_offset = 30
-    cv2.putText(frame, "=== LIVE IN KITCHEN ===", (20, y_offset), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-    y_offset += 35
+    y_offset = 30 + 35
     cv2.putText(frame, f"Drinks: {counts['kitchen']['drinks']} | Food: {counts['kitchen']['food']} | Parcels: {counts['kitchen']['parcels']}", 
                (20, y_offset), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 255), 2)
-    y_offset += 50
-    cv2.putText(frame, "=== TOTAL DELIVERED ===", (20, y_offset), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-    y_offset += 35
+    y_offset += 50 + 35
     cv2.putText(frame, f"Drinks: {counts['delivered']['drinks']} | Food: {counts['delivered']['food']} | Parcels: {counts['delivered']['parcels']}", 
                (20, y_offset), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
     
@@ -430,24 +194,26 @@ while True:
     frames_remaining = frames_per_clip - frame_counter
     cv2.putText(frame, f"Clip: {clip_number} | Time: {current_time} | Frames remaining: {frames_remaining} | Frame: {frame_counter}/{frames_per_clip}", 
                (20, frame.shape[0] - 20), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+
+class ClipWriter:
+    """Writes processed frames into rolling clips under Processed_Data/<date>/"""
+    def __init__(self, fps, frame_size, frames_per_clip):
+        self.fps = fps
+        self.frame_size = frame_size
+        self.frames_per_clip = frames_per_clip
+        self.clip_number = 0
+        self.clip_start_index = 0
+        self.current_video_path = None
+        self.out = None
     
-    if save_video and out is not None and processed_this_frame:
-        out.write(frame)
-    
-    # Check if it's time to start a new clip
-    if frame_counter >= frames_per_clip:
-        if save_video and out is not None:
-            out.release()
-            print(f"Clip {clip_number} saved: {current_video_path}")
-        print(f"   Total frames: {frame_counter}")
-        
-        # Start new clip
-        clip_number += 1
-        frame_counter = 0
+    def open(self, frame_index=0):
+        self.clip_number += 1
+        self.clip_start_index = frame_index
         start_time = datetime.now()
         timestamp_str = start_time.strftime("%Y%m%d_%H%M%S")
         date_str = start_time.strftime("%Y-%m-%d")
         
+        # Create date folder inside Processed_Data and initialize video writer
         if save_video:
             date_folder = os.path.join(output_folder, date_str)
             os.makedirs(date_folder, exist_ok=True)
@@ -455,32 +221,407 @@ while True:
             output_filename = f"clip_{timestamp_str}.mp4"
             output_path = os.path.join(date_folder, output_filename)
             
-            # Update current video path
-            current_video_path = os.path.join(date_str, output_filename)
+            # Set current video path (relative path for better portability)
+            self.current_video_path = os.path.join(date_str, output_filename)
             
-            out = cv2.VideoWriter(output_path, fourcc, fps, (frame_width, frame_height))
-            print(f"\nRecording clip {clip_number}: {output_filename}")
-            print(f"Video path: {current_video_path}")
-            print(f"Recording for {time_threshold} minute(s) ({frames_per_clip} frames)")
+            self.out = cv2.VideoWriter(output_path, fourcc, self.fps, self.frame_size)
+            print(f"\nRecording clip {self.clip_number}: {output_filename}")
+            print(f"Video path: {self.current_video_path}")
+            print(f"Recording for {time_threshold} minute(s) ({self.frames_per_clip} frames)")
         else:
-            out = None
-            current_video_path = None
+            self.out = None
+            self.current_video_path = None
+    
+    def frame_counter(self, frame_index):
+        """Number of stream frames read since the current clip started"""
+        return frame_index - self.clip_start_index
+    
+    def write(self, frame, frame_index=None):
+        if self.out is not None:
+            self.out.write(frame)
     
-    key = cv2.waitKey(1) & 0xFF
-    if key == ord('q'):
-        break
-
-# Cleanup
-if save_video and out is not None:
-    out.release()
-cap.release()
-cv2.destroyAllWindows()
-
-if save_video and current_video_path:
-    print(f"\nClip {clip_number} saved: {current_video_path}")
-else:
-    print(f"\nVideo saving disabled. No clip files generated.")
-print(f"Processing complete! Total clips: {clip_number}")
-if save_video:
-    print(f"Videos saved to: {output_folder}")
-print(f"Excel saved to: {excel_file_path}")
\ No newline at end of file
+    def roll_if_due(self, frame_index):
+        """Start a new clip once the current one covers frames_per_clip stream frames"""
+        frame_counter = self.frame_counter(frame_index)
+        if frame_counter < self.frames_per_clip:
+            return
+        if self.out is not None:
+            self.out.release()
+            print(f"Clip {self.clip_number} saved: {self.current_video_path}")
+        print(f"   Total frames: {frame_counter}")
+        self.open(frame_index)
+    
+    def release(self):
+        if self.out is not None:
+            self.out.release()
+            self.out = None
+
+# --- MAIN PROCESSING ---
+if __name__ == "__main__":
+    frame_cache = None
+    if not (detection_cache and os.path.isfile(stream_url)):
+        load_model()
+
+    # Background event writer so logging never blocks the tracking loop
+    event_writer = EventWriter(event_store_path, DELIVERY_COLUMNS, excel_path=excel_file_path,
+                               flush_interval=event_flush_interval, max_batch=event_flush_batch,
+                               export_excel=True).start()
+
+    # Initialize tracker with Excel callback
+    tracker = CentroidTracker(max_disappeared=10, max_distance=100, trail_length=trail_length, csv_callback=excel_logging_callback,
+                              association=association_method)
+
+    # Connect to CCTV stream
+    print(f"Connecting to CCTV stream: {stream_url}")
+    cap = cv2.VideoCapture(stream_url)
+
+    if not cap.isOpened():
+        print("Error: Cannot connect to CCTV stream!")
+        event_writer.close()
+        exit()
+
+    # Get stream properties
+    ret, first_frame = cap.read()
+    if not ret:
+        print("Error: Cannot read from stream!")
+        cap.release()
+        event_writer.close()
+        exit()
+
+    frame_width = first_frame.shape[1]
+    frame_height = first_frame.shape[0]
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+
+    print(f"Connected to stream - Resolution: {frame_width}x{frame_height}, FPS: {fps}")
+
+    frames_per_clip = int(fps * 60 * time_threshold)
+    # Recorded files are read at whatever pace processing allows; live streams run in real time
+    live_input = not os.path.isfile(stream_url)
+
+    # Rasterize zones once so ROI checks become array lookups
+    zone_map = ZoneMap({"kitchen": kitchen_roi, **extra_zones}, (frame_width, frame_height))
+
+    # Crop inference to the kitchen ROI plus margin; boxes are mapped back to full-frame coordinates
+    inference_rect = None
+    if roi_crop_inference:
+        inference_rect = crop_rect(kitchen_roi, (frame_width, frame_height), crop_margin)
+        x1, y1, x2, y2 = inference_rect
+        kept = (x2 - x1) * (y2 - y1) / float(frame_width * frame_height)
+        print(f"ROI-cropped inference: {x2 - x1}x{y2 - y1} at ({x1}, {y1}), {kept:.0%} of the frame")
+
+    # Headless unless a clip or a window needs the annotated pixels
+    headless = not (save_video or show_window)
+    static_overlay = None
+    if headless:
+        print("Headless mode: drawing and GUI calls disabled")
+    else:
+        static_overlay = StaticOverlay((frame_width, frame_height), draw_static_overlay)
+
+    # Initialize first clip
+    if save_video and recording_mode == "events":
+        # Only keep pre-roll in memory and write short clips around delivery events
+        clip_writer = EventClipRecorder(output_folder, fps, (frame_width, frame_height),
+                                        pre_roll=pre_roll_seconds, post_roll=post_roll_seconds,
+                                        max_buffer_mb=event_buffer_mb)
+        print(f"Event clip recording enabled ({pre_roll_seconds}s pre-roll, {post_roll_seconds}s post-roll)")
+    elif save_video and encoder_process:
+        # Encoding, clip rollover and naming move to their own process; frames travel through shared memory
+        clip_writer = ClipEncoder(output_folder, fps, (frame_width, frame_height), frames_per_clip,
+                                  slots=encoder_ring_slots, policy=encoder_drop_policy).start()
+        print(f"Encoder process enabled ({encoder_ring_slots} shared frame slots, policy: {encoder_drop_policy})")
+    else:
+        clip_writer = ClipWriter(fps, (frame_width, frame_height), frames_per_clip)
+        clip_writer.open()
+    if not save_video:
+        print(f"\nVideo saving disabled. Running in display-only mode.")
+
+    if skip_frame < 1:
+        skip_frame = 1
+
+    if detection_cache and os.path.isfile(stream_url):
+        # Keyed by video content, the model file the backend runs and everything that changes raw detections
+        backend_file = model_file(detector_backend, model_path, onnx_model_path)
+        if not os.path.isfile(backend_file):
+            # Creates the ONNX export, so the key covers the file that actually runs
+            load_model()
+        cache_settings = {"backend": detector_backend, "onnx_model": onnx_model_path,
+                          "imgsz": inference_imgsz, "conf_floor": cache_conf_floor,
+                          "inference_rect": inference_rect, "frame_size": [frame_width, frame_height]}
+        frame_cache = DetectionCache(os.path.join(csv_folder, "detection_cache"), stream_url,
+                                     [model_path, backend_file], cache_settings)
+        if frame_cache.class_names is None:
+            load_model()
+            frame_cache.set_class_names(class_names)
+        else:
+            class_names = frame_cache.class_names
+        print(f"Detection cache {frame_cache.key}: {len(frame_cache)} frames cached, the model only runs on misses")
+
+    # Record detections for replaying the tracking path without the model or video
+    detection_log = DetectionLog((frame_width, frame_height), kitchen_roi) if detection_log_path else None
+
+    motion_gate = None
+    if adaptive_inference:
+        motion_gate = MotionGate(kitchen_roi, threshold=motion_threshold, pixel_delta=motion_pixel_delta,
+                                 min_interval=min_infer_interval, max_interval=max_infer_interval,
+                                 baseline_interval=skip_frame)
+        print(f"Adaptive inference enabled (every {min_infer_interval}-{max_infer_interval} frames, motion >= {motion_threshold})")
+
+    def should_infer(frame_index, frame):
+        """Whether to run the detector on this frame, and how many tracker steps it covers"""
+        if motion_gate is not None:
+            if motion_gate.check(frame, frame_index):
+                return True, motion_gate.tracker_steps()
+            return False, 0
+        return frame_index % skip_frame == 0, 1
+
+    def frame_needed(frame_index):
+        """Headless fixed-cadence runs only decode frames the model still has to see"""
+        if frame_cache is None or not headless or motion_gate is not None:
+            return True
+        return frame_index % skip_frame == 0 and not frame_cache.has(frame_index)
+
+    # Food sampling shares one capture with the tracker: a hub thread decodes each frame
+    # at most once and hands it to whichever consumers are due (every skip_frame-th
+    # frame for the tracker, every TIME_THRESHOLD_MINUTES for the food sampler)
+    frame_hub = None
+    food_sampler = None
+    if food_sampling:
+        import fwc_main
+        frame_hub = FrameHub(cap, fps, live=live_input, frame_size=(frame_width, frame_height), metrics=metrics)
+        every_frame = pipeline_mode or show_window or motion_gate is not None
+        tracker_feed = frame_hub.subscribe("tracker", every_n=1 if every_frame else skip_frame,
+                                           queue_size=pipeline_queue_size)
+        food_feed = frame_hub.subscribe("food", every_seconds=fwc_main.TIME_THRESHOLD_MINUTES * 60)
+        if food_model_path == model_path:
+            food_detector = load_model()
+        else:
+            food_detector = load_shared_detector(fwc_main.DETECTOR_BACKEND, food_model_path)
+        food_writer = fwc_main.start_event_writer()
+        food_sampler = fwc_main.FoodSampler(food_detector, food_writer, show_window=False)
+        if not live_input:
+            food_started_at = fwc_main.recording_start(stream_url, cap.get(cv2.CAP_PROP_FRAME_COUNT) / fps)
+        print(f"Shared decoding: tracker every {1 if every_frame else skip_frame} frame(s), "
+              f"food sampler every {fwc_main.TIME_THRESHOLD_MINUTES} min "
+              f"({'one shared model' if food_detector is detector else 'separate food model'})")
+
+    def food_sampling_loop():
+        while True:
+            item = food_feed.get()
+            if item is None:
+                break
+            _, stream_time, frame = item
+            now = datetime.now() if frame_hub.live else food_started_at + timedelta(seconds=stream_time)
+            try:
+                with metrics.time("food_sample"):
+                    food_sampler.process(frame, now)
+                metrics.inc("food_samples")
+            except Exception as e:
+                print(f"Food sampling failed: {e}")
+
+    def next_frame():
+        """(ret, stream frame index, frame) for the serial loop; frame is None when only grabbed"""
+        if frame_hub is not None:
+            item = tracker_feed.get()
+            if item is None:
+                return False, None, None
+            return True, item[0], item[2]
+        frame_index = total_frame_count + 1
+        ret, frame = read_frame() if frame_needed(frame_index) else grab_frame()
+        return ret, frame_index, frame
+
+    def read_frame():
+        if frame_hub is not None:
+            item = tracker_feed.get()
+            return (False, None) if item is None else (True, item[2])
+        with metrics.time("decode"):
+            ret, frame = cap.read()
+            if ret and (frame.shape[1] != frame_width or frame.shape[0] != frame_height):
+                frame = cv2.resize(frame, (frame_width, frame_height))
+        if ret:
+            metrics.inc("frames_read")
+        return ret, frame
+
+    def grab_frame():
+        """Advance the stream without decoding (frames nothing will look at)"""
+        with metrics.time("grab"):
+            ret = cap.grab()
+        if ret:
+            metrics.inc("frames_read")
+        return ret, None
+
+    def update_tracker(detections, steps):
+        with metrics.time("tracker"):
+            tracker.update(detections, zone_map, steps=steps)
+
+    def write_clip(frame, frame_index):
+        with metrics.time("encode"):
+            clip_writer.write(frame, frame_index)
+        metrics.inc("frames_encoded")
+
+    def collect_metrics(m):
+        """Gauges read from the components right before each publish"""
+        m.set("event_queue_depth", event_writer.pending())
+        m.set("events_logged", event_writer.events_logged)
+        m.set("events_written", event_writer.events_written)
+        m.set("event_flushes", event_writer.flushes)
+        m.set("event_last_flush_seconds", event_writer.last_flush_seconds)
+        m.set("event_flush_seconds", event_writer.flush_seconds_total)
+        m.set("tracked_objects", len(tracker))
+        if pipeline is not None:
+            for stage, depth in pipeline.queue_depths().items():
+                m.set(f"queue_depth_{stage}", depth)
+            for stage, counts in pipeline.stats.snapshot().items():
+                m.set(f"frames_dropped_{stage}", counts['dropped'])
+        if isinstance(clip_writer, ClipEncoder):
+            m.set("frames_dropped_encoder", clip_writer.frames_dropped)
+        if motion_gate is not None:
+            m.set("inferences_saved_motion", motion_gate.stats()["inferences_saved"])
+        if frame_hub is not None:
+            m.set("frames_decoded", frame_hub.frames_decoded)
+            for sub in frame_hub.subscriptions:
+                m.set(f"queue_depth_hub_{sub.name}", sub.depth())
+                m.set(f"frames_dropped_hub_{sub.name}", sub.frames_dropped)
+
+    pipeline = None
+    metrics_publisher = MetricsPublisher(metrics, metrics_path, metrics_interval, collect_metrics).start()
+
+    food_thread = None
+    if frame_hub is not None:
+        food_thread = threading.Thread(target=food_sampling_loop, name="food-sampler", daemon=True)
+        food_thread.start()
+        frame_hub.start()
+
+    if pipeline_mode:
+        # Capture, inference + tracking, rendering and encoding each run on their
+        # own thread. On a live stream inference always takes the newest captured
+        # frame, so the detector runs as fast as the CPU allows while capture stays
+        # real-time. A recorded file is paced instead: every frame reaches inference
+        # and the usual cadence applies, so a rerun gives the same events.
+        print(f"Pipelined mode enabled (queue size {pipeline_queue_size})")
+
+        def infer_stage(frame_index, frame):
+            global event_frame_index, last_inferred_index
+            if motion_gate is not None or not live_input:
+                run, steps = should_infer(frame_index, frame)
+                if not run:
+                    return None
+            else:
+                # Frames dropped since the last inference still age the tracks
+                steps = max(1, (frame_index - last_inferred_index) // skip_frame)
+            last_inferred_index = frame_index
+            detections, boxes = detect_objects(frame, frame_index)
+            if detection_log is not None:
+                detection_log.add(frame_index, detections)
+            event_frame_index = frame_index
+            update_tracker(detections, steps)
+            if headless:
+                return None
+            # Clip state is read here, with the tracker snapshot, not on the render thread
+            clip_info = (clip_writer.clip_number, clip_writer.frame_counter(frame_index))
+            return (frame_index, frame, boxes, tracker.snapshot(), clip_info)
+
+        def render_stage(packet):
+            frame_index, frame, boxes, tracker_view, (clip_number, frame_counter) = packet
+            with metrics.time("draw"):
+                draw_detections(frame, boxes)
+                draw_overlay(frame, tracker_view, tracker_view.counts(), clip_number, frame_counter)
+            return frame_index, frame
+
+        def encode_stage(packet):
+            frame_index, frame = packet
+            clip_writer.roll_if_due(frame_index)
+            if save_video:
+                write_clip(frame, frame_index)
+            if show_window:
+                cv2.imshow("Kitchen Tracking", frame)
+                if cv2.waitKey(1) & 0xFF == ord('q'):
+                    pipeline.stop()
+
+        pipeline = FramePipeline(read_frame, infer_stage, render_stage, encode_stage,
+                                 queue_size=pipeline_queue_size, paced=not live_input)
+        try:
+            pipeline.start().join(report_every=30)
+        except KeyboardInterrupt:
+            print("Stopping pipeline...")
+            pipeline.stop()
+            pipeline.join()
+        pipeline.print_stats()
+        total_frame_count = pipeline.frames_read
+    else:
+        total_frame_count = 0
+
+        while True:
+            ret, frame_index, frame = next_frame()
+            if not ret:
+                print("Stream interrupted. Saving current clip and exiting...")
+                break
+
+            total_frame_count = frame_index
+
+            processed_this_frame = False
+
+            # Process detections only for every skip_frame-th frame (or when the motion gate says so)
+            run, steps = should_infer(total_frame_count, frame)
+            if run:
+                processed_this_frame = True
+                detections, boxes = detect_objects(frame, total_frame_count)
+                if detection_log is not None:
+                    detection_log.add(total_frame_count, detections)
+                event_frame_index = total_frame_count
+                update_tracker(detections, steps)
+
+            # Only draw frames that are encoded or shown
+            encode_this_frame = save_video and processed_this_frame
+            if encode_this_frame or show_window:
+                with metrics.time("draw"):
+                    if processed_this_frame:
+                        draw_detections(frame, boxes)
+                    draw_overlay(frame, tracker, tracker.counts(),
+                                 clip_writer.clip_number, clip_writer.frame_counter(total_frame_count))
+
+            if encode_this_frame:
+                write_clip(frame, total_frame_count)
+
+            # Check if it's time to start a new clip
+            clip_writer.roll_if_due(total_frame_count)
+
+            if show_window:
+                cv2.imshow("Kitchen Tracking", frame)
+                key = cv2.waitKey(1) & 0xFF
+                if key == ord('q'):
+                    break
+
+    if motion_gate is not None:
+        motion_gate.print_stats()
+
+    # Cleanup
+    if frame_hub is not None:
+        frame_hub.stop()
+        frame_hub.join()
+        food_thread.join()
+        food_writer.close()
+        print(f"Shared decoding: {frame_hub.frames_decoded} of {frame_hub.frames_read} frames decoded, "
+              f"{metrics.counters.get('food_samples', 0)} food samples")
+    clip_writer.release()
+    cap.release()
+    if show_window:
+        cv2.destroyAllWindows()
+    event_writer.close()
+    metrics_publisher.close()
+    if frame_cache is not None:
+        frame_cache.save()
+        print(f"Detection cache: {frame_cache.hits} hits, {frame_cache.misses} misses ({frame_cache.path})")
+    if detection_log is not None:
+        detection_log.save(detection_log_path)
+        print(f"Detections saved to: {detection_log_path} ({len(detection_log)} frames)")
+
+    if save_video and clip_writer.current_video_path:
+        print(f"\nClip {clip_writer.clip_number} saved: {clip_writer.current_video_path}")
+    else:
+        print(f"\nVideo saving disabled. No clip files generated.")
+    print(f"Processing complete! Total clips: {clip_writer.clip_number}")
+    if save_video:
+        print(f"Videos saved to: {output_folder}")
+    print(f"Events saved to: {event_store_path} ({event_writer.events_written} written this run)")
+    print(f"Excel saved to: {excel_file_path}")
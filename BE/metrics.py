@@ -0,0 +1,168 @@
+# Stage timers / counters published by the video scripts and served by app.py as Prometheus text
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Latency histogram bucket bounds in seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram in the Prometheus layout"""
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.count += 1
+        self.sum += value
+
+    def snapshot(self):
+        return {'buckets': list(self.buckets), 'counts': list(self.counts), 'count': self.count, 'sum': self.sum}
+
+
+class Metrics:
+    """
+    Counters, gauges and per-stage latency histograms for one process.
+
+    Updates only touch in-memory numbers under a lock, so they are cheap
+    enough for the frame loop; MetricsPublisher writes snapshots to disk.
+    """
+    def __init__(self, source):
+        self.source = source
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+
+    def inc(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def set(self, name, value):
+        with self._lock:
+            self.gauges[name] = value
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = self.histograms[stage] = Histogram()
+            histogram.observe(seconds)
+
+    @contextmanager
+    def time(self, stage):
+        """Time a block into the stage's latency histogram"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'source': self.source,
+                'started_at': self.started_at,
+                'updated_at': time.time(),
+                'counters': dict(self.counters),
+                'gauges': dict(self.gauges),
+                'stages': {stage: h.snapshot() for stage, h in self.histograms.items()},
+            }
+
+
+class MetricsPublisher:
+    """
+    Writes a Metrics snapshot to a JSON file every interval seconds.
+
+    collect_fn (optional) is called first to refresh gauges that are cheaper
+    to read than to track, such as queue depths. The file is replaced
+    atomically so readers never see a partial snapshot.
+    """
+    def __init__(self, metrics, path, interval=5.0, collect_fn=None):
+        self.metrics = metrics
+        self.path = path
+        self.interval = interval
+        self.collect_fn = collect_fn
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="metrics-publisher", daemon=True)
+        self._thread.start()
+        return self
+
+    def publish(self):
+        if self.collect_fn is not None:
+            try:
+                self.collect_fn(self.metrics)
+            except Exception as e:
+                print(f"Metrics collection failed: {e}")
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.metrics.snapshot(), f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Metrics publish failed: {e}")
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.publish()
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(self.interval + 1)
+            self._thread = None
+        self.publish()
+
+
+def _label_value(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def render_prometheus(snapshots, prefix="kitchen_"):
+    """Prometheus text exposition of published snapshots (one per source process)"""
+    lines = []
+
+    def family(name, kind, help_text, samples):
+        if not samples:
+            return
+        lines.append(f"# HELP {prefix}{name} {help_text}")
+        lines.append(f"# TYPE {prefix}{name} {kind}")
+        lines.extend(samples)
+
+    def metric_name(name):
+        return "".join(c if c.isalnum() or c == "_" else "_" for c in name)
+
+    names = sorted({(kind, n) for s in snapshots for kind in ('counters', 'gauges') for n in s[kind]})
+    for kind, name in names:
+        full_name = metric_name(name) + ("_total" if kind == 'counters' else "")
+        samples = [f'{prefix}{full_name}{{source="{_label_value(s["source"])}"}} {s[kind][name]}'
+                   for s in snapshots if name in s[kind]]
+        family(full_name, "counter" if kind == 'counters' else "gauge", name.replace("_", " "), samples)
+
+    samples = []
+    for s in snapshots:
+        for stage, h in sorted(s['stages'].items()):
+            labels = f'source="{_label_value(s["source"])}",stage="{_label_value(stage)}"'
+            for bound, count in zip(h['buckets'], h['counts']):
+                samples.append(f'{prefix}stage_seconds_bucket{{{labels},le="{bound}"}} {count}')
+            samples.append(f'{prefix}stage_seconds_bucket{{{labels},le="+Inf"}} {h["count"]}')
+            samples.append(f'{prefix}stage_seconds_sum{{{labels}}} {h["sum"]}')
+            samples.append(f'{prefix}stage_seconds_count{{{labels}}} {h["count"]}')
+    family("stage_seconds", "histogram", "Per-stage processing latency in seconds", samples)
+
+    samples = [f'{prefix}metrics_age_seconds{{source="{_label_value(s["source"])}"}} {time.time() - s["updated_at"]:.3f}'
+               for s in snapshots]
+    family("metrics_age_seconds", "gauge", "Seconds since the source last published", samples)
+    return "\n".join(lines) + "\n"
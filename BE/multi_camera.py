@@ -0,0 +1,234 @@
+# Multi-camera kitchen tracking: one detector and one batched predict per tick for all cameras
+import cv2 #type: ignore
+import numpy as np
+import os
+import threading
+import time
+from datetime import datetime
+from pipeline import LatestFrameSlot
+from tracker import CentroidTracker
+from detection import parse_detection_arrays, crop_rect
+from detectors import load_detector
+from zones import ZoneMap
+from event_log import EventWriter, DELIVERY_COLUMNS, delivery_row
+
+# --- CONFIG ---
+model_path = r"C:\Users\ntrst\Downloads\best (12).pt"
+csv_folder = r"Data"
+target_classes = {"drink", "food", "parcel"}
+conf_threshold = 0.25
+trail_length = 30
+association_method = "optimal"  # Tracker matching: "greedy" or "optimal" (Hungarian)
+tick_interval = 0.0  # Minimum seconds between batches (0 = as fast as the CPU allows)
+stats_interval = 30  # Seconds between stats prints
+inference_imgsz = None  # Detector input size (e.g. 640); None uses the model default
+detector_backend = "pytorch"  # "pytorch", "onnx" or "onnx-int8" (build and compare them with detectors.py)
+onnx_model_path = None  # ONNX file for the onnx backends; None uses the export next to model_path
+
+# One entry per camera; every camera gets its own stream, ROI and tracker
+CAMERAS = [
+    {
+        "name": "kitchen_1",
+        "stream_url": r"D:\company videos\Ekkagra\2025-10-28\video_20251028_163322.avi",
+        "kitchen_roi": [[368, 518], [709, 245], [865, 317], [1222, 30], [1502, 114],
+                        [1345, 726], [1558, 822], [1471, 1074], [811, 1070],
+                        [372, 1068], [324, 1036], [602, 668]],
+    },
+]
+
+
+class CameraConfig:
+    """Per-camera settings for the multi-camera runner"""
+    def __init__(self, name, stream_url, kitchen_roi, max_disappeared=10, max_distance=100,
+                 event_store_path=None, zones=None, crop_margin=None):
+        self.name = name
+        self.stream_url = stream_url
+        self.kitchen_roi = np.array(kitchen_roi, dtype=np.int32)
+        # Extra named zones besides the kitchen, e.g. {"pass": [[x, y], ...]}
+        self.zones = zones or {}
+        # Crop inference to the kitchen ROI plus this many px (None = full frame)
+        self.crop_margin = crop_margin
+        self.max_disappeared = max_disappeared
+        self.max_distance = max_distance
+        # Rows carry no camera column, so each camera logs to its own store unless one is given
+        self.event_store_path = event_store_path or os.path.join(csv_folder, f"Processed_Data_{name}.csv")
+
+
+class CameraWorker:
+    """Decodes one camera on its own thread, keeping only the newest frame for inference"""
+    def __init__(self, config, tracker):
+        self.config = config
+        self.tracker = tracker
+        self.slot = LatestFrameSlot()
+        self.frames_read = 0
+        self.frames_dropped = 0
+        self.frames_inferred = 0
+        self.zone_map = None
+        self.inference_rect = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def finished(self):
+        return self.slot.closed
+
+    def start(self):
+        self._thread = threading.Thread(target=self._capture_loop, name=f"capture-{self.config.name}", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _capture_loop(self):
+        cap = cv2.VideoCapture(self.config.stream_url)
+        if not cap.isOpened():
+            print(f"[{self.config.name}] Error: Cannot connect to stream {self.config.stream_url}")
+            self.slot.close()
+            return
+        print(f"[{self.config.name}] Connected to stream: {self.config.stream_url}")
+        try:
+            while not self._stop.is_set():
+                ret, frame = cap.read()
+                if not ret:
+                    print(f"[{self.config.name}] Stream interrupted.")
+                    break
+                self.frames_read += 1
+                if self.slot.put(frame):
+                    self.frames_dropped += 1
+        finally:
+            cap.release()
+            self.slot.close()
+
+    def take_frame(self):
+        """Newest unread frame, or None if nothing new arrived since the last tick"""
+        return self.slot.get(timeout=0)
+
+
+class MultiCameraRunner:
+    """
+    Serves many cameras from a single detector instance (any detectors.py backend).
+
+    Each tick collects the newest frame from every camera that has one, runs a
+    single detector.predict_batch over all of them and hands each result back
+    to that camera's own CentroidTracker.
+    """
+    def __init__(self, detector, cameras, conf_threshold=0.25, target_classes=None,
+                 trail_length=30, tick_interval=0.0, callback_factory=None, association='greedy'):
+        self.detector = detector
+        self.class_names = {i: n.lower() for i, n in detector.names.items()}
+        self.conf_threshold = conf_threshold
+        self.target_classes = target_classes or {"drink", "food", "parcel"}
+        self.tick_interval = tick_interval
+        self.workers = []
+        for config in cameras:
+            callback = callback_factory(config) if callback_factory else None
+            tracker = CentroidTracker(max_disappeared=config.max_disappeared, max_distance=config.max_distance,
+                                      trail_length=trail_length, csv_callback=callback, association=association)
+            self.workers.append(CameraWorker(config, tracker))
+        self.batches = 0
+        self.batch_time = 0.0
+
+    def tick(self):
+        """Run one batched inference over the newest frames. Returns the batch size."""
+        batch = []
+        for worker in self.workers:
+            frame = worker.take_frame()
+            if frame is not None:
+                batch.append((worker, frame))
+        if not batch:
+            return 0
+
+        start = time.perf_counter()
+        inputs = []
+        for worker, frame in batch:
+            if worker.zone_map is None:
+                # Zones and the crop are computed once, at the resolution of the camera's first frame
+                frame_size = (frame.shape[1], frame.shape[0])
+                worker.zone_map = ZoneMap({"kitchen": worker.config.kitchen_roi, **worker.config.zones}, frame_size)
+                if worker.config.crop_margin is not None:
+                    worker.inference_rect = crop_rect(worker.config.kitchen_roi, frame_size, worker.config.crop_margin)
+            if worker.inference_rect is not None:
+                x1, y1, x2, y2 = worker.inference_rect
+                frame = frame[y1:y2, x1:x2]
+            inputs.append(frame)
+
+        results = self.detector.predict_batch(inputs, self.conf_threshold)
+        for (worker, _), (xyxy, classes, confs) in zip(batch, results):
+            if worker.inference_rect is not None:
+                # Back to full-frame coordinates
+                x1, y1 = worker.inference_rect[:2]
+                xyxy = xyxy + np.array([x1, y1, x1, y1], dtype=np.float32)
+            detections, _ = parse_detection_arrays(xyxy, classes, confs, self.class_names, self.target_classes)
+            worker.tracker.update(detections, worker.zone_map)
+            worker.frames_inferred += 1
+        self.batch_time += time.perf_counter() - start
+        self.batches += 1
+        return len(batch)
+
+    def print_stats(self):
+        avg_ms = (self.batch_time / self.batches * 1000) if self.batches else 0.0
+        print(f"Batches: {self.batches} | Avg batch time: {avg_ms:.1f} ms")
+        for worker in self.workers:
+            counts = worker.tracker.counts()
+            print(f"  [{worker.config.name}] read: {worker.frames_read} | inferred: {worker.frames_inferred} | "
+                  f"dropped: {worker.frames_dropped} | delivered: {counts['delivered']}")
+
+    def run(self, stats_interval=30):
+        for worker in self.workers:
+            worker.start()
+        last_stats = time.time()
+        try:
+            while True:
+                tick_start = time.time()
+                if self.tick() == 0:
+                    if all(worker.finished for worker in self.workers):
+                        break
+                    time.sleep(0.005)
+                if stats_interval and time.time() - last_stats >= stats_interval:
+                    self.print_stats()
+                    last_stats = time.time()
+                remaining = self.tick_interval - (time.time() - tick_start)
+                if remaining > 0:
+                    time.sleep(remaining)
+        except KeyboardInterrupt:
+            print("Stopping cameras...")
+        finally:
+            for worker in self.workers:
+                worker.stop()
+        self.print_stats()
+
+
+def event_callback_factory(writers):
+    """Build per-camera tracker callbacks that queue delivery events on a shared EventWriter per store"""
+    def factory(config):
+        if config.event_store_path not in writers:
+            writers[config.event_store_path] = EventWriter(config.event_store_path, DELIVERY_COLUMNS).start()
+        writer = writers[config.event_store_path]
+
+        def callback(category, change):
+            now = datetime.now()
+            date_str = now.strftime("%Y-%m-%d")
+            timestamp_str = now.strftime("%I:%M:%S %p")
+            writer.log(delivery_row(date_str, timestamp_str, category, change, "N/A"))
+            action = "delivered" if change > 0 else "returned"
+            print(f"[{config.name}] Event logged: {category} {action} at {timestamp_str}")
+        return callback
+    return factory
+
+
+if __name__ == "__main__":
+    os.makedirs(csv_folder, exist_ok=True)
+    print(f"Loading detector ({detector_backend})...")
+    detector = load_detector(detector_backend, model_path, inference_imgsz, onnx_model_path)
+    cameras = [CameraConfig(**camera) for camera in CAMERAS]
+    print(f"Running {len(cameras)} camera(s) on one model instance")
+    writers = {}
+    runner = MultiCameraRunner(detector, cameras, conf_threshold=conf_threshold, target_classes=target_classes,
+                               trail_length=trail_length, tick_interval=tick_interval,
+                               callback_factory=event_callback_factory(writers), association=association_method)
+    try:
+        runner.run(stats_interval=stats_interval)
+    finally:
+        for writer in writers.values():
+            writer.close()
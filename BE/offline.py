@@ -0,0 +1,216 @@
+# Parallel offline processing of recorded videos, faster than real time
+import cv2 #type: ignore
+import numpy as np
+import os
+import re
+import time
+import multiprocessing as mp
+from datetime import datetime, timedelta
+from tracker import CentroidTracker
+from detection import parse_detection_arrays, crop_rect
+from detectors import load_detector
+from zones import ZoneMap
+from event_log import EventWriter, DELIVERY_COLUMNS, delivery_row
+# Detector, ROI and tracker settings are shared with the live run so counts match it
+from main import (model_path, stream_url, target_classes, conf_threshold, trail_length, skip_frame,
+                  association_method, roi_crop_inference, crop_margin, inference_imgsz, kitchen_roi,
+                  extra_zones, excel_file_path, event_store_path, detector_backend, onnx_model_path)
+
+# --- CONFIG ---
+videos = [stream_url]  # Recordings to process, in order
+offline_workers = 4  # Processes, each loads its own copy of the model
+segment_minutes = 10  # Length of video each worker processes per task
+overlap_seconds = 60  # Warm-up before each segment so the tracker picks up objects already in view
+max_disappeared = 10  # Same tracker settings as main.py
+max_distance = 100
+
+_detector = None
+_class_names = None
+
+
+def recording_start(video_path, duration_seconds):
+    """Wall-clock time of the first frame: from a video_YYYYmmdd_HHMMSS name, else file mtime minus duration"""
+    match = re.search(r"(\d{8})_(\d{6})", os.path.basename(video_path))
+    if match:
+        return datetime.strptime(match.group(1) + match.group(2), "%Y%m%d%H%M%S")
+    return datetime.fromtimestamp(os.path.getmtime(video_path)) - timedelta(seconds=duration_seconds)
+
+
+def plan_segments(frame_count, fps, segment_minutes, overlap_seconds):
+    """(warmup_start, start, end) frame ranges; the last segment runs to the end of the file"""
+    segment_frames = max(1, int(fps * 60 * segment_minutes))
+    overlap_frames = int(fps * overlap_seconds)
+    segments = []
+    for start in range(0, max(frame_count, 1), segment_frames):
+        end = start + segment_frames if start + segment_frames < frame_count else None
+        segments.append((max(0, start - overlap_frames), start, end))
+    return segments
+
+
+def tracker_signature(tracker):
+    """State that decides every future event; equal signatures mean identical events from here on"""
+    return tuple(
+        (tracker.category_names[tracker.categories[s]], int(tracker.centroids[s, 0]), int(tracker.centroids[s, 1]),
+         int(tracker.disappeared_counts[s]), bool(tracker.in_kitchen[s]), bool(tracker.in_kitchen_now[s]),
+         bool(tracker.delivered[s]))
+        for s in tracker.active_slots()
+    )
+
+
+def open_at(video_path, frame_index):
+    """
+    VideoCapture whose next grab() returns frame frame_index of a serial read.
+
+    Frame seeks are not frame-accurate for many AVI / long-GOP MP4 files, so
+    the position is checked after the seek. If it landed elsewhere, the
+    earlier frame it reports (a keyframe the seek could reach) is sought
+    again and checked, then frames are grabbed up to frame_index. If that
+    fails too, the file is read from the start.
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not frame_index:
+        return cap
+    cap.set(cv2.CAP_PROP_POS_FRAMES, frame_index)
+    landed = int(cap.get(cv2.CAP_PROP_POS_FRAMES))
+    if landed == frame_index:
+        return cap
+    if 0 < landed < frame_index:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, landed)
+        if int(cap.get(cv2.CAP_PROP_POS_FRAMES)) != landed:
+            landed = 0
+    else:
+        landed = 0
+    if landed == 0:
+        cap.release()
+        cap = cv2.VideoCapture(video_path)
+    for _ in range(frame_index - landed):
+        if not cap.grab():
+            break
+    return cap
+
+
+def _init_worker():
+    global _detector, _class_names
+    _detector = load_detector(detector_backend, model_path, inference_imgsz, onnx_model_path)
+    _class_names = {i: n.lower() for i, n in _detector.names.items()}
+
+
+def _detect(frame, inference_rect):
+    offset = (0, 0)
+    if inference_rect is not None:
+        x1, y1, x2, y2 = inference_rect
+        frame = frame[y1:y2, x1:x2]
+        offset = (x1, y1)
+    xyxy, classes, confs = _detector.predict(frame, conf_threshold)
+    xyxy = xyxy + np.array([offset[0], offset[1], offset[0], offset[1]], dtype=np.float32)
+    return parse_detection_arrays(xyxy, classes, confs, _class_names, target_classes)[0]
+
+
+def process_segment(task):
+    """
+    Run detection + tracking over one segment of a recording.
+
+    Without a seed tracker the segment starts warmup_start frames early with
+    a fresh tracker and events before start are discarded; with one it starts
+    exactly at start. Returns the events (frame index, PTS ms, category,
+    change), the tracker signature at start and the tracker at end.
+    """
+    video_path, warmup_start, start, end, seed = task
+    tracker = seed or CentroidTracker(max_disappeared=max_disappeared, max_distance=max_distance,
+                                      trail_length=trail_length, association=association_method)
+    frame_index = start if seed is not None else warmup_start
+    events = []
+    pts = [0.0]
+
+    def on_event(category, change):
+        if frame_index >= start:
+            events.append((frame_index, pts[0], category, change))
+
+    tracker.csv_callback = on_event
+    cap = open_at(video_path, frame_index)
+    frame_size = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+    zone_map = ZoneMap({"kitchen": kitchen_roi, **extra_zones}, frame_size)
+    inference_rect = crop_rect(kitchen_roi, frame_size, crop_margin) if roi_crop_inference else None
+
+    start_signature = tracker_signature(tracker) if frame_index == start else None
+    frames = 0
+    while end is None or frame_index < end:
+        # Frames between inferences are only grabbed, never decoded
+        # (main.py never runs the detector on frame 0, which it reads for the stream properties)
+        infer = frame_index > 0 and frame_index % skip_frame == 0
+        if not cap.grab():
+            break
+        if infer:
+            ret, frame = cap.retrieve()
+            if not ret:
+                break
+            pts[0] = cap.get(cv2.CAP_PROP_POS_MSEC)
+            tracker.update(_detect(frame, inference_rect), zone_map)
+        frame_index += 1
+        frames += 1
+        if frame_index == start:
+            start_signature = tracker_signature(tracker)
+    cap.release()
+
+    tracker.csv_callback = None
+    return {"start": start, "events": events, "start_signature": start_signature,
+            "tracker": tracker, "frames": frames}
+
+
+def process_video(pool, video_path, writer):
+    """Process one recording on the pool and log its events; returns (events, video seconds)"""
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        print(f"Error: Cannot open {video_path}")
+        return 0, 0.0
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+    duration = frame_count / fps
+    started_at = recording_start(video_path, duration)
+
+    segments = plan_segments(frame_count, fps, segment_minutes, overlap_seconds)
+    print(f"\n{os.path.basename(video_path)}: {frame_count} frames ({duration / 60:.1f} min), "
+          f"{len(segments)} segment(s), recorded from {started_at}")
+    tasks = [(video_path, warmup, start, end, None) for warmup, start, end in segments]
+    results = pool.map(process_segment, tasks, chunksize=1)
+
+    # Stitch: a segment is kept only if its warmed-up tracker matches the previous
+    # segment's final tracker at the boundary; otherwise it is rerun from that state
+    stitched = [results[0]]
+    reruns = 0
+    for (warmup, start, end), result in zip(segments[1:], results[1:]):
+        previous = stitched[-1]["tracker"]
+        if result["start_signature"] != tracker_signature(previous):
+            reruns += 1
+            result = pool.apply(process_segment, ((video_path, warmup, start, end, previous),))
+        stitched.append(result)
+    print(f"Stitched {len(segments)} segment(s), {reruns} rerun from the previous segment's tracker state")
+
+    logged = 0
+    for result in stitched:
+        for frame_index, pts_ms, category, change in result["events"]:
+            when = started_at + timedelta(milliseconds=pts_ms)
+            # No clip under Processed_Data covers these events (Video_Path is resolved against it)
+            writer.log(delivery_row(when.strftime("%Y-%m-%d"), when.strftime("%I:%M:%S %p"),
+                                    category, change, "N/A"))
+            logged += 1
+    return logged, duration
+
+
+if __name__ == "__main__":
+    event_writer = EventWriter(event_store_path, DELIVERY_COLUMNS, excel_path=excel_file_path,
+                               export_excel=True).start()
+    t0 = time.time()
+    total_events = 0
+    total_video = 0.0
+    with mp.get_context("spawn").Pool(offline_workers, initializer=_init_worker) as pool:
+        for video_path in videos:
+            events, duration = process_video(pool, video_path, event_writer)
+            total_events += events
+            total_video += duration
+    event_writer.close()
+    elapsed = time.time() - t0
+    print(f"\nProcessed {total_video / 60:.1f} min of video in {elapsed / 60:.1f} min "
+          f"({total_video / max(elapsed, 1e-6):.1f}x real time) with {offline_workers} workers")
+    print(f"Events saved to: {event_store_path} ({total_events} this run)")
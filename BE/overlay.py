@@ -0,0 +1,46 @@
+# Pre-rendered static overlay layer for annotated frames
+import numpy as np
+
+
+class StaticOverlay:
+    """
+    Overlay parts that never change between frames (ROI polygons, labels, banners).
+
+    draw_fn is called once on a black and once on a white canvas of the frame
+    size, which gives each touched pixel's premultiplied color and alpha
+    (anti-aliased text edges included). apply() then copies the opaque pixels
+    and alpha-blends the edge pixels onto a frame instead of redrawing the shapes.
+    """
+    def __init__(self, frame_size, draw_fn):
+        width, height = frame_size
+        self.frame_size = (width, height)
+        black = np.zeros((height, width, 3), dtype=np.uint8)
+        white = np.full((height, width, 3), 255, dtype=np.uint8)
+        draw_fn(black)
+        draw_fn(white)
+        # white = color * a + 255 * (1 - a), black = color * a
+        alpha = 255 - (white.astype(np.int16) - black.astype(np.int16))
+        alpha = np.clip(alpha, 0, 255).astype(np.uint8).reshape(-1)
+        premultiplied = black.reshape(-1)
+
+        pixel_alpha = alpha.reshape(-1, 3)
+        opaque_px = np.flatnonzero((pixel_alpha == 255).all(axis=1))
+        partial_px = np.flatnonzero((pixel_alpha > 0).any(axis=1) & ~(pixel_alpha == 255).all(axis=1))
+        # Flat byte indices (3 per pixel) so apply() is one gather/scatter per group
+        channels = np.arange(3)
+        self.opaque_index = (opaque_px[:, None] * 3 + channels).ravel()
+        self.opaque_values = premultiplied[self.opaque_index]
+        self.partial_index = (partial_px[:, None] * 3 + channels).ravel()
+        self.partial_values = premultiplied[self.partial_index].astype(np.uint16)
+        self.partial_keep = (255 - alpha[self.partial_index]).astype(np.uint16)
+
+    def apply(self, frame):
+        h, w = frame.shape[:2]
+        if (w, h) != self.frame_size:
+            raise ValueError(f"Overlay built for {self.frame_size}, got frame of {(w, h)}")
+        flat = frame.reshape(-1)
+        if len(self.partial_index):
+            under = flat[self.partial_index].astype(np.uint16)
+            flat[self.partial_index] = np.minimum(self.partial_values + (under * self.partial_keep + 127) // 255, 255)
+        flat[self.opaque_index] = self.opaque_values
+        return frame
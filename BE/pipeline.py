@@ -0,0 +1,239 @@
+# Threaded capture / inference / render / encode pipeline for the kitchen tracker
+import threading
+import queue
+import time
+
+
+class LatestFrameSlot:
+    """Single-slot buffer where a newer frame replaces an unread one (latest frame wins)"""
+
+    def __init__(self):
+        self._item = None
+        self._has_item = False
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def put(self, item):
+        """Store item, returns True if an unread item was overwritten"""
+        with self._cond:
+            dropped = self._has_item
+            self._item = item
+            self._has_item = True
+            self._cond.notify_all()
+            return dropped
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def get(self, timeout=None):
+        """Return the newest item, or None once the slot is closed and drained"""
+        with self._cond:
+            while not self._has_item:
+                if self._closed:
+                    return None
+                if not self._cond.wait(timeout):
+                    return None
+            item = self._item
+            self._item = None
+            self._has_item = False
+            self._cond.notify_all()
+            return item
+
+    def wait_empty(self, timeout=None):
+        """Block until the unread item has been taken; False on timeout"""
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._has_item or self._closed, timeout)
+
+    def qsize(self):
+        with self._cond:
+            return 1 if self._has_item else 0
+
+
+class StageStats:
+    """Thread-safe processed/dropped counters for each pipeline stage"""
+
+    def __init__(self, stages):
+        self._lock = threading.Lock()
+        self._counts = {name: {'processed': 0, 'dropped': 0} for name in stages}
+
+    def add(self, stage, key, n=1):
+        with self._lock:
+            self._counts[stage][key] += n
+
+    def snapshot(self):
+        with self._lock:
+            return {name: dict(values) for name, values in self._counts.items()}
+
+
+_STOP = object()
+
+
+class FramePipeline:
+    """
+    Runs capture, inference + tracking, overlay rendering and clip encoding
+    on separate threads joined by bounded queues.
+
+    read_fn()                 -> (ret, frame), same contract as cv2.VideoCapture.read
+    infer_fn(index, frame)    -> packet handed to the render stage (None to skip)
+    render_fn(packet)         -> packet handed to the encode stage (None to skip)
+    encode_fn(packet)         -> writes the rendered frame
+
+    Capture keeps only the newest frame for inference, so a slow model never
+    backs up decoding. With paced (recorded files) capture instead waits for
+    inference to take each frame, so no frame is dropped and runs over the same
+    file are repeatable. The render and encode queues are bounded and drop their
+    oldest entry when full; every drop is counted per stage.
+    """
+
+    STAGES = ('capture', 'inference', 'render', 'encode')
+
+    def __init__(self, read_fn, infer_fn, render_fn=None, encode_fn=None, queue_size=4, paced=False):
+        self.read_fn = read_fn
+        self.paced = paced
+        self.infer_fn = infer_fn
+        self.render_fn = render_fn
+        self.encode_fn = encode_fn
+        self.frame_slot = LatestFrameSlot()
+        self.render_queue = queue.Queue(maxsize=queue_size)
+        self.encode_queue = queue.Queue(maxsize=queue_size)
+        self.stats = StageStats(self.STAGES)
+        self.stop_event = threading.Event()
+        self.frames_read = 0
+        self.error = None
+        self._threads = []
+
+    def _offer(self, q, item, stage):
+        """Put item on a bounded queue, dropping the oldest entry when it is full"""
+        while True:
+            try:
+                q.put_nowait(item)
+                return
+            except queue.Full:
+                try:
+                    q.get_nowait()
+                    self.stats.add(stage, 'dropped')
+                except queue.Empty:
+                    pass
+
+    def _drain(self, q):
+        """After a stage failed, keep taking packets until the upstream stop so its blocking put returns"""
+        while q.get() is not _STOP:
+            pass
+
+    def _capture_loop(self):
+        try:
+            while not self.stop_event.is_set():
+                ret, frame = self.read_fn()
+                if not ret:
+                    print("Stream interrupted. Stopping pipeline...")
+                    break
+                self.frames_read += 1
+                self.stats.add('capture', 'processed')
+                if self.paced:
+                    while not self.frame_slot.wait_empty(timeout=0.5):
+                        if self.stop_event.is_set():
+                            return
+                if self.frame_slot.put((self.frames_read, frame)):
+                    self.stats.add('capture', 'dropped')
+        except Exception as e:
+            self.error = e
+            print(f"Capture stage failed: {e}")
+        finally:
+            self.frame_slot.close()
+
+    def _inference_loop(self):
+        try:
+            while True:
+                item = self.frame_slot.get(timeout=0.5)
+                if item is None:
+                    if self.frame_slot.closed:
+                        break
+                    continue
+                index, frame = item
+                packet = self.infer_fn(index, frame)
+                self.stats.add('inference', 'processed')
+                if packet is not None and self.render_fn is not None:
+                    self._offer(self.render_queue, packet, 'render')
+        except Exception as e:
+            self.error = e
+            self.stop_event.set()
+            print(f"Inference stage failed: {e}")
+        finally:
+            # Blocking put: the consumer is still draining, and the last real packet must not be dropped
+            self.render_queue.put(_STOP)
+
+    def _render_loop(self):
+        try:
+            while True:
+                packet = self.render_queue.get()
+                if packet is _STOP:
+                    break
+                rendered = self.render_fn(packet)
+                self.stats.add('render', 'processed')
+                if rendered is not None and self.encode_fn is not None:
+                    self._offer(self.encode_queue, rendered, 'encode')
+        except Exception as e:
+            self.error = e
+            self.stop_event.set()
+            print(f"Render stage failed: {e}")
+            self._drain(self.render_queue)
+        finally:
+            # Blocking put: the consumer is still draining, and the last real packet must not be dropped
+            self.encode_queue.put(_STOP)
+
+    def _encode_loop(self):
+        try:
+            while True:
+                packet = self.encode_queue.get()
+                if packet is _STOP:
+                    break
+                self.encode_fn(packet)
+                self.stats.add('encode', 'processed')
+        except Exception as e:
+            self.error = e
+            self.stop_event.set()
+            print(f"Encode stage failed: {e}")
+            self._drain(self.encode_queue)
+
+    def start(self):
+        targets = [('capture', self._capture_loop), ('inference', self._inference_loop)]
+        if self.render_fn is not None:
+            targets.append(('render', self._render_loop))
+            if self.encode_fn is not None:
+                targets.append(('encode', self._encode_loop))
+        for name, target in targets:
+            t = threading.Thread(target=target, name=f"pipeline-{name}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+
+    def join(self, report_every=None):
+        """Wait for all stages to finish, optionally printing stats every report_every seconds"""
+        last_report = time.time()
+        for t in self._threads:
+            while t.is_alive():
+                t.join(timeout=0.5)
+                if report_every and time.time() - last_report >= report_every:
+                    self.print_stats()
+                    last_report = time.time()
+
+    def queue_depths(self):
+        return {
+            'capture': self.frame_slot.qsize(),
+            'render': self.render_queue.qsize(),
+            'encode': self.encode_queue.qsize(),
+        }
+
+    def print_stats(self):
+        stats = self.stats.snapshot()
+        parts = [f"{name}: {s['processed']} ok / {s['dropped']} dropped" for name, s in stats.items()]
+        print("Pipeline | " + " | ".join(parts))
@@ -0,0 +1,128 @@
+# Incrementally maintained per-category time-bucket sums over an EventTable
+import threading
+import numpy as np
+import pandas as pd
+
+QUARTER_NS = 15 * 60 * 10**9
+HOUR_NS = 60 * 60 * 10**9
+DAY_NS = 24 * HOUR_NS
+# Bucket sizes, coarsest first; days are naive local calendar days, like the DateTime column
+LEVELS = (DAY_NS, HOUR_NS, QUARTER_NS)
+
+
+class EventRollup:
+    """
+    Sums of value columns (plus a row count) per day, hour and 15 minutes.
+
+    refresh() folds rows EventTable appended since the last call into the
+    buckets and rebuilds everything when the table's epoch changes. Only the
+    bucket sums are kept. A range query covers [start, end] with the largest
+    whole buckets the grouping allows and adds the few rows of the partial
+    buckets at the edges, read from EventTable.between(), so results equal a
+    scan of the rows while refresh and query cost depend on the new rows and
+    the length of the range, not on the size of the history.
+    """
+    def __init__(self, table, columns):
+        self.table = table
+        self.columns = list(columns)
+        self._lock = threading.Lock()
+        self._reset(None)
+
+    def _reset(self, epoch):
+        self.epoch = epoch
+        self.rows = 0
+        self.buckets = {size: {} for size in LEVELS}
+
+    def refresh(self):
+        df, epoch = self.table.get_with_epoch()
+        with self._lock:
+            if epoch != self.epoch or len(df) < self.rows:
+                self._reset(epoch)
+            if len(df) > self.rows:
+                self._add(df.iloc[self.rows:])
+                self.rows = len(df)
+
+    def _values(self, rows):
+        """Value columns then a row count per row, as float64"""
+        values = np.empty((len(rows), len(self.columns) + 1), dtype=np.float64)
+        for i, column in enumerate(self.columns):
+            # NaN adds nothing, as in a pandas sum
+            values[:, i] = np.nan_to_num(pd.to_numeric(rows[column], errors="coerce").to_numpy(dtype=np.float64))
+        values[:, -1] = 1  # row count: a group exists even if its sums are 0
+        return values
+
+    def _add(self, rows):
+        times = rows['DateTime'].to_numpy(dtype="datetime64[ns]").view(np.int64)
+        values = self._values(rows)
+        for size, buckets in self.buckets.items():
+            index, inverse = np.unique(times // size, return_inverse=True)
+            sums = np.zeros((len(index), values.shape[1]))
+            np.add.at(sums, inverse, values)
+            for bucket, bucket_sums in zip(index.tolist(), sums):
+                if bucket in buckets:
+                    buckets[bucket] += bucket_sums
+                else:
+                    buckets[bucket] = bucket_sums
+
+    def grouped(self, start, end, key_fn=None, finest=DAY_NS):
+        """
+        {key: sums} over rows with start <= DateTime <= end; sums hold the
+        value columns then the row count. key_fn maps a bucket start or row
+        time (pd.Timestamp) to its group and must be constant within buckets
+        of size finest; without key_fn everything is one group (key None).
+        Covers the rows seen by the last refresh().
+        """
+        while True:
+            with self._lock:
+                epoch, seen = self.epoch, self.rows
+                groups, edges = self._from_buckets(start, end, key_fn, finest)
+            edge_rows = [self._edge_rows(lo, hi, end) for lo, hi in edges]
+            if all(rows_epoch == epoch for _, rows_epoch in edge_rows):
+                break
+            # The table was reloaded since the last refresh(): the buckets are stale
+            self.refresh()
+
+        for rows, _ in edge_rows:
+            # Only rows folded so far, so they agree with the buckets; row labels are positions within an epoch
+            rows = rows[rows.index < seen]
+            times = rows['DateTime'].tolist()
+            for t, sums in zip(times, self._values(rows)):
+                key = key_fn(t) if key_fn else None
+                groups[key] = groups[key] + sums if key in groups else sums
+        return groups
+
+    def _edge_rows(self, lo, hi, end):
+        """(rows with lo <= DateTime < hi, epoch), where hi just past end stands for end itself"""
+        if hi == pd.Timestamp(end).value + 1:
+            rows, epoch, _ = self.table.between_with_epoch(pd.Timestamp(lo), pd.Timestamp(end))
+            return rows, epoch
+        # hi is a bucket boundary
+        rows, epoch, _ = self.table.between_with_epoch(pd.Timestamp(lo), pd.Timestamp(hi))
+        return rows[rows['DateTime'] < pd.Timestamp(hi)], epoch
+
+    def _from_buckets(self, start, end, key_fn, finest):
+        """Under the lock: groups from the whole buckets within [start, end] and the (lo, hi) ns edges left over"""
+        groups = {}
+        segments = [(pd.Timestamp(start).value, pd.Timestamp(end).value + 1)]
+        for size in LEVELS:
+            if key_fn is not None and size > finest:
+                continue
+            remaining = []
+            for lo, hi in segments:
+                first, last = -(-lo // size), hi // size
+                if first >= last:
+                    remaining.append((lo, hi))
+                    continue
+                buckets = self.buckets[size]
+                for bucket in range(first, last):
+                    sums = buckets.get(bucket)
+                    if sums is not None:
+                        key = key_fn(pd.Timestamp(bucket * size)) if key_fn else None
+                        groups[key] = groups[key] + sums if key in groups else sums.copy()
+                remaining.extend(seg for seg in ((lo, first * size), (last * size, hi)) if seg[0] < seg[1])
+            segments = remaining
+        return groups, segments
+
+    def totals(self, start, end):
+        """Value column sums and row count over start <= DateTime <= end"""
+        return self.grouped(start, end).get(None, np.zeros(len(self.columns) + 1))
@@ -0,0 +1,87 @@
+# Motion-gated adaptive inference scheduling
+import cv2 #type: ignore
+import numpy as np
+
+
+class MotionGate:
+    """
+    Decides per frame whether the detector should run.
+
+    A cheap motion score is computed on a downscaled grayscale crop of the ROI
+    bounding box: the fraction of pixels that changed by more than pixel_delta
+    since the last inferred frame. Inference runs when the score reaches
+    threshold, never more often than every min_interval frames and at least
+    every max_interval frames so the tracker keeps refreshing during quiet
+    periods.
+    """
+    def __init__(self, roi, threshold=0.01, pixel_delta=25, min_interval=1, max_interval=25,
+                 downscale=0.25, baseline_interval=1):
+        x, y, w, h = cv2.boundingRect(np.asarray(roi, dtype=np.int32))
+        self.rect = (x, y, w, h)
+        self.threshold = threshold
+        self.pixel_delta = pixel_delta
+        self.min_interval = max(1, min_interval)
+        self.max_interval = max(self.min_interval, max_interval)
+        self.downscale = downscale
+        # Fixed cadence this gate replaces, used to report how many inferences were saved
+        self.baseline_interval = max(1, baseline_interval)
+        self.reference = None
+        self.last_index = None
+        self.last_gap = 0
+        self.last_score = 0.0
+        # Stats
+        self.frames_seen = 0
+        self.inferences = 0
+        self.motion_triggered = 0
+
+    def _small_gray(self, frame):
+        x, y, w, h = self.rect
+        crop = frame[y:y + h, x:x + w]
+        small = cv2.resize(crop, None, fx=self.downscale, fy=self.downscale, interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(gray, (5, 5), 0)
+
+    def check(self, frame, frame_index):
+        """Return True if the detector should run on this frame"""
+        self.frames_seen += 1
+        gap = frame_index - self.last_index if self.last_index is not None else self.max_interval
+        if gap < self.min_interval:
+            return False
+
+        small = self._small_gray(frame)
+        if self.reference is None or self.reference.shape != small.shape:
+            run = True
+            self.last_score = 1.0
+        else:
+            diff = cv2.absdiff(small, self.reference)
+            self.last_score = float(np.count_nonzero(diff > self.pixel_delta)) / diff.size
+            run = self.last_score >= self.threshold or gap >= self.max_interval
+            if self.last_score >= self.threshold:
+                self.motion_triggered += 1
+
+        if run:
+            self.reference = small
+            self.last_gap = gap
+            self.last_index = frame_index
+            self.inferences += 1
+        return run
+
+    def tracker_steps(self):
+        """Tracker aging steps for the last inference, in units of the baseline cadence"""
+        return max(1, int(round(self.last_gap / self.baseline_interval)))
+
+    def stats(self):
+        baseline = self.frames_seen // self.baseline_interval
+        return {
+            'frames_seen': self.frames_seen,
+            'inferences': self.inferences,
+            'motion_triggered': self.motion_triggered,
+            'baseline_inferences': baseline,
+            'inferences_saved': max(0, baseline - self.inferences),
+        }
+
+    def print_stats(self):
+        s = self.stats()
+        print(f"Motion gate | frames: {s['frames_seen']} | inferences: {s['inferences']} "
+              f"(motion: {s['motion_triggered']}) | fixed cadence would run {s['baseline_inferences']} "
+              f"| saved: {s['inferences_saved']}")
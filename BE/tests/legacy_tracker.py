@@ -0,0 +1,162 @@
+# CentroidTracker as it was before the struct-of-arrays rewrite, kept as the reference for replay tests.
+# Two deliberate changes since then are applied here too, so a replay compares the state handling
+# (IDs, trails, ROI transitions, totals, callbacks) given the same matches: matching goes through
+# association.associate (category-gated, replacing the dense cdist pass), and detections registered
+# in the same frame get IDs in column order rather than set-iteration order.
+import cv2 #type: ignore
+import numpy as np
+from scipy.spatial import distance #type: ignore
+from collections import deque
+from association import associate
+
+# --- CENTROID TRACKER ---
+class CentroidTracker:
+    def __init__(self, max_disappeared=30, max_distance=50, trail_length=30, csv_callback=None,
+                 association='greedy'):
+        self.association = association
+        self.next_object_id = 0
+        self.objects = {}
+        self.disappeared = {}
+        self.max_disappeared = max_disappeared
+        self.max_distance = max_distance
+        self.object_categories = {}
+        self.object_roi_history = {}
+        # Persistent delivery counters
+        self.total_delivered_drinks = 0
+        self.total_delivered_food = 0
+        self.total_delivered_parcels = 0
+        # Trail tracking
+        self.trails = {}
+        self.trail_length = trail_length
+        # CSV callback function
+        self.csv_callback = csv_callback
+        
+    def register(self, centroid, category):
+        self.objects[self.next_object_id] = centroid
+        self.disappeared[self.next_object_id] = 0
+        self.object_categories[self.next_object_id] = category
+        self.object_roi_history[self.next_object_id] = {'kitchen': False, 'delivered': False}
+        self.trails[self.next_object_id] = deque(maxlen=self.trail_length)
+        self.trails[self.next_object_id].append(centroid)
+        self.next_object_id += 1
+        return self.next_object_id - 1
+    
+    def deregister(self, object_id):
+        if object_id in self.object_roi_history and self.object_roi_history[object_id]['delivered']:
+            if object_id in self.object_categories:
+                category = self.object_categories[object_id]
+                if category == "Drink":
+                    self.total_delivered_drinks += 1
+                elif category == "Food":
+                    self.total_delivered_food += 1
+                elif category == "Parcel":
+                    self.total_delivered_parcels += 1
+                print(f"Object {object_id} ({category}) marked as delivered!")
+        
+        del self.objects[object_id]
+        del self.disappeared[object_id]
+        if object_id in self.object_categories:
+            del self.object_categories[object_id]
+        if object_id in self.object_roi_history:
+            del self.object_roi_history[object_id]
+        if object_id in self.trails:
+            del self.trails[object_id]
+    
+    def update(self, detections, kitchen_roi):
+        centroids = [det[0] for det in detections]
+        categories = [det[1] for det in detections]
+        
+        if len(centroids) == 0:
+            for object_id in list(self.disappeared.keys()):
+                self.disappeared[object_id] += 1
+                if self.disappeared[object_id] > self.max_disappeared:
+                    self.deregister(object_id)
+            return self.objects
+        
+        if len(self.objects) == 0:
+            for i, centroid in enumerate(centroids):
+                self.register(centroid, categories[i])
+        else:
+            object_ids = list(self.objects.keys())
+            object_centroids = list(self.objects.values())
+            
+            if len(object_centroids) > 0:
+                D = distance.cdist(np.array(object_centroids), np.array(centroids))
+                codes = {}
+                track_codes = np.array([codes.setdefault(self.object_categories[i], len(codes)) for i in object_ids])
+                det_codes = np.array([codes.setdefault(c, len(codes)) for c in categories])
+                rows, cols = associate(np.array(object_centroids), track_codes, np.array(centroids), det_codes,
+                                       self.max_distance, self.association)
+                
+                used_rows = set()
+                used_cols = set()
+                
+                for row, col in zip(rows, cols):
+                    if row in used_rows or col in used_cols:
+                        continue
+                    
+                    object_id = object_ids[row]
+                    dist = D[row, col]
+                    
+                    if dist > self.max_distance:
+                        continue
+                    
+                    existing_category = self.object_categories.get(object_id)
+                    new_category = categories[col]
+                    
+                    if existing_category != new_category:
+                        continue
+                    
+                    self.objects[object_id] = centroids[col]
+                    self.disappeared[object_id] = 0
+                    self.trails[object_id].append(centroids[col])
+                    
+                    in_kitchen = point_in_polygon(centroids[col], kitchen_roi)
+                    history = self.object_roi_history[object_id]
+                    
+                    if in_kitchen:
+                        if history['delivered']:
+                            # Object re-entered kitchen - log decrement
+                            if self.csv_callback:
+                                self.csv_callback(existing_category, -1)
+                            
+                            if existing_category == "Drink":
+                                self.total_delivered_drinks = max(0, self.total_delivered_drinks - 1)
+                            elif existing_category == "Food":
+                                self.total_delivered_food = max(0, self.total_delivered_food - 1)
+                            elif existing_category == "Parcel":
+                                self.total_delivered_parcels = max(0, self.total_delivered_parcels - 1)
+                            print(f"Object {object_id} ({existing_category}) re-entered kitchen → subtracting from delivered total.")
+                            history['delivered'] = False
+                        history['kitchen'] = True
+                    else:
+                        dist_from_roi = cv2.pointPolygonTest(kitchen_roi, centroids[col], True)
+                        if history['kitchen'] and not history['delivered'] and dist_from_roi < -5:
+                            history['delivered'] = True
+                            # Object left kitchen - log increment
+                            if self.csv_callback:
+                                self.csv_callback(existing_category, 1)
+                    
+                    used_rows.add(row)
+                    used_cols.add(col)
+                
+                unused_rows = set(range(0, D.shape[0])).difference(used_rows)
+                unused_cols = set(range(0, D.shape[1])).difference(used_cols)
+                
+                if D.shape[0] >= D.shape[1]:
+                    for row in unused_rows:
+                        object_id = object_ids[row]
+                        self.disappeared[object_id] += 1
+                        if self.disappeared[object_id] > self.max_disappeared:
+                            self.deregister(object_id)
+                else:
+                    for col in sorted(unused_cols):
+                        self.register(centroids[col], categories[col])
+        
+        return self.objects
+
+
+# --- UTILITY FUNCTIONS ---
+def point_in_polygon(point, polygon):
+    point_float = (float(point[0]), float(point[1]))
+    return cv2.pointPolygonTest(polygon, point_float, False) >= 0
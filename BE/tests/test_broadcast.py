@@ -0,0 +1,89 @@
+# BroadcastHub views failing and clients reconnecting
+import asyncio
+import json
+
+from broadcast import BroadcastHub
+
+
+class FakeWebSocket:
+    """Records sent texts; close() can be held open to keep the client subscribed"""
+    def __init__(self, hold_close=None):
+        self.sent = []
+        self.closed = False
+        self.hold_close = hold_close
+
+    async def send_text(self, text):
+        self.sent.append(json.loads(text))
+
+    async def close(self):
+        if self.hold_close is not None:
+            await self.hold_close.wait()
+        self.closed = True
+
+
+def flaky_compute(failures):
+    calls = []
+
+    def compute():
+        calls.append(len(calls))
+        if len(calls) <= failures:
+            raise RuntimeError("store unavailable")
+        return {"value": len(calls)}
+    return compute, calls
+
+
+def test_reconnect_after_error_computes_again():
+    async def scenario():
+        hub = BroadcastHub(interval=0.01)
+        compute, calls = flaky_compute(failures=1)
+        release = asyncio.Event()
+        # The first client gets the error and is still closing when the second connects
+        first = FakeWebSocket(hold_close=release)
+        first_task = asyncio.create_task(hub.serve(first, "totals", compute))
+        while not first.sent:
+            await asyncio.sleep(0.001)
+        assert first.sent == [{"error": "store unavailable"}]
+        assert "totals" not in hub.views
+
+        second = FakeWebSocket()
+        second_task = asyncio.create_task(hub.serve(second, "totals", compute))
+        while len(second.sent) < 2:
+            await asyncio.sleep(0.001)
+        assert second.sent[:2] == [{"value": 2}, {"value": 3}]
+        assert not second.closed
+
+        release.set()
+        await first_task
+        assert first.closed and first.sent == [{"error": "store unavailable"}]
+        second_task.cancel()
+        await asyncio.gather(second_task, return_exceptions=True)
+        assert hub.views == {}
+
+    asyncio.run(scenario())
+
+
+def test_change_view_reconnect_after_error():
+    async def scenario():
+        hub = BroadcastHub(interval=0.01)
+        calls = []
+
+        def compute(cursor):
+            calls.append(cursor)
+            if len(calls) == 1:
+                raise RuntimeError("store unavailable")
+            return {"type": "snapshot" if cursor is None else "delta", "cursor": f"0:{len(calls)}"}
+
+        first = FakeWebSocket()
+        await hub.serve_changes(first, "raw-data", compute)
+        assert first.closed and first.sent == [{"error": "store unavailable"}]
+        assert hub.views == {}
+
+        second = FakeWebSocket()
+        task = asyncio.create_task(hub.serve_changes(second, "raw-data", compute))
+        while len(second.sent) < 2:
+            await asyncio.sleep(0.001)
+        assert second.sent[0]["type"] == "snapshot" and second.sent[1]["type"] == "delta"
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(scenario())
@@ -0,0 +1,71 @@
+# DetectionCache keying, hit/miss counting and persistence
+import numpy as np
+import pytest
+
+from detection_cache import DetectionCache
+
+SETTINGS = {"backend": "onnx-int8", "onnx_model": None, "imgsz": 640, "conf_floor": 0.05,
+            "inference_rect": None, "frame_size": [1920, 1080]}
+
+
+@pytest.fixture
+def files(tmp_path):
+    paths = {}
+    for name, content in [("video", b"frames" * 1000), ("weights", b"pt weights"), ("int8", b"int8 model")]:
+        paths[name] = tmp_path / name
+        paths[name].write_bytes(content)
+    return tmp_path, {name: str(path) for name, path in paths.items()}
+
+
+def cached(folder, paths, settings=SETTINGS, models=("weights", "int8")):
+    return DetectionCache(str(folder / "cache"), paths["video"], [paths[m] for m in models], settings)
+
+
+def fill(cache, frames):
+    for index in frames:
+        cache.put(index, [[index, 0, index + 10, 10]], [index % 3], [0.5])
+    cache.save()
+
+
+def test_hits_misses_and_reload(files):
+    folder, paths = files
+    cache = cached(folder, paths)
+    assert cache.get(2) is None and cache.misses == 1
+    fill(cache, [2, 4, 6])
+    cache.set_class_names({0: "food"})
+    cache.put(8, np.zeros((0, 4)), [], [])
+    cache.save()
+
+    again = cached(folder, paths)
+    assert again.key == cache.key and len(again) == 4 and again.class_names == {0: "food"}
+    xyxy, classes, confs = again.get(4)
+    assert xyxy.tolist() == [[4, 0, 14, 10]] and classes.tolist() == [1] and confs.tolist() == [0.5]
+    assert len(again.get(8)[0]) == 0
+    assert again.get(5) is None
+    assert (again.hits, again.misses) == (2, 1)
+    assert again.has(6) and not again.has(7)
+
+
+@pytest.mark.parametrize("change", ["video", "weights", "int8", "backend", "imgsz", "conf_floor", "crop"])
+def test_anything_that_changes_detections_changes_the_key(files, change):
+    folder, paths = files
+    original = cached(folder, paths)
+    fill(original, [1])
+    settings = dict(SETTINGS)
+    if change in paths:
+        # Same size, new content: a rebuilt or requantized model, or another recording
+        with open(paths[change], "r+b") as f:
+            f.write(b"X")
+    elif change == "crop":
+        settings["inference_rect"] = [0, 0, 960, 540]
+    else:
+        settings[change] = {"backend": "onnx", "imgsz": 480, "conf_floor": 0.1}[change]
+    changed = cached(folder, paths, settings)
+    assert changed.key != original.key
+    assert changed.get(1) is None and len(changed) == 0
+
+
+def test_key_does_not_depend_on_settings_order(files):
+    folder, paths = files
+    fill(cached(folder, paths), [1])
+    assert cached(folder, paths, dict(reversed(list(SETTINGS.items())))).get(1) is not None
@@ -0,0 +1,135 @@
+# ONNX backend pre/post-processing and backend selection, without needing onnxruntime
+import threading
+import time
+
+import numpy as np
+import pytest
+
+import detectors
+from detectors import OnnxDetector, SharedDetector, check_input_size, letterbox, load_detector, model_file, preprocess
+
+FRAME_SHAPE = (720, 1280, 3)
+
+
+def raw_box(cx, cy, w, h, class_id, conf, classes=3):
+    """One anchor of a raw (4 + classes) YOLO output, in letterboxed 640px coordinates"""
+    scores = np.zeros(classes, np.float32)
+    scores[class_id] = conf
+    return np.concatenate([[cx, cy, w, h], scores]).astype(np.float32)
+
+
+def bare_detector(session=None, dynamic_batch=False):
+    """OnnxDetector without an ONNX Runtime session behind it"""
+    detector = object.__new__(OnnxDetector)
+    detector.session = session
+    detector.input_name = "images"
+    detector.names = {0: "food", 1: "drink", 2: "parcel"}
+    detector.imgsz = 640
+    detector.dynamic_batch = dynamic_batch
+    detector.iou = 0.7
+    detector.max_det = 300
+    return detector
+
+
+class FakeSession:
+    """Returns the same raw output for every image it is given and records the input shapes"""
+    def __init__(self, anchors):
+        self.output = np.stack(anchors, axis=1)[None]
+        self.inputs = []
+
+    def run(self, _, feeds):
+        blob = feeds["images"]
+        self.inputs.append(blob.shape)
+        return [np.repeat(self.output, len(blob), axis=0)]
+
+
+def test_letterbox_keeps_aspect_and_centres_the_padding():
+    frame = np.full(FRAME_SHAPE, 50, np.uint8)
+    padded, gain, (left, top) = letterbox(frame, 640)
+    assert padded.shape == (640, 640, 3) and gain == 0.5 and (left, top) == (0, 140)
+    assert (padded[:140] == 114).all() and (padded[500:] == 114).all() and (padded[140:500] == 50).all()
+    blob, _, _ = preprocess(frame, 640)
+    assert blob.shape == (1, 3, 640, 640) and blob.dtype == np.float32
+    assert np.isclose(blob[0, 0, 320, 320], 50 / 255) and np.isclose(blob[0, 0, 0, 0], 114 / 255)
+
+
+def test_decode_maps_back_to_the_frame_with_per_class_nms():
+    output = np.stack([
+        raw_box(320, 320, 100, 50, 0, 0.9),
+        raw_box(322, 321, 100, 50, 0, 0.8),   # same food box again: suppressed
+        raw_box(320, 320, 100, 50, 1, 0.85),  # same place, other class: kept
+        raw_box(100, 200, 40, 40, 2, 0.1),    # under conf
+        raw_box(630, 300, 40, 40, 2, 0.6),    # runs off the right edge: clipped
+    ], axis=1)
+    xyxy, classes, confs = bare_detector()._decode(output, 0.25, 0.5, (0, 140), FRAME_SHAPE)
+    assert classes.tolist() == [0, 1, 2] and classes.dtype == np.int16
+    assert np.allclose(confs, [0.9, 0.85, 0.6]) and confs.dtype == np.float32
+    assert np.allclose(xyxy[0], [540, 310, 740, 410]) and np.allclose(xyxy[1], xyxy[0])
+    assert np.allclose(xyxy[2], [1220, 280, 1280, 360]) and xyxy.dtype == np.float32
+
+
+def test_decode_with_nothing_above_conf():
+    output = np.stack([raw_box(320, 320, 100, 50, 0, 0.1)], axis=1)
+    xyxy, classes, confs = bare_detector()._decode(output, 0.25, 0.5, (0, 140), FRAME_SHAPE)
+    assert xyxy.shape == (0, 4) and len(classes) == len(confs) == 0
+
+
+@pytest.mark.parametrize("dynamic_batch, runs", [(False, [(1, 3, 640, 640)] * 3), (True, [(3, 3, 640, 640)])])
+def test_predict_batch_runs_per_frame_or_once(dynamic_batch, runs):
+    session = FakeSession([raw_box(320, 320, 100, 50, 0, 0.9)])
+    detector = bare_detector(session, dynamic_batch)
+    frames = [np.zeros(FRAME_SHAPE, np.uint8), np.zeros((640, 640, 3), np.uint8), np.zeros(FRAME_SHAPE, np.uint8)]
+    results = detector.predict_batch(frames)
+    assert session.inputs == runs and len(results) == 3
+    # Each frame is mapped back with its own letterbox transform
+    assert np.allclose(results[0][0], [[540, 310, 740, 410]])
+    assert np.allclose(results[1][0], [[270, 295, 370, 345]])
+    assert detector.predict_batch([]) == [] and len(session.inputs) == len(runs)
+
+
+def test_model_file_per_backend():
+    assert model_file('pytorch', "models/fwc.pt") == "models/fwc.pt"
+    assert model_file('onnx', "models/fwc.pt") == "models/fwc.onnx"
+    assert model_file('onnx-int8', "models/fwc.pt") == "models/fwc.int8.onnx"
+    assert model_file('onnx-int8', "models/fwc.pt", "other.onnx") == "other.onnx"
+
+
+def test_backend_selection_errors(tmp_path):
+    with pytest.raises(ValueError, match="Unknown detector backend"):
+        load_detector('tensorrt', str(tmp_path / "fwc.pt"))
+    with pytest.raises(FileNotFoundError, match="python detectors.py quantize"):
+        load_detector('onnx-int8', str(tmp_path / "fwc.pt"))
+    detector = bare_detector()
+    assert check_input_size(detector, None, "fwc.onnx") is detector
+    assert check_input_size(detector, 640, "fwc.onnx") is detector
+    with pytest.raises(ValueError, match="takes 640px input but imgsz is 480"):
+        check_input_size(detector, 480, "fwc.onnx")
+
+
+def test_shared_detector_serialises_calls_and_is_shared(monkeypatch):
+    class SlowDetector:
+        backend, names = 'onnx', {0: "food"}
+
+        def __init__(self):
+            self.active = self.most_active = 0
+
+        def predict_batch(self, frames, conf):
+            self.active += 1
+            self.most_active = max(self.most_active, self.active)
+            time.sleep(0.01)
+            self.active -= 1
+            return [len(frames)]
+
+    loads = []
+    monkeypatch.setattr(detectors, "_shared_detectors", {})
+    monkeypatch.setattr(detectors, "load_detector", lambda *args: loads.append(args) or SlowDetector())
+    shared = detectors.load_shared_detector('onnx', "fwc.pt", 640)
+    assert detectors.load_shared_detector('onnx', "./fwc.pt", 640) is shared
+    assert detectors.load_shared_detector('onnx', "fwc.pt", 480) is not shared and len(loads) == 2
+
+    threads = [threading.Thread(target=shared.predict_batch, args=([None],)) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert isinstance(shared, SharedDetector) and shared.detector.most_active == 1
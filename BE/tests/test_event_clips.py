@@ -0,0 +1,72 @@
+# EventClipRecorder pre-roll / post-roll frame counts, read back from the written clips
+import os
+
+import cv2 #type: ignore
+import numpy as np
+
+from event_clips import EventClipRecorder
+
+FPS = 10
+SIZE = (64, 48)
+
+
+def numbered_frame(index):
+    """Frame with its index written as 8 black / white stripes, so clips can be checked frame by frame"""
+    frame = np.zeros((SIZE[1], SIZE[0], 3), dtype=np.uint8)
+    for bit in range(8):
+        if index >> bit & 1:
+            frame[:, bit * 8:bit * 8 + 8] = 255
+    return frame
+
+
+def clip_indices(path):
+    cap = cv2.VideoCapture(path)
+    indices = []
+    while True:
+        ok, frame = cap.read()
+        if not ok:
+            break
+        stripes = frame[:, :, 0].reshape(SIZE[1], 8, 8).mean(axis=(0, 2)) > 128
+        indices.append(sum(1 << bit for bit in range(8) if stripes[bit]))
+    cap.release()
+    return indices
+
+
+def record(tmp_path, events, frames=100, **kwargs):
+    """Feed frames 1..frames, triggering right before writing each frame in events (as the tracker callback does)"""
+    recorder = EventClipRecorder(str(tmp_path), FPS, SIZE, pre_roll=1.0, post_roll=0.5, **kwargs)
+    paths = []
+    for index in range(1, frames + 1):
+        if index in events:
+            paths.append(recorder.trigger(index))
+        recorder.write(numbered_frame(index), index)
+    recorder.release()
+    return recorder, paths
+
+
+def test_clip_holds_pre_roll_and_post_roll(tmp_path):
+    recorder, paths = record(tmp_path, {30, 70})
+    assert len(set(paths)) == 2 and recorder.clip_number == 2
+    first, second = (clip_indices(os.path.join(str(tmp_path), path)) for path in paths)
+    # 1 s of pre-roll (10 frames), the event frame and 0.5 s after it
+    assert first == list(range(20, 36))
+    assert second == list(range(60, 76))
+
+
+def test_event_during_a_clip_extends_it(tmp_path):
+    recorder, paths = record(tmp_path, {30, 33})
+    assert paths[0] == paths[1] and recorder.events_merged == 1
+    assert clip_indices(os.path.join(str(tmp_path), paths[0])) == list(range(20, 39))
+
+
+def test_early_event_and_release_mid_clip(tmp_path):
+    # Only 4 frames buffered before the event; the clip is closed by release() before its post-roll
+    recorder, paths = record(tmp_path, {5}, frames=7)
+    assert clip_indices(os.path.join(str(tmp_path), paths[0])) == list(range(1, 8))
+
+
+def test_pre_roll_is_capped_by_memory(tmp_path):
+    # A few KB only keeps the newest couple of JPEG frames
+    recorder, paths = record(tmp_path, {30}, max_buffer_mb=2.5 / 1024)
+    indices = clip_indices(os.path.join(str(tmp_path), paths[0]))
+    assert indices[-6:] == list(range(30, 36)) and 1 <= len(indices) - 6 < 10
@@ -0,0 +1,69 @@
+# EventWriter batching and journal replay after a crash
+import os
+import shutil
+import time
+
+import pandas as pd
+
+from event_log import EventWriter, DELIVERY_COLUMNS, delivery_row
+
+
+def rows(n, start=0):
+    return [delivery_row("2026-10-14", f"10:{i:02d}:00 AM", "Food", 1, f"clip_{i}.mp4") for i in range(start, start + n)]
+
+
+def read_store(path):
+    return pd.read_csv(path, keep_default_na=False)['Video_Path'].tolist()
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition():
+        if time.time() > deadline:
+            raise AssertionError("writer thread did not get there in time")
+        time.sleep(0.005)
+
+
+def journal_lines(path):
+    with open(path, encoding="utf-8") as f:
+        return len(f.readlines())
+
+
+def test_rows_are_flushed_in_batches(tmp_path):
+    store = str(tmp_path / "Processed_Data.csv")
+    writer = EventWriter(store, DELIVERY_COLUMNS, flush_interval=60, max_batch=3).start()
+    for row in rows(7):
+        writer.log(row)
+    wait_until(lambda: writer.events_written == 6)
+    # Two full batches are in the store; the last row only in the journal until close()
+    assert read_store(store) == [f"clip_{i}.mp4" for i in range(6)] and writer.flushes == 2
+    writer.close()
+    assert read_store(store) == [f"clip_{i}.mp4" for i in range(7)]
+    assert os.path.getsize(store + ".journal") == 0
+
+
+def test_journal_is_replayed_after_a_crash(tmp_path):
+    store = str(tmp_path / "Processed_Data.csv")
+    writer = EventWriter(store, DELIVERY_COLUMNS, flush_interval=60, max_batch=2).start()
+    for row in rows(5):
+        writer.log(row)
+    # Two batches in the store (journal truncated after each), then the last row journaled
+    wait_until(lambda: writer.events_written == 4 and journal_lines(store + ".journal") == 1)
+
+    # The files as a crash would leave them: two batches flushed, one row only journaled,
+    # and a journal line cut off mid-write
+    crashed = tmp_path / "crashed"
+    crashed.mkdir()
+    crashed_store = str(crashed / "Processed_Data.csv")
+    shutil.copy(store, crashed_store)
+    shutil.copy(store + ".journal", crashed_store + ".journal")
+    with open(crashed_store + ".journal", "a", encoding="utf-8") as f:
+        f.write('{"Date": "2026-10-14", "Timesta')
+    writer.close()
+
+    restarted = EventWriter(crashed_store, DELIVERY_COLUMNS, flush_interval=60).start()
+    assert read_store(crashed_store) == [f"clip_{i}.mp4" for i in range(5)]
+    assert os.path.getsize(crashed_store + ".journal") == 0
+    restarted.log(rows(1, start=5)[0])
+    restarted.close()
+    assert read_store(crashed_store) == [f"clip_{i}.mp4" for i in range(6)]
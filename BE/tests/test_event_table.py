@@ -0,0 +1,107 @@
+# EventTable incremental appends and full reloads when the store is rewritten
+import pytest
+
+import app
+from event_log import DELIVERY_COLUMNS
+from event_table import EventTable
+
+
+def event_row(minute, food=1):
+    return ["2026-10-14", f"10:{minute:02d}:00 AM", food, 0, 0, f"clip_{minute}.mp4"]
+
+
+def csv_text(rows, header=True):
+    lines = ([",".join(DELIVERY_COLUMNS)] if header else []) + [",".join(str(v) for v in row) for row in rows]
+    return "".join(line + "\n" for line in lines)
+
+
+@pytest.fixture
+def store(tmp_path):
+    """Store with three rows and a table over it that records how many rows each parse prepared"""
+    path = tmp_path / "Processed_Data.csv"
+    path.write_text(csv_text([event_row(m) for m in range(3)]))
+    prepared = []
+
+    def prepare(df):
+        prepared.append(len(df))
+        return app.prepare_events(df)
+
+    return path, EventTable(str(path), prepare_fn=prepare), prepared
+
+
+def append(path, text):
+    with open(path, "a", newline="") as f:
+        f.write(text)
+
+
+def clips(df):
+    return df['Video_Path'].tolist()
+
+
+def test_unchanged_store_is_not_read_again(store):
+    path, table, prepared = store
+    df, epoch = table.get_with_epoch()
+    assert table.get() is df and table.get_with_epoch()[1] == epoch
+    assert prepared == [3] and table.version == 1 and table.full_loads == 1
+
+
+def test_appended_rows_are_parsed_on_their_own(store):
+    path, table, prepared = store
+    first, epoch = table.get_with_epoch()
+    append(path, csv_text([event_row(3), event_row(4, food=-1)], header=False))
+    df, new_epoch = table.get_with_epoch()
+
+    assert clips(df) == [f"clip_{m}.mp4" for m in range(5)] and df['Total Food'].tolist() == [1, 1, 1, 1, -1]
+    assert str(df['DateTime'].iloc[4]) == "2026-10-14 10:04:00" and df['DateTime'].dtype == first['DateTime'].dtype
+    # Only the two new rows went through prepare_fn; old rows keep their positions
+    assert prepared == [3, 2] and (table.full_loads, table.incremental_loads) == (1, 1)
+    assert new_epoch == epoch and table.version == 2
+    assert df.iloc[:3].equals(first)
+
+
+def test_row_still_being_written_waits_for_its_newline(store):
+    path, table, prepared = store
+    table.get()
+    line = csv_text([event_row(3)], header=False)
+    append(path, line + line[:12])
+    assert clips(table.get()) == [f"clip_{m}.mp4" for m in range(4)]
+    append(path, line[12:].replace("clip_3", "clip_9"))
+    df = table.get()
+    assert clips(df)[-1] == "clip_9.mp4" and len(df) == 5
+    assert prepared == [3, 1, 1] and table.full_loads == 1
+
+
+@pytest.mark.parametrize("change", ["rewrite", "truncate", "replace"])
+def test_rewritten_store_is_reloaded_in_a_new_epoch(store, change):
+    path, table, prepared = store
+    first, epoch = table.get_with_epoch()
+    if change == "rewrite":
+        # Longer than before, so it could pass for an append if only the size were checked
+        path.write_text(csv_text([event_row(m, food=2) for m in range(10, 15)]))
+        expected = [f"clip_{m}.mp4" for m in range(10, 15)]
+    elif change == "truncate":
+        path.write_text(csv_text([event_row(0)]))
+        expected = ["clip_0.mp4"]
+    else:
+        # Same first rows, a later one changed, then more appended
+        path.write_text(csv_text([event_row(0), event_row(1), event_row(2, food=7), event_row(3)]))
+        expected = [f"clip_{m}.mp4" for m in range(4)]
+    df, new_epoch = table.get_with_epoch()
+    assert clips(df) == expected and new_epoch == epoch + 1
+    assert table.full_loads == 2 and table.incremental_loads == 0 and table.version == 2
+    if change == "replace":
+        assert df['Total Food'].tolist() == [1, 1, 7, 1]
+
+
+def test_between_after_appends_in_and_out_of_time_order(store):
+    path, table, prepared = store
+    append(path, csv_text([event_row(5), event_row(6)], header=False))
+    rows, _, count = table.between_with_epoch("2026-10-14 10:01:00", "2026-10-14 10:05:00")
+    assert clips(rows) == ["clip_1.mp4", "clip_2.mp4", "clip_5.mp4"] and count == 5
+    assert rows.index.tolist() == [1, 2, 3]
+
+    # An old recording processed offline: logged late, still found by time
+    append(path, csv_text([event_row(4)], header=False))
+    rows = table.between("2026-10-14 10:03:00", "2026-10-14 10:05:00")
+    assert clips(rows) == ["clip_4.mp4", "clip_5.mp4"]
+    assert clips(table.get())[-1] == "clip_4.mp4" and table.full_loads == 1
@@ -0,0 +1,77 @@
+# /food-frame conditional GETs (ETag / Last-Modified -> 304) and size variants
+import os
+from email.utils import formatdate
+
+import cv2 #type: ignore
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+import app as api
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    frame = np.zeros((360, 1280, 3), dtype=np.uint8)
+    frame[:, :640] = 200
+    cv2.imwrite(str(tmp_path / "frame_1.jpg"), frame)
+    monkeypatch.setattr(api, "FRAME_FOLDER", str(tmp_path))
+    return TestClient(api.app)
+
+
+def test_full_frame_carries_validators(client, tmp_path):
+    response = client.get("/food-frame/frame_1.jpg")
+    assert response.status_code == 200 and response.headers["content-type"] == "image/jpeg"
+    assert response.content == (tmp_path / "frame_1.jpg").read_bytes()
+    stat = os.stat(tmp_path / "frame_1.jpg")
+    assert response.headers["etag"] == api.frame_etag(stat)
+    assert response.headers["last-modified"] == formatdate(stat.st_mtime, usegmt=True)
+    assert "immutable" in response.headers["cache-control"]
+
+
+def test_matching_etag_gets_304_without_a_body(client):
+    etag = client.get("/food-frame/frame_1.jpg").headers["etag"]
+    for if_none_match in (etag, f'"other", W/{etag}', "*"):
+        response = client.get("/food-frame/frame_1.jpg", headers={"If-None-Match": if_none_match})
+        assert response.status_code == 304 and response.content == b""
+        assert response.headers["etag"] == etag
+    assert client.get("/food-frame/frame_1.jpg", headers={"If-None-Match": '"other"'}).status_code == 200
+
+
+def test_if_modified_since(client, tmp_path):
+    last_modified = client.get("/food-frame/frame_1.jpg").headers["last-modified"]
+    assert client.get("/food-frame/frame_1.jpg", headers={"If-Modified-Since": last_modified}).status_code == 304
+    earlier = formatdate(os.stat(tmp_path / "frame_1.jpg").st_mtime - 60, usegmt=True)
+    assert client.get("/food-frame/frame_1.jpg", headers={"If-Modified-Since": earlier}).status_code == 200
+    assert client.get("/food-frame/frame_1.jpg", headers={"If-Modified-Since": "yesterday"}).status_code == 200
+    # If-None-Match wins: a stale tag is a miss even with a fresh date
+    response = client.get("/food-frame/frame_1.jpg", headers={"If-None-Match": '"old"', "If-Modified-Since": last_modified})
+    assert response.status_code == 200
+
+
+def test_rewritten_frame_gets_a_new_etag(client, tmp_path):
+    etag = client.get("/food-frame/frame_1.jpg").headers["etag"]
+    path = tmp_path / "frame_1.jpg"
+    stat = os.stat(path)
+    path.write_bytes(path.read_bytes() + b"\0")
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    response = client.get("/food-frame/frame_1.jpg", headers={"If-None-Match": etag})
+    assert response.status_code == 200 and response.headers["etag"] != etag
+
+
+def test_variant_is_made_once_and_validated_on_its_own(client, tmp_path):
+    response = client.get("/food-frame/frame_1.jpg", params={"size": "thumb"})
+    assert response.status_code == 200
+    thumb = cv2.imdecode(np.frombuffer(response.content, np.uint8), cv2.IMREAD_COLOR)
+    assert thumb.shape[:2] == (45, 160)
+    assert response.headers["etag"] == api.frame_etag(os.stat(tmp_path / "thumb" / "frame_1.jpg"))
+    assert response.headers["etag"] != client.get("/food-frame/frame_1.jpg").headers["etag"]
+    again = client.get("/food-frame/frame_1.jpg", params={"size": "thumb"},
+                       headers={"If-None-Match": response.headers["etag"]})
+    assert again.status_code == 304
+
+
+@pytest.mark.parametrize("path", ["/food-frame/missing.jpg", "/food-frame/frame_1.jpg?size=huge",
+                                  "/food-frame/missing.jpg?size=medium", "/food-frame/..%2Fframe_1.jpg"])
+def test_unknown_frames_and_sizes_are_404(client, path):
+    assert client.get(path).status_code == 404
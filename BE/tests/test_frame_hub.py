@@ -0,0 +1,122 @@
+# FrameHub fan-out cadence, decode-only-when-due and blocking vs latest-only feeds
+import threading
+import time
+
+import numpy as np
+
+from frame_hub import FrameHub
+
+
+class FakeCapture:
+    """count frames whose pixels hold their 1-based index; counts reads (decodes) and grabs"""
+    def __init__(self, count, delay=0.0):
+        self.count = count
+        self.delay = delay
+        self.position = 0
+        self.reads = 0
+        self.grabs = 0
+
+    def grab(self):
+        if self.position >= self.count:
+            return False
+        self.position += 1
+        self.grabs += 1
+        return True
+
+    def read(self):
+        if self.delay:
+            time.sleep(self.delay)
+        if self.position >= self.count:
+            return False, None
+        self.position += 1
+        self.reads += 1
+        return True, np.full((4, 4, 3), self.position % 256, dtype=np.uint8)
+
+
+def drain(*subs):
+    """Read every feed to its end, each on its own thread as the real consumers do (blocking feeds hold the hub)"""
+    results = {sub.name: [] for sub in subs}
+
+    def consume(sub):
+        while True:
+            item = sub.get(timeout=5)
+            if item is None:
+                return
+            results[sub.name].append(item)
+
+    threads = [threading.Thread(target=consume, args=(sub,), daemon=True) for sub in subs]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=10)
+    assert not any(thread.is_alive() for thread in threads), "feed was never closed"
+    return [results[sub.name] for sub in subs]
+
+
+def test_each_feed_gets_its_own_cadence_and_only_due_frames_are_decoded():
+    cap = FakeCapture(100)
+    hub = FrameHub(cap, fps=8, live=False)
+    tracker = hub.subscribe("tracker", every_n=3)
+    food = hub.subscribe("food", every_seconds=2)
+    hub.start()
+    tracker_items, food_items = drain(tracker, food)
+    hub.join(timeout=10)
+
+    assert [index for index, _, _ in tracker_items] == list(range(3, 100, 3))
+    # Stream time of a file is index / fps: one frame per 2 s of video
+    assert [index for index, _, _ in food_items] == [1, 17, 33, 49, 65, 81, 97]
+    assert [stream_time for _, stream_time, _ in food_items] == [0.125 + 2 * i for i in range(7)]
+    for index, _, frame in tracker_items + food_items:
+        assert frame[0, 0, 0] == index
+    due = {index for index, _, _ in tracker_items + food_items}
+    assert cap.reads == hub.frames_decoded == len(due) and cap.grabs == 100 - len(due)
+    assert tracker.frames_dropped == food.frames_dropped == 0
+
+
+def test_consumers_of_the_same_frame_get_separate_buffers():
+    hub = FrameHub(FakeCapture(6), live=False)
+    a, b = hub.subscribe("a", every_n=2), hub.subscribe("b", every_n=2)
+    hub.start()
+    a_items, b_items = drain(a, b)
+    hub.join(timeout=10)
+    assert [i for i, _, _ in a_items] == [i for i, _, _ in b_items] == [2, 4, 6]
+    for (_, _, frame_a), (_, _, frame_b) in zip(a_items, b_items):
+        assert frame_a is not frame_b and np.array_equal(frame_a, frame_b)
+    assert hub.frames_decoded == 3
+
+
+def test_blocking_feed_waits_for_a_slow_consumer():
+    hub = FrameHub(FakeCapture(30), live=False)
+    feed = hub.subscribe("tracker", every_n=1, queue_size=2)
+    hub.start()
+    items = []
+    started = time.perf_counter()
+    while True:
+        item = feed.get(timeout=5)
+        if item is None:
+            break
+        time.sleep(0.002)
+        items.append(item[0])
+    hub.join(timeout=10)
+    assert items == list(range(1, 31)) and feed.frames_dropped == 0
+    # The queue is full when the hub ends; the feed must still end without waiting out the timeout
+    assert time.perf_counter() - started < 2
+
+
+def test_latest_only_feed_drops_what_a_slow_consumer_misses():
+    cap = FakeCapture(200, delay=0.0005)
+    hub = FrameHub(cap, fps=30, live=True)
+    feed = hub.subscribe("tracker", every_n=1)
+    assert not feed.blocking
+    hub.start()
+    items = []
+    while True:
+        item = feed.get(timeout=5)
+        if item is None:
+            break
+        time.sleep(0.01)
+        items.append(item[0])
+    hub.join(timeout=10)
+    # The hub never waits: every frame is read, the consumer only sees the newest ones
+    assert cap.reads == 200 and items[-1] == 200 and items == sorted(items)
+    assert feed.frames_dropped == 200 - len(items) > 0 and feed.frames_delivered == 200
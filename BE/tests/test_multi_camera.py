@@ -0,0 +1,84 @@
+# MultiCameraRunner batching, crop offsets and per-camera event stores
+import os
+
+import numpy as np
+import pandas as pd
+
+import multi_camera
+from multi_camera import CameraConfig, MultiCameraRunner, event_callback_factory
+
+KITCHEN_ROI = [[0, 0], [100, 0], [100, 200], [0, 200]]
+
+
+class MarkerDetector:
+    """Boxes the bright pixels of each frame as one food item; records every batch it is given"""
+    names = {0: "Food"}
+
+    def __init__(self):
+        self.batches = []
+
+    def predict_batch(self, frames, conf=0.25):
+        self.batches.append([frame.shape for frame in frames])
+        results = []
+        for frame in frames:
+            ys, xs = np.nonzero(frame[:, :, 0] > 128)
+            if len(xs):
+                results.append((np.array([[xs.min(), ys.min(), xs.max(), ys.max()]], dtype=np.float32),
+                                np.array([0], dtype=np.int16), np.array([0.9], dtype=np.float32)))
+            else:
+                results.append((np.zeros((0, 4), np.float32), np.zeros(0, np.int16), np.zeros(0, np.float32)))
+        return results
+
+
+def marker_frame(x, y, size=(300, 200)):
+    frame = np.zeros((size[1], size[0], 3), dtype=np.uint8)
+    frame[y - 5:y + 6, x - 5:x + 6] = 255
+    return frame
+
+
+def test_one_batch_per_tick_routed_to_each_camera(tmp_path, monkeypatch):
+    monkeypatch.setattr(multi_camera, "csv_folder", str(tmp_path))
+    cameras = [CameraConfig("a", "a.avi", KITCHEN_ROI), CameraConfig("b", "b.avi", KITCHEN_ROI, crop_margin=20)]
+    assert [c.event_store_path for c in cameras] == [os.path.join(str(tmp_path), "Processed_Data_a.csv"),
+                                                     os.path.join(str(tmp_path), "Processed_Data_b.csv")]
+    detector = MarkerDetector()
+    writers = {}
+    runner = MultiCameraRunner(detector, cameras, callback_factory=event_callback_factory(writers))
+    a, b = runner.workers
+
+    # Camera a carries an item out of the kitchen; camera b's item stays inside
+    for x in range(50, 171, 20):
+        a.slot.put(marker_frame(x, 100))
+        b.slot.put(marker_frame(60, 150))
+        assert runner.tick() == 2
+    a.slot.put(marker_frame(190, 100))
+    assert runner.tick() == 1
+    assert runner.tick() == 0
+    for writer in writers.values():
+        writer.close()
+
+    assert runner.batches == 8 and len(detector.batches) == 8
+    # b runs on its crop (kitchen ROI plus 20 px), and its boxes come back in full-frame coordinates
+    assert detector.batches[0] == [(200, 300, 3), (200, 121, 3)]
+    assert b.tracker.objects == {0: (60, 150)}
+    assert a.tracker.total_delivered_food == 0 and a.tracker.object_roi_history[0]['delivered']
+    assert a.frames_inferred == 8 and b.frames_inferred == 7
+
+    # Each camera logs to its own store
+    rows = pd.read_csv(cameras[0].event_store_path, keep_default_na=False)
+    assert rows[['Total Food', 'Total Drinks', 'Total Parcels', 'Video_Path']].values.tolist() == [[1, 0, 0, "N/A"]]
+    assert not os.path.isfile(cameras[1].event_store_path) or pd.read_csv(cameras[1].event_store_path).empty
+
+
+def test_cameras_sharing_a_store_share_one_writer(tmp_path, monkeypatch):
+    monkeypatch.setattr(multi_camera, "csv_folder", str(tmp_path))
+    shared = os.path.join(str(tmp_path), "Processed_Data.csv")
+    cameras = [CameraConfig("a", "a.avi", KITCHEN_ROI, event_store_path=shared),
+               CameraConfig("b", "b.avi", KITCHEN_ROI, event_store_path=shared), CameraConfig("c", "c.avi", KITCHEN_ROI)]
+    writers = {}
+    MultiCameraRunner(MarkerDetector(), cameras, callback_factory=event_callback_factory(writers))
+    try:
+        assert sorted(writers) == sorted([shared, os.path.join(str(tmp_path), "Processed_Data_c.csv")])
+    finally:
+        for writer in writers.values():
+            writer.close()
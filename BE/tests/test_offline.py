@@ -0,0 +1,126 @@
+# Segmented offline runs against a single-segment run on a small synthetic video
+import copy
+
+import cv2 #type: ignore
+import numpy as np
+import pytest
+
+import offline
+
+FPS = 10
+SIZE = (320, 240)
+KITCHEN_ROI = np.array([[0, 0], [160, 0], [160, 240], [0, 240]], dtype=np.int32)
+# BGR colour of each class the fake detector finds
+COLOURS = {0: (0, 0, 255), 1: (0, 255, 0), 2: (255, 0, 0)}
+# (class id, first frame, last frame, start x, y, px per frame, frame it turns back or None): carried out
+# of the kitchen, and one brought back in
+MOVES = [(0, 10, 80, 60, 30, 4, None), (1, 30, 110, 100, 85, 4, 60), (2, 95, 170, 130, 140, 3, None),
+         (0, 115, 200, 40, 195, 3, None)]
+
+
+def write_video(path, frames=240):
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"MJPG"), FPS, SIZE)
+    for i in range(frames):
+        frame = np.full((SIZE[1], SIZE[0], 3), 40, dtype=np.uint8)
+        for class_id, first, last, x, y, speed, turn in MOVES:
+            if first <= i <= last:
+                cx = x + speed * (i - first) if turn is None or i <= turn else x + speed * (2 * turn - first - i)
+                cv2.rectangle(frame, (cx - 10, y - 10), (cx + 10, y + 10), COLOURS[class_id], -1)
+        writer.write(frame)
+    writer.release()
+
+
+class ColourDetector:
+    """Finds the solid squares write_video draws"""
+    names = {0: "food", 1: "drink", 2: "parcel"}
+
+    def predict(self, frame, conf=0.25):
+        boxes, classes = [], []
+        for class_id, colour in COLOURS.items():
+            channel = int(np.argmax(colour))
+            mask = (frame[:, :, channel] > 180) & (frame.min(axis=2) < 80)
+            ys, xs = np.nonzero(mask)
+            if len(xs) > 50:
+                boxes.append([xs.min(), ys.min(), xs.max(), ys.max()])
+                classes.append(class_id)
+        return (np.array(boxes, dtype=np.float32).reshape(-1, 4), np.array(classes, dtype=np.int16),
+                np.full(len(classes), 0.9, dtype=np.float32))
+
+
+class LongGopCapture:
+    """VideoCapture whose frame seeks land on the previous 50-frame keyframe, like many long-GOP files"""
+    real = cv2.VideoCapture
+
+    def __init__(self, path):
+        self.cap = self.real(path)
+
+    def set(self, prop, value):
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            value -= value % 50
+        return self.cap.set(prop, value)
+
+    def __getattr__(self, name):
+        return getattr(self.cap, name)
+
+
+class SerialPool:
+    """pool.map / pool.apply in-process; arguments are copied as pickling would"""
+    def map(self, fn, tasks, chunksize=1):
+        return [fn(copy.deepcopy(task)) for task in tasks]
+
+    def apply(self, fn, args):
+        return fn(*copy.deepcopy(args))
+
+
+class RowLog:
+    def __init__(self):
+        self.rows = []
+
+    def log(self, row):
+        self.rows.append(row)
+
+
+def run(video, segment_frames):
+    log = RowLog()
+    offline.segment_minutes = segment_frames / (FPS * 60)
+    offline.process_video(SerialPool(), str(video), log)
+    return log.rows
+
+
+@pytest.fixture
+def video(tmp_path, monkeypatch):
+    path = tmp_path / "video_20260101_120000.avi"
+    write_video(path)
+    monkeypatch.setattr(offline, "_detector", ColourDetector())
+    monkeypatch.setattr(offline, "_class_names", ColourDetector.names)
+    monkeypatch.setattr(offline, "target_classes", {"food", "drink", "parcel"})
+    monkeypatch.setattr(offline, "kitchen_roi", KITCHEN_ROI)
+    monkeypatch.setattr(offline, "extra_zones", {})
+    monkeypatch.setattr(offline, "roi_crop_inference", False)
+    monkeypatch.setattr(offline, "skip_frame", 2)
+    monkeypatch.setattr(offline, "overlap_seconds", 3)
+    monkeypatch.setattr(offline, "segment_minutes", offline.segment_minutes)
+    return path
+
+
+@pytest.mark.parametrize("capture", ["exact", "long_gop"])
+def test_two_segments_match_one(video, monkeypatch, capture):
+    serial = run(video, segment_frames=1000)
+    assert len(serial) >= 4
+
+    if capture == "long_gop":
+        monkeypatch.setattr(cv2, "VideoCapture", LongGopCapture)
+    assert run(video, segment_frames=120) == serial
+    assert run(video, segment_frames=77) == serial
+
+
+def test_open_at_lands_on_the_requested_frame(video, monkeypatch):
+    monkeypatch.setattr(cv2, "VideoCapture", LongGopCapture)
+    reference = LongGopCapture(str(video))
+    frames = []
+    for _ in range(140):
+        frames.append(reference.read()[1])
+    for index in (1, 50, 73, 120, 139):
+        cap = offline.open_at(str(video), index)
+        ok, frame = cap.read()
+        assert ok and np.array_equal(frame, frames[index]), index
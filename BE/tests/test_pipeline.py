@@ -0,0 +1,109 @@
+# FramePipeline frame drops, queue aging and shutdown, and track aging across dropped frames
+import threading
+import time
+
+import numpy as np
+
+from pipeline import FramePipeline, LatestFrameSlot
+from tracker import CentroidTracker
+
+KITCHEN_ROI = np.array([[0, 0], [100, 0], [100, 100], [0, 100]], dtype=np.int32)
+
+
+def frame_source(count):
+    frames = iter(range(count))
+
+    def read():
+        frame = next(frames, None)
+        return (frame is not None), frame
+    return read
+
+
+def test_latest_frame_slot_overwrites_unread_item():
+    slot = LatestFrameSlot()
+    assert not slot.put(1)
+    assert slot.put(2)
+    assert slot.get(timeout=0) == 2
+    assert slot.get(timeout=0) is None
+    slot.close()
+    assert slot.get() is None
+
+
+def test_live_capture_drops_frames_a_slow_model_cannot_take():
+    inferred = []
+
+    def infer(index, frame):
+        time.sleep(0.005)
+        inferred.append(index)
+
+    pipeline = FramePipeline(frame_source(200), infer).start()
+    pipeline.join()
+    stats = pipeline.stats.snapshot()
+    assert pipeline.frames_read == 200 and stats['capture']['processed'] == 200
+    assert stats['capture']['dropped'] > 0
+    assert stats['capture']['dropped'] + stats['inference']['processed'] == 200
+    # Always the newest frame: indices only move forward, and the last frame is never lost
+    assert inferred == sorted(set(inferred)) and inferred[-1] == 200
+
+
+def test_paced_capture_keeps_every_frame_in_order():
+    inferred = []
+
+    def infer(index, frame):
+        time.sleep(0.001)
+        inferred.append((index, frame))
+
+    pipeline = FramePipeline(frame_source(100), infer, paced=True).start()
+    pipeline.join()
+    assert inferred == [(i + 1, i) for i in range(100)]
+    assert pipeline.stats.snapshot()['capture']['dropped'] == 0
+
+
+def test_full_render_queue_drops_its_oldest_packet():
+    release = threading.Event()
+    rendered = []
+
+    def render(packet):
+        release.wait()
+        rendered.append(packet)
+
+    pipeline = FramePipeline(frame_source(20), lambda index, frame: index, render, queue_size=2, paced=True)
+    pipeline.start()
+    while list(pipeline.render_queue.queue)[-1:] != [20]:
+        time.sleep(0.001)
+    release.set()
+    pipeline.join()
+    dropped = pipeline.stats.snapshot()['render']['dropped']
+    # Besides the packet the blocked render stage holds, only the newest two stayed queued
+    assert len(rendered) == 3 and rendered[1:] == [19, 20] and dropped == 17
+
+
+def test_last_packet_survives_stop():
+    encoded = []
+    pipeline = FramePipeline(frame_source(50), lambda index, frame: index, lambda packet: packet,
+                             lambda packet: (time.sleep(0.001), encoded.append(packet)), queue_size=50, paced=True)
+    pipeline.start().join()
+    assert encoded[-1] == 50 and pipeline.error is None
+
+
+def test_failed_render_stage_does_not_hang_capture():
+    def render(packet):
+        raise RuntimeError("draw failed")
+
+    pipeline = FramePipeline(frame_source(500), lambda index, frame: index, render, lambda packet: None,
+                             queue_size=1, paced=True).start()
+    done = threading.Thread(target=pipeline.join)
+    done.start()
+    done.join(timeout=5)
+    assert not done.is_alive()
+    assert isinstance(pipeline.error, RuntimeError) and pipeline.frames_read < 500
+
+
+def test_tracks_age_by_the_frames_that_were_dropped():
+    tracker = CentroidTracker(max_disappeared=10, max_distance=100)
+    tracker.update([((50, 50), "Food")], KITCHEN_ROI)
+    # One inference after a gap of 6 skip_frame intervals counts as 6 missed updates
+    tracker.update([], KITCHEN_ROI, steps=6)
+    assert tracker.disappeared == {0: 6}
+    tracker.update([], KITCHEN_ROI, steps=5)
+    assert tracker.objects == {}
@@ -0,0 +1,201 @@
+# Rollup-served /ws/totals, /ws/detailed and /ws/custom-range payloads against the pandas groupby they replaced
+import csv
+import datetime as dt
+
+import pandas as pd
+import pytest
+
+import app
+from event_log import DELIVERY_COLUMNS
+from event_table import EventTable
+from rollups import EventRollup, DAY_NS
+
+NOW = dt.datetime(2026, 10, 14, 13, 7, 30)
+COLUMNS = ['Total Food', 'Total Drinks', 'Total Parcels']
+PERIODS = {"1hr": dt.timedelta(hours=1), "24hr": dt.timedelta(hours=24), "7d": dt.timedelta(days=7),
+           "30d": dt.timedelta(days=30), "90d": dt.timedelta(days=90)}
+DAY_ORDER = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+CUSTOM_RANGES = [("2026-07-01", "2026-10-14"), ("2026-10-12", "2026-10-12"), ("2026-10-13", "2026-10-20"),
+                 ("2020-01-01", "2020-01-31")]
+
+
+class FixedDatetime(dt.datetime):
+    @classmethod
+    def now(cls, tz=None):
+        return NOW
+
+
+def event_row(when, food=0, drinks=0, parcels=0):
+    return [when.strftime("%Y-%m-%d"), when.strftime("%I:%M:%S %p"), food, drinks, parcels, "N/A"]
+
+
+def edge_rows():
+    """Rows exactly on period starts, bucket boundaries and now, one second either side, and zero-sum rows"""
+    rows = []
+    for delta in PERIODS.values():
+        rows.append(event_row(NOW - delta, 5, 1, 1))
+        rows.append(event_row(NOW - delta - dt.timedelta(seconds=1), 7, 0, 0))
+        rows.append(event_row(NOW - delta + dt.timedelta(seconds=1), 0, 2, 0))
+    for boundary in ["2026-10-14 13:00:00", "2026-10-14 12:15:00", "2026-10-14 00:00:00", "2026-10-13 23:59:59",
+                     "2026-10-12 00:00:00", "2026-10-11 23:59:59"]:
+        rows.append(event_row(dt.datetime.fromisoformat(boundary), 1, 0, 1))
+    rows.append(event_row(NOW, 0, 0, 3))
+    rows.append(event_row(NOW - dt.timedelta(minutes=50), 0, 0, 0))
+    rows.append(event_row(NOW - dt.timedelta(days=40), 0, 0, 0))
+    return rows
+
+
+def history_rows(start, end, step_minutes=37):
+    """Regular events with increments and the odd decrement, like EventWriter logs them"""
+    rows = []
+    when = start
+    i = 0
+    while when < end:
+        rows.append(event_row(when, 1 if i % 3 == 0 else (-1 if i % 17 == 0 else 0), 1 if i % 3 == 1 else 0,
+                              1 if i % 3 == 2 else 0))
+        when += dt.timedelta(minutes=step_minutes + i % 5)
+        i += 1
+    return rows
+
+
+def write_store(path, rows, mode="w"):
+    with open(path, mode, newline="") as f:
+        writer = csv.writer(f)
+        if mode == "w":
+            writer.writerow(DELIVERY_COLUMNS)
+        writer.writerows(rows)
+
+
+# --- Reference: the pandas filter + groupby the views used before the rollups ---
+
+def in_range(df, start, end):
+    return df[(df['DateTime'] >= start) & (df['DateTime'] <= end)].copy()
+
+
+def series(grouped, label):
+    return [{label: key, "food_count": int(row['Total Food']), "drinks_count": int(row['Total Drinks']),
+             "parcels_count": int(row['Total Parcels'])} for key, row in grouped.iterrows()]
+
+
+def sums(filtered_df):
+    return {"total_food": int(filtered_df['Total Food'].sum()), "total_drinks": int(filtered_df['Total Drinks'].sum()),
+            "total_parcels": int(filtered_df['Total Parcels'].sum())}
+
+
+def reference_totals(df, period):
+    start_time = NOW - PERIODS[period]
+    filtered_df = in_range(df, start_time, NOW)
+    totals = sums(filtered_df) if not filtered_df.empty else {"total_food": 0, "total_drinks": 0, "total_parcels": 0}
+    return {"period": period, **totals, "start_time": start_time.strftime("%Y-%m-%d %H:%M:%S"),
+            "end_time": NOW.strftime("%Y-%m-%d %H:%M:%S"), "timestamp": NOW.strftime("%Y-%m-%d %H:%M:%S")}
+
+
+def reference_detailed(df, period):
+    filtered_df = in_range(df, NOW - PERIODS[period], NOW)
+    times = filtered_df['DateTime']
+    if period in ("30d", "90d"):
+        weekly = filtered_df.groupby(times.dt.day_name())[COLUMNS].sum().reindex(DAY_ORDER).fillna(0)
+        weekly.index = [f"Total {day}s" for day in weekly.index]
+        data = series(weekly, "timestamp")
+        summary = {"period_days": 30 if period == "30d" else 90, **sums(filtered_df)}
+    else:
+        keys, count_key = {
+            "1hr": (times.dt.floor('15min').dt.strftime("%Y-%m-%d %H:%M"), "total_intervals"),
+            "24hr": (times.dt.strftime("%Y-%m-%d %H:00"), "total_hours"),
+            "7d": (times.dt.strftime("%A (%Y-%m-%d)"), "total_days"),
+        }[period]
+        data = series(filtered_df.groupby(keys)[COLUMNS].sum(), "timestamp")
+        summary = {count_key: len(data), **sums(filtered_df)}
+    return {"period": period, "data": data, "summary": summary, "timestamp": NOW.strftime("%Y-%m-%d %H:%M:%S")}
+
+
+def reference_custom_range(df, start_date, end_date, start_dt, end_dt):
+    filtered_df = in_range(df, start_dt, end_dt)
+    response = {"start_date": start_date, "end_date": end_date}
+    if filtered_df.empty:
+        response.update({"total_food": 0, "total_drinks": 0, "total_parcels": 0, "total_days": 0,
+                         "daily_breakdown": []})
+    else:
+        daily = filtered_df.groupby(filtered_df['DateTime'].dt.date)[COLUMNS].sum()
+        daily.index = [str(day) for day in daily.index]
+        breakdown = series(daily, "date")
+        response.update({**sums(filtered_df), "total_days": len(breakdown), "daily_breakdown": breakdown})
+    response["timestamp"] = NOW.strftime("%Y-%m-%d %H:%M:%S")
+    return response
+
+
+# --- Tests ---
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """Event store wired into app.py's rollup, with the clock fixed at NOW"""
+    path = tmp_path / "Processed_Data.csv"
+    table = EventTable(str(path), prepare_fn=app.prepare_events)
+    monkeypatch.setattr(app, "ROLLUP", EventRollup(table, COLUMNS))
+    monkeypatch.setattr(app, "datetime", FixedDatetime)
+    return path, table
+
+
+def assert_views_match(table):
+    df = table.get()
+    for period, delta in PERIODS.items():
+        assert app.totals_view(period, delta) == reference_totals(df, period), period
+        assert app.detailed_view(period) == reference_detailed(df, period), period
+    for start_date, end_date in CUSTOM_RANGES:
+        start_dt, end_dt = app.date_range(start_date, end_date)
+        assert (app.custom_range_view(start_date, end_date, start_dt, end_dt)
+                == reference_custom_range(df, start_date, end_date, start_dt, end_dt)), start_date
+
+
+def test_views_match_groupby(store):
+    path, table = store
+    write_store(path, sorted(history_rows(NOW - dt.timedelta(days=100), NOW + dt.timedelta(hours=2)) + edge_rows(),
+                             key=lambda row: pd.Timestamp(f"{row[0]} {row[1]}")))
+    assert_views_match(table)
+
+
+def test_views_match_after_appends(store):
+    path, table = store
+    write_store(path, history_rows(NOW - dt.timedelta(days=100), NOW - dt.timedelta(hours=3)))
+    assert_views_match(table)
+
+    # In order, then rows logged late (e.g. offline processing of an old recording)
+    write_store(path, history_rows(NOW - dt.timedelta(hours=3), NOW, step_minutes=4) + edge_rows(), mode="a")
+    assert_views_match(table)
+    write_store(path, [event_row(NOW - dt.timedelta(days=20), 4, 0, 0), event_row(NOW - dt.timedelta(minutes=20), 0, 1, 0)],
+                mode="a")
+    assert_views_match(table)
+    assert table.full_loads == 1 and table.incremental_loads == 2
+
+
+def test_views_match_after_full_reload(store):
+    path, table = store
+    write_store(path, history_rows(NOW - dt.timedelta(days=100), NOW) + edge_rows())
+    assert_views_match(table)
+    epoch = app.ROLLUP.epoch
+
+    # A rewritten store (fewer, different rows) is reloaded in full and the rollup rebuilt
+    write_store(path, history_rows(NOW - dt.timedelta(days=10), NOW, step_minutes=90))
+    assert_views_match(table)
+    assert table.full_loads == 2 and app.ROLLUP.epoch != epoch
+
+
+def test_refresh_folds_only_new_rows(store, monkeypatch):
+    path, table = store
+    folded = []
+    add = EventRollup._add
+    monkeypatch.setattr(EventRollup, "_add", lambda self, rows: (folded.append(len(rows)), add(self, rows)))
+    write_store(path, history_rows(NOW - dt.timedelta(days=30), NOW - dt.timedelta(hours=1)))
+    assert_views_match(table)
+    first = len(table.get())
+    assert folded == [first]
+
+    # Refreshes with nothing new fold nothing; appended rows (one late) are folded once, on their own
+    assert_views_match(table)
+    write_store(path, [event_row(NOW - dt.timedelta(minutes=30), 1, 0, 0), event_row(NOW - dt.timedelta(days=3), 0, 2, 0)],
+                mode="a")
+    assert_views_match(table)
+    write_store(path, [event_row(NOW, 0, 0, 1)], mode="a")
+    assert_views_match(table)
+    assert folded == [first, 2, 1]
+    assert sum(sums[-1] for sums in app.ROLLUP.buckets[DAY_NS].values()) == first + 3
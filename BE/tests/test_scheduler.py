@@ -0,0 +1,46 @@
+# MotionGate scheduling on synthetic frames
+import numpy as np
+
+from scheduler import MotionGate
+
+ROI = np.array([[40, 40], [280, 40], [280, 200], [40, 200]], dtype=np.int32)
+
+
+def scene(block_x=None):
+    frame = np.full((240, 320, 3), 90, dtype=np.uint8)
+    if block_x is not None:
+        frame[100:140, block_x:block_x + 40] = 240
+    return frame
+
+
+def run_gate(gate, frames):
+    return [index for index, frame in enumerate(frames, start=1) if gate.check(frame, index)]
+
+
+def test_quiet_scene_runs_at_the_max_interval():
+    gate = MotionGate(ROI, max_interval=10, baseline_interval=2)
+    assert run_gate(gate, [scene()] * 40) == [1, 11, 21, 31]
+    assert gate.tracker_steps() == 5
+    stats = gate.stats()
+    assert stats['inferences'] == 4 and stats['motion_triggered'] == 0
+    assert stats['baseline_inferences'] == 20 and stats['inferences_saved'] == 16
+
+
+def test_motion_runs_every_allowed_frame():
+    gate = MotionGate(ROI, min_interval=2, max_interval=25, baseline_interval=2)
+    frames = [scene()] * 5 + [scene(60 + 8 * i) for i in range(20)] + [scene(212)] * 10
+    ran = run_gate(gate, frames)
+    # Moving block: every min_interval frames; still again: nothing until max_interval
+    assert ran == [1, 6, 8, 10, 12, 14, 16, 18, 20, 22, 24, 26]
+    assert gate.tracker_steps() == 1
+    assert gate.stats()['motion_triggered'] == 11
+
+
+def test_motion_outside_the_roi_is_ignored():
+    gate = MotionGate(ROI, max_interval=10)
+    frames = []
+    for i in range(20):
+        frame = scene()
+        frame[0:30, 10 * i:10 * i + 20] = 255
+        frames.append(frame)
+    assert run_gate(gate, frames) == [1, 11]
@@ -0,0 +1,69 @@
+# Replays random detection streams through the array tracker and the pre-rewrite tracker
+import numpy as np
+import pytest
+
+from tracker import CentroidTracker
+from zones import ZoneMap
+from legacy_tracker import CentroidTracker as LegacyTracker
+
+KITCHEN_ROI = np.array([[100, 100], [500, 100], [500, 400], [100, 400]], dtype=np.int32)
+CATEGORIES = ["Food", "Drink", "Parcel"]
+
+
+def random_stream(seed, frames=400):
+    """Items carried out of and back into the kitchen, with missed detections and the odd false positive"""
+    rng = np.random.default_rng(seed)
+    items = []
+    stream = []
+    for _ in range(frames):
+        if rng.random() < 0.08:
+            start = rng.uniform([150, 150], [450, 350])
+            items.append({"pos": start, "vel": rng.uniform(-12, 12, 2), "category": rng.choice(CATEGORIES),
+                          "ttl": int(rng.integers(20, 120))})
+        detections = []
+        for item in items:
+            item["pos"] = item["pos"] + item["vel"] + rng.normal(0, 2, 2)
+            if rng.random() < 0.05:
+                item["vel"] = -item["vel"]
+            item["ttl"] -= 1
+            if rng.random() > 0.15:
+                x, y = item["pos"]
+                detections.append(((int(x), int(y)), str(item["category"])))
+        items = [item for item in items if item["ttl"] > 0]
+        if rng.random() < 0.05:
+            x, y = rng.uniform(0, 640, 2)
+            detections.append(((int(x), int(y)), str(rng.choice(CATEGORIES))))
+        rng.shuffle(detections)
+        stream.append(detections)
+    return stream
+
+
+def totals(tracker):
+    return tracker.total_delivered_food, tracker.total_delivered_drinks, tracker.total_delivered_parcels
+
+
+@pytest.mark.parametrize("seed", range(8))
+@pytest.mark.parametrize("use_zone_map", [False, True])
+@pytest.mark.parametrize("association", ["greedy", "optimal"])
+def test_replay_matches_legacy_tracker(seed, use_zone_map, association):
+    events, legacy_events = [], []
+    # capacity=4 makes the arrays grow and reuse freed slots during the replay
+    tracker = CentroidTracker(max_disappeared=10, max_distance=100, trail_length=30, capacity=4,
+                              csv_callback=lambda category, change: events.append((category, change)),
+                              association=association)
+    legacy = LegacyTracker(max_disappeared=10, max_distance=100, trail_length=30,
+                           csv_callback=lambda category, change: legacy_events.append((category, change)),
+                           association=association)
+    roi = ZoneMap({"kitchen": KITCHEN_ROI}, (640, 480)) if use_zone_map else KITCHEN_ROI
+
+    for frame, detections in enumerate(random_stream(seed)):
+        tracker.update(detections, roi)
+        legacy.update(detections, KITCHEN_ROI)
+        assert tracker.objects == legacy.objects, f"frame {frame}"
+        assert tracker.object_categories == legacy.object_categories, f"frame {frame}"
+        assert tracker.object_roi_history == legacy.object_roi_history, f"frame {frame}"
+        assert tracker.trails == {k: list(v) for k, v in legacy.trails.items()}, f"frame {frame}"
+        assert events == legacy_events, f"frame {frame}"
+        assert totals(tracker) == totals(legacy), f"frame {frame}"
+
+    assert tracker.next_object_id == legacy.next_object_id
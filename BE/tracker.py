@@ -0,0 +1,406 @@
+# Centroid tracker and ROI helpers shared by the kitchen tracking runners
+import cv2 #type: ignore
+import numpy as np
+from association import associate
+from detection import CATEGORY_COLORS
+from zones import ZoneMap
+
+# --- CENTROID TRACKER ---
+class CentroidTracker:
+    """
+    Centroid tracker with struct-of-arrays state.
+
+    Every tracked object lives in a slot of preallocated NumPy arrays
+    (centroid, category code, disappeared count, ROI flags, trail ring buffer).
+    Freed slots are reused and the arrays double in size when full, so
+    update() does no per-object dict/set bookkeeping. Matching only scores
+    same-category pairs within max_distance and uses either a greedy or an
+    optimal (Hungarian) solver, picked with association. objects,
+    object_categories, disappeared, object_roi_history and trails are still
+    available as read-only dict views for callers that want them.
+    """
+    _ARRAYS = ('ids', 'active', 'centroids', 'categories', 'disappeared_counts', 'in_kitchen',
+               'in_kitchen_now', 'zone_bits', 'delivered', 'trail_points', 'trail_sizes', 'trail_heads')
+
+    def __init__(self, max_disappeared=30, max_distance=50, trail_length=30, csv_callback=None, capacity=64,
+                 association='greedy'):
+        self.next_object_id = 0
+        self.max_disappeared = max_disappeared
+        self.max_distance = max_distance
+        # 'greedy', 'optimal' or a custom solver, see association.py
+        self.association = association
+        # Persistent delivery counters
+        self.total_delivered_drinks = 0
+        self.total_delivered_food = 0
+        self.total_delivered_parcels = 0
+        # Trail tracking
+        self.trail_length = trail_length
+        # CSV callback function
+        self.csv_callback = csv_callback
+        # Category names <-> small integer codes stored in the arrays
+        self.category_names = []
+        self.category_codes = {}
+        # Live counters per category code, kept up to date on every transition
+        self.kitchen_by_category = np.zeros(0, dtype=np.int64)
+        self.delivered_by_category = np.zeros(0, dtype=np.int64)
+        self._allocate(capacity)
+        self._publish_counts()
+
+    def _allocate(self, capacity):
+        self.capacity = capacity
+        self.ids = np.full(capacity, -1, dtype=np.int64)
+        self.active = np.zeros(capacity, dtype=bool)
+        self.centroids = np.zeros((capacity, 2), dtype=np.int32)
+        self.categories = np.zeros(capacity, dtype=np.int16)
+        self.disappeared_counts = np.zeros(capacity, dtype=np.int32)
+        self.in_kitchen = np.zeros(capacity, dtype=bool)
+        self.in_kitchen_now = np.zeros(capacity, dtype=bool)
+        self.zone_bits = np.zeros(capacity, dtype=np.uint32)
+        self.delivered = np.zeros(capacity, dtype=bool)
+        self.trail_points = np.zeros((capacity, self.trail_length, 2), dtype=np.int32)
+        self.trail_sizes = np.zeros(capacity, dtype=np.int32)
+        self.trail_heads = np.zeros(capacity, dtype=np.int32)
+        self._free_slots = list(range(capacity - 1, -1, -1))
+
+    def _grow(self):
+        old = self.capacity
+        new = old * 2
+        for name in self._ARRAYS:
+            arr = getattr(self, name)
+            grown = np.zeros((new,) + arr.shape[1:], dtype=arr.dtype)
+            grown[:old] = arr
+            setattr(self, name, grown)
+        self.ids[old:] = -1
+        self.capacity = new
+        self._free_slots = list(range(new - 1, old - 1, -1)) + self._free_slots
+
+    def category_code(self, category):
+        code = self.category_codes.get(category)
+        if code is None:
+            code = len(self.category_names)
+            self.category_names.append(category)
+            self.category_codes[category] = code
+            self.kitchen_by_category = np.append(self.kitchen_by_category, 0)
+            self.delivered_by_category = np.append(self.delivered_by_category, 0)
+        return code
+
+    def active_slots(self):
+        """Slots of live objects, ordered by object ID (registration order)"""
+        slots = np.flatnonzero(self.active)
+        return slots[np.argsort(self.ids[slots], kind='stable')]
+
+    def __len__(self):
+        return int(self.active.sum())
+
+    # --- dict views kept for compatibility with the original tracker ---
+    @property
+    def objects(self):
+        return {int(self.ids[s]): (int(self.centroids[s, 0]), int(self.centroids[s, 1])) for s in self.active_slots()}
+
+    @property
+    def disappeared(self):
+        return {int(self.ids[s]): int(self.disappeared_counts[s]) for s in self.active_slots()}
+
+    @property
+    def object_categories(self):
+        return {int(self.ids[s]): self.category_names[self.categories[s]] for s in self.active_slots()}
+
+    @property
+    def object_roi_history(self):
+        return {int(self.ids[s]): {'kitchen': bool(self.in_kitchen[s]), 'delivered': bool(self.delivered[s])}
+                for s in self.active_slots()}
+
+    @property
+    def trails(self):
+        return {int(self.ids[s]): [tuple(int(v) for v in p) for p in self.trail(s)] for s in self.active_slots()}
+
+    def trail(self, slot):
+        """Trail points of a slot, oldest first"""
+        size = self.trail_sizes[slot]
+        start = self.trail_heads[slot] - size
+        idx = np.arange(start, start + size) % self.trail_length
+        return self.trail_points[slot, idx]
+
+    def snapshot(self):
+        """Independent copy of the tracker state, safe to read from another thread"""
+        view = CentroidTracker.__new__(CentroidTracker)
+        view.__dict__.update(self.__dict__)
+        for name in self._ARRAYS:
+            setattr(view, name, getattr(self, name).copy())
+        view.kitchen_by_category = self.kitchen_by_category.copy()
+        view.delivered_by_category = self.delivered_by_category.copy()
+        view.category_names = list(self.category_names)
+        view.category_codes = dict(self.category_codes)
+        view._free_slots = []
+        view.csv_callback = None
+        return view
+
+    def _add_to_total(self, category, change):
+        if category == "Drink":
+            self.total_delivered_drinks = max(0, self.total_delivered_drinks + change)
+        elif category == "Food":
+            self.total_delivered_food = max(0, self.total_delivered_food + change)
+        elif category == "Parcel":
+            self.total_delivered_parcels = max(0, self.total_delivered_parcels + change)
+
+    def _set_flags(self, flags, counters, slots, values):
+        """Set a per-slot flag and move the matching per-category counter by the net change"""
+        changed = flags[slots] != values
+        if changed.any():
+            changed_slots = slots[changed]
+            np.add.at(counters, self.categories[changed_slots], np.where(values[changed], 1, -1))
+            flags[changed_slots] = values[changed]
+
+    def _publish_counts(self):
+        """Rebuild the counts snapshot from the per-category counters (O(categories))"""
+        keys = {"Drink": 'drinks', "Food": 'food', "Parcel": 'parcels'}
+        kitchen = {'drinks': 0, 'food': 0, 'parcels': 0}
+        delivered = {
+            'drinks': self.total_delivered_drinks,
+            'food': self.total_delivered_food,
+            'parcels': self.total_delivered_parcels
+        }
+        for code, name in enumerate(self.category_names):
+            key = keys.get(name)
+            if key:
+                kitchen[key] += int(self.kitchen_by_category[code])
+                delivered[key] += int(self.delivered_by_category[code])
+        # Swapping in a new dict is atomic, so other threads always see a complete snapshot
+        self._counts = {'kitchen': kitchen, 'delivered': delivered}
+
+    def counts(self):
+        """
+        Live "in kitchen" and "delivered" counts, same shape as get_counts_by_roi.
+
+        The returned dict is an immutable snapshot replaced after every update,
+        so it can be read from any thread without walking tracker state.
+        Do not modify it.
+        """
+        return self._counts
+
+    def register(self, centroid, category):
+        return int(self.ids[self._register(centroid, category)])
+
+    def _register(self, centroid, category):
+        if not self._free_slots:
+            self._grow()
+        slot = self._free_slots.pop()
+        object_id = self.next_object_id
+        self.ids[slot] = object_id
+        self.active[slot] = True
+        self.centroids[slot] = centroid
+        self.categories[slot] = self.category_code(category)
+        self.disappeared_counts[slot] = 0
+        self.in_kitchen[slot] = False
+        self.in_kitchen_now[slot] = False
+        self.zone_bits[slot] = 0
+        self.delivered[slot] = False
+        self.trail_points[slot, 0] = centroid
+        self.trail_sizes[slot] = 1
+        self.trail_heads[slot] = 1 % self.trail_length
+        self.next_object_id += 1
+        return slot
+
+    def _deregister_slots(self, slots):
+        """Remove the given slots, counting delivered objects into the persistent totals"""
+        if len(slots) == 0:
+            return
+        for slot in slots[self.delivered[slots]]:
+            category = self.category_names[self.categories[slot]]
+            self._add_to_total(category, 1)
+            print(f"Object {int(self.ids[slot])} ({category}) marked as delivered!")
+        none = np.zeros(len(slots), dtype=bool)
+        self._set_flags(self.in_kitchen_now, self.kitchen_by_category, slots, none)
+        self._set_flags(self.delivered, self.delivered_by_category, slots, none)
+        self.active[slots] = False
+        self.ids[slots] = -1
+        self._free_slots.extend(int(s) for s in slots)
+
+    def deregister(self, object_id):
+        slots = np.flatnonzero(self.active & (self.ids == object_id))
+        self._deregister_slots(slots)
+        self._publish_counts()
+
+    def _age(self, slots, steps=1):
+        """Bump disappeared counts for the given slots and drop the ones that expired"""
+        if len(slots) == 0:
+            return
+        self.disappeared_counts[slots] += steps
+        expired = slots[self.disappeared_counts[slots] > self.max_disappeared]
+        self._deregister_slots(expired)
+
+    def _append_trails(self, slots, points):
+        heads = self.trail_heads[slots]
+        self.trail_points[slots, heads] = points
+        self.trail_heads[slots] = (heads + 1) % self.trail_length
+        self.trail_sizes[slots] = np.minimum(self.trail_sizes[slots] + 1, self.trail_length)
+
+    def _match(self, object_slots, det_centroids, det_codes):
+        """Gated association of objects to detections, returns (row, col) pairs in match order"""
+        rows, cols = associate(self.centroids[object_slots], self.categories[object_slots],
+                               det_centroids, det_codes, self.max_distance, self.association)
+        used_rows = np.zeros(len(object_slots), dtype=bool)
+        used_cols = np.zeros(len(det_centroids), dtype=bool)
+        used_rows[rows] = True
+        used_cols[cols] = True
+        return rows, cols, used_rows, used_cols
+
+    def _update_roi(self, slots, points, kitchen_roi):
+        """Apply kitchen / delivered transitions for matched objects and fire callbacks in match order"""
+        if isinstance(kitchen_roi, ZoneMap):
+            self.zone_bits[slots] = kitchen_roi.zone_bits(points)
+        in_kitchen, dist_from_roi = kitchen_membership(points, kitchen_roi)
+        self._set_flags(self.in_kitchen_now, self.kitchen_by_category, slots, in_kitchen)
+
+        was_delivered = self.delivered[slots]
+        was_in_kitchen = self.in_kitchen[slots]
+        returned = in_kitchen & was_delivered
+        left = ~in_kitchen & was_in_kitchen & ~was_delivered & (dist_from_roi < -5)
+
+        self.in_kitchen[slots[in_kitchen]] = True
+        self._set_flags(self.delivered, self.delivered_by_category, slots, (was_delivered & ~returned) | left)
+
+        for i in np.flatnonzero(returned | left):
+            slot = slots[i]
+            category = self.category_names[self.categories[slot]]
+            if returned[i]:
+                # Object re-entered kitchen - log decrement
+                if self.csv_callback:
+                    self.csv_callback(category, -1)
+                self._add_to_total(category, -1)
+                print(f"Object {int(self.ids[slot])} ({category}) re-entered kitchen → subtracting from delivered total.")
+            else:
+                # Object left kitchen - log increment
+                if self.csv_callback:
+                    self.csv_callback(category, 1)
+
+    def update(self, detections, kitchen_roi, steps=1):
+        """
+        Match detections to tracked objects and apply kitchen / delivered transitions.
+
+        kitchen_roi is either the kitchen polygon or a ZoneMap with a "kitchen"
+        zone; with a ZoneMap the ROI checks become array lookups and every
+        object's zone_bits are refreshed in the same gather.
+
+        steps is how many regular update intervals this call stands for; an
+        adaptive scheduler that skipped inferences passes the gap so unmatched
+        objects still age by elapsed time.
+
+        Returns nothing: building the objects dict every frame is the allocation
+        the array state avoids. Read snapshot() or objects when needed.
+        """
+        self._update(detections, kitchen_roi, steps)
+        self._publish_counts()
+
+    def _register_all(self, points, categories, kitchen_roi):
+        slots = np.array([self._register(point, category) for point, category in zip(points, categories)],
+                         dtype=np.intp)
+        if len(slots):
+            if isinstance(kitchen_roi, ZoneMap):
+                self.zone_bits[slots] = kitchen_roi.zone_bits(points)
+            in_kitchen, _ = kitchen_membership(points, kitchen_roi, with_distance=False)
+            self._set_flags(self.in_kitchen_now, self.kitchen_by_category, slots, in_kitchen)
+
+    def _update(self, detections, kitchen_roi, steps):
+        object_slots = self.active_slots()
+
+        if len(detections) == 0:
+            self._age(object_slots, steps)
+            return
+
+        det_centroids = np.array([det[0] for det in detections], dtype=np.int32).reshape(-1, 2)
+        categories = [det[1] for det in detections]
+
+        if len(object_slots) == 0:
+            self._register_all(det_centroids, categories, kitchen_roi)
+            return
+
+        det_codes = np.array([self.category_code(c) for c in categories], dtype=np.int16)
+        rows, cols, used_rows, used_cols = self._match(object_slots, det_centroids, det_codes)
+
+        if len(rows):
+            slots = object_slots[rows]
+            points = det_centroids[cols]
+            self.centroids[slots] = points
+            self.disappeared_counts[slots] = 0
+            self._append_trails(slots, points)
+            self._update_roi(slots, points, kitchen_roi)
+
+        if len(object_slots) >= len(det_centroids):
+            self._age(object_slots[~used_rows], steps)
+        else:
+            new_cols = np.flatnonzero(~used_cols)
+            self._register_all(det_centroids[new_cols], [categories[c] for c in new_cols], kitchen_roi)
+
+
+# --- UTILITY FUNCTIONS ---
+def point_in_polygon(point, polygon):
+    point_float = (float(point[0]), float(point[1]))
+    return cv2.pointPolygonTest(polygon, point_float, False) >= 0
+
+def kitchen_membership(points, kitchen_roi, with_distance=True):
+    """
+    Kitchen membership and signed distance to the kitchen boundary for each point.
+
+    Distances are only needed for points outside the kitchen, so with a raw
+    polygon they are left at 0 for points inside.
+    """
+    points = np.asarray(points).reshape(-1, 2)
+    if isinstance(kitchen_roi, ZoneMap):
+        in_kitchen = kitchen_roi.contains(points, "kitchen")
+        return in_kitchen, kitchen_roi.distance(points, "kitchen") if with_distance else None
+    in_kitchen = np.array([point_in_polygon(p, kitchen_roi) for p in points], dtype=bool)
+    if not with_distance:
+        return in_kitchen, None
+    dist_from_roi = np.zeros(len(points))
+    for i in np.flatnonzero(~in_kitchen):
+        dist_from_roi[i] = cv2.pointPolygonTest(kitchen_roi, (float(points[i][0]), float(points[i][1])), True)
+    return in_kitchen, dist_from_roi
+
+def draw_polygon(img, points, color, thickness=2):
+    if len(points) > 1:
+        pts = np.array(points, np.int32)
+        pts = pts.reshape((-1, 1, 2))
+        cv2.polylines(img, [pts], True, color, thickness)
+    for point in points:
+        cv2.circle(img, point, 5, color, -1)
+
+def _count_by_category(tracker, slots):
+    counts = {'drinks': 0, 'food': 0, 'parcels': 0}
+    keys = {"Drink": 'drinks', "Food": 'food', "Parcel": 'parcels'}
+    if len(slots):
+        per_code = np.bincount(tracker.categories[slots], minlength=len(tracker.category_names))
+        for code, n in enumerate(per_code):
+            key = keys.get(tracker.category_names[code])
+            if key:
+                counts[key] += int(n)
+    return counts
+
+def get_counts_by_roi(tracker, kitchen_roi):
+    slots = tracker.active_slots()
+    in_kitchen, _ = kitchen_membership(tracker.centroids[slots], kitchen_roi, with_distance=False)
+    kitchen = _count_by_category(tracker, slots[in_kitchen])
+    
+    delivered = _count_by_category(tracker, slots[tracker.delivered[slots]])
+    delivered['drinks'] += tracker.total_delivered_drinks
+    delivered['food'] += tracker.total_delivered_food
+    delivered['parcels'] += tracker.total_delivered_parcels
+    
+    return {
+        'kitchen': kitchen,
+        'delivered': delivered
+    }
+
+def draw_trails(frame, tracker):
+    for slot in tracker.active_slots():
+        if tracker.trail_sizes[slot] < 2:
+            continue
+        category = tracker.category_names[tracker.categories[slot]]
+        color = CATEGORY_COLORS.get(category, (255, 255, 255))
+        points = [(int(x), int(y)) for x, y in tracker.trail(slot)]
+        for i in range(1, len(points)):
+            alpha = i / len(points)
+            thickness = max(1, int(3 * alpha))
+            cv2.line(frame, points[i-1], points[i], color, thickness, cv2.LINE_AA)
+        if len(points) >= 2:
+            cv2.arrowedLine(frame, points[-2], points[-1], color, 3, cv2.LINE_AA, tipLength=0.3)
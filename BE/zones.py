@@ -0,0 +1,58 @@
+# Zone label / signed-distance maps rasterized once per camera
+import cv2 #type: ignore
+import numpy as np
+
+
+class ZoneMap:
+    """
+    Named polygon zones (kitchen, pass, pickup shelf, ...) rasterized at the frame resolution.
+
+    labels holds one bit per zone for every pixel, so membership of any number
+    of points in every zone is a single array gather. Each zone also gets a
+    signed distance map (positive inside, negative outside, in pixels) that
+    stands in for cv2.pointPolygonTest(..., measureDist=True).
+    """
+    def __init__(self, zones, frame_size):
+        width, height = frame_size
+        if len(zones) > 32:
+            raise ValueError("ZoneMap supports at most 32 zones")
+        self.width = width
+        self.height = height
+        self.names = list(zones)
+        self.polygons = {name: np.asarray(polygon, dtype=np.int32) for name, polygon in zones.items()}
+        self.bits = {name: 1 << i for i, name in enumerate(self.names)}
+        self.labels = np.zeros((height, width), dtype=np.uint32)
+        self.distances = {}
+        for name in self.names:
+            mask = np.zeros((height, width), dtype=np.uint8)
+            cv2.fillPoly(mask, [self.polygons[name].reshape(-1, 1, 2)], 255)
+            self.labels[mask > 0] |= np.uint32(self.bits[name])
+            inside = cv2.distanceTransform(mask, cv2.DIST_L2, cv2.DIST_MASK_PRECISE)
+            outside = cv2.distanceTransform(255 - mask, cv2.DIST_L2, cv2.DIST_MASK_PRECISE)
+            self.distances[name] = (inside - outside).astype(np.float16)
+
+    def _index(self, points):
+        points = np.asarray(points, dtype=np.int64).reshape(-1, 2)
+        xs = points[:, 0]
+        ys = points[:, 1]
+        in_frame = (xs >= 0) & (xs < self.width) & (ys >= 0) & (ys < self.height)
+        return np.clip(ys, 0, self.height - 1), np.clip(xs, 0, self.width - 1), in_frame
+
+    def zone_bits(self, points):
+        """Bitmask of the zones containing each point (0 for points outside the frame)"""
+        ys, xs, in_frame = self._index(points)
+        return np.where(in_frame, self.labels[ys, xs], 0).astype(np.uint32)
+
+    def contains(self, points, name):
+        return (self.zone_bits(points) & self.bits[name]) != 0
+
+    def distance(self, points, name):
+        """Signed distance of each point to the zone boundary (>= 0 inside)"""
+        ys, xs, in_frame = self._index(points)
+        dist = self.distances[name][ys, xs].astype(np.float32)
+        # Points outside the frame are never inside a zone
+        return np.where(in_frame, dist, np.minimum(dist, -1.0))
+
+    def zones_of(self, bits):
+        """Zone names encoded in a zone_bits value"""
+        return [name for name in self.names if bits & self.bits[name]]
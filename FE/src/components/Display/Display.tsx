@@ -2,6 +2,7 @@ import { useState, useEffect, useRef } from "react";
 import { MdDateRange, MdClose } from "react-icons/md";
 import { FaDownload, FaImage } from "react-icons/fa";
 import { GiKnifeFork } from "react-icons/gi";
+import { applyFeedMessage, FEED_RETRY_MS, type FeedMessage } from "@/lib/changeFeed";
 
 // Types
 interface FoodDataRecord {
@@ -24,6 +25,10 @@ interface FoodDataResponse {
 const WS_BASE_URL = "ws://127.0.0.1:8000";
 const API_BASE_URL = "http://127.0.0.1:8000";
 
+// Binary frame (or a "thumb" / "medium" variant) served with long-lived cache headers
+const foodFrameUrl = (frameName: string, size: 'full' | 'medium' | 'thumb' = 'full') =>
+  `${API_BASE_URL}/food-frame/${encodeURIComponent(frameName)}${size === 'full' ? '' : `?size=${size}`}`;
+
 // Components
 const Card = ({ title, value, icon, layout }: any) => {
   if (layout === 'split') {
@@ -78,9 +83,12 @@ const ImageModal = ({
   frameName: string; 
   onClose: () => void;
 }) => {
-  const [imageData, setImageData] = useState<string | null>(null);
-  const [isLoading, setIsLoading] = useState(true);
-  const [error, setError] = useState<string | null>(null);
+  const imageUrl = foodFrameUrl(frameName);
+  // Tracked per frame name so a cached image that loads instantly is never shown as loading
+  const [loadedFrame, setLoadedFrame] = useState<string | null>(null);
+  const [failedFrame, setFailedFrame] = useState<string | null>(null);
+  const error = failedFrame === frameName ? `Frame not found: ${frameName}` : null;
+  const isLoading = loadedFrame !== frameName && !error;
 
   // New states for zoom & pan
   const [zoom, setZoom] = useState<number>(1); // 1 = fit
@@ -90,36 +98,11 @@ const ImageModal = ({
   const lastTranslateRef = useRef<{ x: number; y: number }>({ x: 0, y: 0 });
   const containerRef = useRef<HTMLDivElement | null>(null);
 
+  // The browser loads (and caches) the image itself; only reset the view per frame
   useEffect(() => {
-    const fetchImage = async () => {
-      try {
-        setIsLoading(true);
-        setError(null);
-        
-        const response = await fetch(`${API_BASE_URL}/food-frame/${frameName}`);
-        const data = await response.json();
-        
-        if (data.error) {
-          setError(data.error);
-        } else {
-          const imageSrc = `data:${data.content_type};base64,${data.image_base64}`;
-          setImageData(imageSrc);
-          // reset transform on new image
-          setZoom(1);
-          setTranslate({ x: 0, y: 0 });
-          lastTranslateRef.current = { x: 0, y: 0 };
-        }
-      } catch (err) {
-        setError('Failed to load image');
-        console.error('Error fetching image:', err);
-      } finally {
-        setIsLoading(false);
-      }
-    };
-
-    if (frameName) {
-      fetchImage();
-    }
+    setZoom(1);
+    setTranslate({ x: 0, y: 0 });
+    lastTranslateRef.current = { x: 0, y: 0 };
   }, [frameName]);
 
   // helpers
@@ -315,11 +298,13 @@ const ImageModal = ({
               </div>
             )}
 
-            {!isLoading && !error && imageData && (
-              <div className="relative w-full h-full flex items-center justify-center">
+            {!error && (
+              <div className={`relative w-full h-full items-center justify-center ${isLoading ? 'hidden' : 'flex'}`}>
                 <img 
-                  src={imageData} 
+                  src={imageUrl} 
                   alt={frameName}
+                  onLoad={() => setLoadedFrame(frameName)}
+                  onError={() => setFailedFrame(frameName)}
                   draggable={false}
                   onDragStart={(e) => e.preventDefault()}
                   // combined transform for pan & zoom
@@ -369,6 +354,9 @@ const Display = () => {
   const [selectedFrame, setSelectedFrame] = useState<string | null>(null);
   
   const wsRef = useRef<WebSocket | null>(null);
+  // Last change-feed cursor for the current range; sent on reconnect to get only missed rows
+  const cursorRef = useRef<string | null>(null);
+  const retryRef = useRef<number | null>(null);
 
   const connectWebSocket = () => {
     if (new Date(startDate) > new Date(endDate)) {
@@ -378,11 +366,22 @@ const Display = () => {
 
     setIsLoading(true);
     setHasSearched(true);
+    cursorRef.current = null;
+    openSocket();
+  };
+
+  const openSocket = (isRetry = false) => {
     setConnectionStatus('connecting');
+    if (retryRef.current !== null) {
+      window.clearTimeout(retryRef.current);
+      retryRef.current = null;
+    }
 
     // Close existing connection
     if (wsRef.current) {
-      wsRef.current.close();
+      const previous = wsRef.current;
+      wsRef.current = null;
+      previous.close();
     }
 
     // Connect to food data WebSocket
@@ -392,26 +391,29 @@ const Display = () => {
       console.log('Food Data WebSocket connected');
       setConnectionStatus('connected');
       
-      // Send date range parameters
+      // Send date range parameters and the cursor to resume from (null = full snapshot)
       ws.send(JSON.stringify({
         start_date: startDate,
-        end_date: endDate
+        end_date: endDate,
+        cursor: cursorRef.current
       }));
     };
 
     ws.onmessage = (event) => {
       try {
-        const data = JSON.parse(event.data);
-        console.log('Food data received:', data);
+        const data: FeedMessage<FoodDataRecord> = JSON.parse(event.data);
         
         if (data.error) {
           console.error('WebSocket error:', data.error);
           alert(`Error: ${data.error}`);
+          wsRef.current = null;
           ws.close();
           return;
         }
         
-        setFoodData(data);
+        // Snapshot first, then only new rows; heartbeats just refresh the timestamp
+        cursorRef.current = data.cursor ?? null;
+        setFoodData((current) => applyFeedMessage(current, data));
         setIsLoading(false);
       } catch (err) {
         console.error('Error parsing data:', err);
@@ -422,21 +424,33 @@ const Display = () => {
       console.error('WebSocket error:', error);
       setConnectionStatus('disconnected');
       setIsLoading(false);
-      alert('Failed to connect to WebSocket. Please check if the API is running.');
+      if (!isRetry) {
+        alert('Failed to connect to WebSocket. Please check if the API is running.');
+      }
     };
 
     ws.onclose = () => {
       console.log('WebSocket closed');
       setConnectionStatus('disconnected');
+      // Unexpected close: reconnect and resume from the last cursor
+      if (wsRef.current === ws) {
+        wsRef.current = null;
+        retryRef.current = window.setTimeout(() => openSocket(true), FEED_RETRY_MS);
+      }
     };
 
     wsRef.current = ws;
   };
 
   const disconnectWebSocket = () => {
+    if (retryRef.current !== null) {
+      window.clearTimeout(retryRef.current);
+      retryRef.current = null;
+    }
     if (wsRef.current) {
-      wsRef.current.close();
+      const ws = wsRef.current;
       wsRef.current = null;
+      ws.close();
       setConnectionStatus('disconnected');
       setHasSearched(false);
       setFoodData(null);
@@ -448,8 +462,13 @@ const Display = () => {
     // Auto-connect immediately (last 24 hours defaults from startDate/endDate)
     connectWebSocket();
     return () => {
+      if (retryRef.current !== null) {
+        window.clearTimeout(retryRef.current);
+      }
       if (wsRef.current) {
-        wsRef.current.close();
+        const ws = wsRef.current;
+        wsRef.current = null;
+        ws.close();
       }
     };
   }, []);
@@ -661,6 +680,15 @@ const Display = () => {
                               onClick={() => setSelectedFrame(record.Frame_name)}
                               className="flex items-center gap-2 text-blue-600 hover:text-blue-800 hover:underline font-medium"
                             >
+                              <img
+                                src={foodFrameUrl(record.Frame_name, 'thumb')}
+                                alt=""
+                                loading="lazy"
+                                decoding="async"
+                                width={64}
+                                className="h-9 w-16 object-cover rounded border border-gray-200"
+                                onError={(e) => { e.currentTarget.style.display = 'none'; }}
+                              />
                               <FaImage className="text-lg" />
                               <span className="max-w-[200px] truncate">
                                 {record.Frame_name}
@@ -3,6 +3,7 @@ import { MdDateRange } from "react-icons/md";
 import { FaDownload, FaFolderOpen } from "react-icons/fa";
 import { GiKnifeFork } from "react-icons/gi";
 import { FaGlassCheers, FaBoxOpen } from "react-icons/fa";
+import { applyFeedMessage, FEED_RETRY_MS, type FeedMessage } from "@/lib/changeFeed";
 
 // Types
 interface RawDataRecord {
@@ -73,6 +74,9 @@ const Records = () => {
   >("disconnected");
 
   const wsRef = useRef<WebSocket | null>(null);
+  // Last change-feed cursor for the current range; sent on reconnect to get only missed rows
+  const cursorRef = useRef<string | null>(null);
+  const retryRef = useRef<number | null>(null);
 
   const connectWebSocket = () => {
     if (new Date(startDate) > new Date(endDate)) {
@@ -82,11 +86,22 @@ const Records = () => {
 
     setIsLoading(true);
     setHasSearched(true);
+    cursorRef.current = null;
+    openSocket();
+  };
+
+  const openSocket = (isRetry = false) => {
     setConnectionStatus("connecting");
+    if (retryRef.current !== null) {
+      window.clearTimeout(retryRef.current);
+      retryRef.current = null;
+    }
 
     // Close existing connection
     if (wsRef.current) {
-      wsRef.current.close();
+      const previous = wsRef.current;
+      wsRef.current = null;
+      previous.close();
     }
 
     // Connect to raw data WebSocket
@@ -96,28 +111,31 @@ const Records = () => {
       console.log("Raw Data WebSocket connected");
       setConnectionStatus("connected");
 
-      // Send date range parameters
+      // Send date range parameters and the cursor to resume from (null = full snapshot)
       ws.send(
         JSON.stringify({
           start_date: startDate,
           end_date: endDate,
+          cursor: cursorRef.current,
         })
       );
     };
 
     ws.onmessage = (event) => {
       try {
-        const data = JSON.parse(event.data);
-        console.log("Raw data received:", data);
+        const data: FeedMessage<RawDataRecord> = JSON.parse(event.data);
 
         if (data.error) {
           console.error("WebSocket error:", data.error);
           alert(`Error: ${data.error}`);
+          wsRef.current = null;
           ws.close();
           return;
         }
 
-        setRawData(data);
+        // Snapshot first, then only new rows; heartbeats just refresh the timestamp
+        cursorRef.current = data.cursor ?? null;
+        setRawData((current) => applyFeedMessage(current, data));
         setIsLoading(false);
       } catch (err) {
         console.error("Error parsing data:", err);
@@ -128,21 +146,33 @@ const Records = () => {
       console.error("WebSocket error:", error);
       setConnectionStatus("disconnected");
       setIsLoading(false);
-      alert("Failed to connect to WebSocket. Please check if the API is running.");
+      if (!isRetry) {
+        alert("Failed to connect to WebSocket. Please check if the API is running.");
+      }
     };
 
     ws.onclose = () => {
       console.log("WebSocket closed");
       setConnectionStatus("disconnected");
+      // Unexpected close: reconnect and resume from the last cursor
+      if (wsRef.current === ws) {
+        wsRef.current = null;
+        retryRef.current = window.setTimeout(() => openSocket(true), FEED_RETRY_MS);
+      }
     };
 
     wsRef.current = ws;
   };
 
   const disconnectWebSocket = () => {
+    if (retryRef.current !== null) {
+      window.clearTimeout(retryRef.current);
+      retryRef.current = null;
+    }
     if (wsRef.current) {
-      wsRef.current.close();
+      const ws = wsRef.current;
       wsRef.current = null;
+      ws.close();
       setConnectionStatus("disconnected");
       setHasSearched(false);
       setRawData(null);
@@ -186,8 +216,13 @@ const Records = () => {
   useEffect(() => {
     connectWebSocket();
     return () => {
+      if (retryRef.current !== null) {
+        window.clearTimeout(retryRef.current);
+      }
       if (wsRef.current) {
-        wsRef.current.close();
+        const ws = wsRef.current;
+        wsRef.current = null;
+        ws.close();
       }
     };
     // eslint-disable-next-line react-hooks/exhaustive-deps
@@ -0,0 +1,56 @@
+// Client side of the /ws/raw-data and /ws/food-data change feed (send "cursor" to opt in)
+
+export interface FeedMessage<T> {
+  type?: "snapshot" | "delta" | "heartbeat";
+  cursor?: string;
+  start_date: string;
+  end_date: string;
+  window_start?: string;
+  total_records?: number;
+  data?: T[];
+  timestamp?: string;
+  error?: string;
+}
+
+export interface FeedState<T> {
+  start_date: string;
+  end_date: string;
+  total_records: number;
+  data: T[];
+  timestamp?: string;
+}
+
+// Reconnect delay after an unexpected close; the saved cursor resumes without a full resend
+export const FEED_RETRY_MS = 3000;
+
+// Merge one feed message into the rows shown: a snapshot replaces them, a delta appends,
+// and rows older than window_start (rolling last 24 hours) are dropped
+export function applyFeedMessage<T extends { DateTime: string }>(
+  current: FeedState<T> | null,
+  message: FeedMessage<T>
+): FeedState<T> {
+  let data: T[];
+  if (!current || !message.type || message.type === "snapshot") {
+    data = message.data ?? [];
+  } else if (message.type === "delta") {
+    data = [...current.data, ...(message.data ?? [])];
+  } else {
+    data = current.data;
+  }
+
+  const windowStart = message.window_start;
+  if (windowStart && data.length > 0 && data[0].DateTime < windowStart) {
+    data = data.filter((row) => row.DateTime >= windowStart);
+  }
+
+  if (current && data === current.data && current.timestamp === message.timestamp) {
+    return current;
+  }
+  return {
+    start_date: message.start_date,
+    end_date: message.end_date,
+    total_records: data.length,
+    data,
+    timestamp: message.timestamp,
+  };
+}